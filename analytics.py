@@ -0,0 +1,304 @@
+"""
+    Market analytics in a separate process
+
+    The trading process writes fixed-width observation records into a shared
+    memory ring buffer. Only the trading process writes the ring and only the
+    analytics worker writes the price table, so neither needs a lock: ring
+    records carry their sequence number, table slots use a seqlock. A
+    consumer which falls more than a ring behind loses the oldest records.
+
+    The worker keeps the last buy now prices of the recently seen resourceIds
+    in searches and publishes their median to the price table, which evicts
+    the stalest prices when it is full.
+"""
+import multiprocessing
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+from time import time, sleep
+import numpy as np
+
+SEARCH = 0
+TRADEPILE = 1
+PACK = 2
+
+STATES = (None, 'active', 'expired', 'closed')
+
+RECORD = np.dtype([
+    ('seq', '<u8'),
+    ('time', '<f8'),
+    ('kind', 'u1'),
+    ('state', 'u1'),
+    ('rating', 'u1'),
+    ('resourceId', '<i8'),
+    ('itemId', '<i8'),
+    ('tradeId', '<i8'),
+    ('buyNow', '<i4'),
+    ('currentBid', '<i4'),
+], align=True)
+
+SLOT = np.dtype([
+    ('seq', '<u8'),  # odd while the slot is written
+    ('resourceId', '<i8'),
+    ('price', '<f8'),
+    ('count', '<u8'),
+    ('updated', '<f8'),
+], align=True)
+
+HEADER = 64  # head counter of the ring, padded to a cache line
+
+
+class Ring(object):
+    """ single producer, single consumer ring of RECORDs """
+
+    def __init__(self, size=65536, name=None):
+        create = name is None
+        self.size = size
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=create, size=HEADER + size * RECORD.itemsize)
+        self.head = np.ndarray((1, ), '<u8', self.shm.buf)
+        self.records = np.ndarray((size, ), RECORD, self.shm.buf, HEADER)
+        if create:
+            self.head[0] = 0
+        self.tail = 0  # consumer position
+        self.lost = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, batch):
+        """ batch - RECORD array, written as one block """
+        # only the last ring size records of a huge batch are kept
+        n = min(len(batch), self.size)
+        head = int(self.head[0]) + len(batch) - n
+        batch = batch[len(batch) - n:]
+        batch['seq'] = np.arange(head, head + n, dtype='<u8')
+        start = head % self.size
+        first = min(n, self.size - start)
+        self.records[start:start + first] = batch[:first]
+        self.records[:n - first] = batch[first:]
+        self.head[0] = head + n
+
+    def read(self, limit=4096):
+        """ records written since the last read """
+        head = int(self.head[0])
+        if head - self.tail > self.size:
+            self.lost += head - self.size - self.tail
+            self.tail = head - self.size
+        n = min(head - self.tail, limit)
+        if not n:
+            return self.records[:0]
+
+        idx = (np.arange(self.tail, self.tail + n) % self.size)
+        batch = self.records[idx]  # fancy indexing copies
+        expected = np.arange(self.tail, self.tail + n, dtype='<u8')
+        valid = batch['seq'] == expected
+        # overwritten while copying
+        valid &= expected >= max(int(self.head[0]) - self.size, 0)
+        self.lost += int(n - valid.sum())
+        self.tail += n
+        return batch[valid]
+
+    def close(self, unlink=False):
+        del self.head, self.records
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class PriceTable(object):
+    """ open addressing resourceId -> price, one writer
+
+        A resourceId lives in one of `probes` slots from resourceId % size.
+        When they are all taken put() evicts the least recently updated one,
+        slots never become empty again, so a lookup stops at the first empty
+        slot or after `probes` slots.
+    """
+
+    def __init__(self, size=4096, name=None, probes=8):
+        create = name is None
+        self.size = size
+        self.probes = min(probes, size)
+        self.shm = shared_memory.SharedMemory(name=name, create=create,
+                                              size=size * SLOT.itemsize)
+        self.slots = np.ndarray((size, ), SLOT, self.shm.buf)
+        self.keys = self.slots['resourceId']
+        if create:
+            self.slots[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def find(self, resourceId):
+        """ slot of resourceId or None """
+        i = resourceId % self.size
+        for _ in range(self.probes):
+            key = int(self.keys[i])
+            if key == 0:
+                return None
+            if key == resourceId:
+                return i
+            i = (i + 1) % self.size
+        return None
+
+    def free(self, resourceId):
+        """ slot for a new resourceId, the stalest one when all are taken """
+        i = resourceId % self.size
+        window = [(i + n) % self.size for n in range(self.probes)]
+        for i in window:
+            if int(self.keys[i]) == 0:
+                return i
+        return min(window, key=lambda i: float(self.slots[i]['updated']))
+
+    def put(self, resourceId, price, count, now):
+        i = self.find(resourceId)
+        if i is None:
+            i = self.free(resourceId)
+        slot = self.slots[i:i + 1]
+        slot['seq'] += 1
+        slot['price'] = price
+        slot['count'] = count
+        slot['updated'] = now
+        slot['resourceId'] = resourceId
+        slot['seq'] += 1
+
+    def get(self, resourceId, retries=10):
+        """ (price, count, updated) or None """
+        i = self.find(resourceId)
+        if i is None:
+            return None
+        for _ in range(retries):
+            seq = int(self.slots[i]['seq'])
+            if seq & 1:
+                continue
+            slot = self.slots[i].copy()
+            if int(self.slots[i]['seq']) == seq:
+                if slot['resourceId'] != resourceId:
+                    return None
+                return float(slot['price']), int(slot['count']), \
+                    float(slot['updated'])
+        return None
+
+    def close(self, unlink=False):
+        del self.slots, self.keys
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def records(items, kind, now=None):
+    """ auctionInfo or itemData list to RECORDs """
+    batch = np.zeros(len(items), RECORD)
+    batch['time'] = now or time()
+    batch['kind'] = kind
+    item_data = [item.get('itemData', item) for item in items]
+    batch['state'] = [
+        STATES.index(item.get('tradeState'))
+        if item.get('tradeState') in STATES else 0 for item in items
+    ]
+    batch['rating'] = [i.get('rating', 0) for i in item_data]
+    batch['resourceId'] = [i.get('resourceId', 0) for i in item_data]
+    batch['itemId'] = [i.get('id', 0) for i in item_data]
+    batch['tradeId'] = [item.get('tradeId', 0) for item in items]
+    batch['buyNow'] = [item.get('buyNowPrice', 0) for item in items]
+    batch['currentBid'] = [item.get('currentBid', 0) for item in items]
+    return batch
+
+
+def worker(ring_name, ring_size, table_name, table_size, stopped, window=32,
+           publish_interval=1, limit=None):
+    """ analytics process: ring -> median buy now per resourceId -> table
+
+        prices of at most limit (table size) resourceIds are kept, the least
+        recently observed ones are dropped
+    """
+    ring = Ring(ring_size, ring_name)
+    table = PriceTable(table_size, table_name)
+    limit = limit or table_size
+    prices = OrderedDict()
+    changed = set()
+    published = 0
+    try:
+        while not stopped.is_set():
+            batch = ring.read()
+            if not len(batch):
+                sleep(0.05)
+            # resourceId 0 marks an empty table slot
+            batch = batch[(batch['kind'] == SEARCH) & (batch['buyNow'] > 0) &
+                          (batch['resourceId'] != 0)]
+            for resourceId, buy_now in zip(batch['resourceId'].tolist(),
+                                           batch['buyNow'].tolist()):
+                if resourceId in prices:
+                    prices.move_to_end(resourceId)
+                else:
+                    prices[resourceId] = deque(maxlen=window)
+                    if len(prices) > limit:
+                        changed.discard(prices.popitem(last=False)[0])
+                prices[resourceId].append(buy_now)
+                changed.add(resourceId)
+
+            now = time()
+            if changed and now - published >= publish_interval:
+                for resourceId in changed:
+                    window_prices = prices[resourceId]
+                    table.put(resourceId, float(np.median(window_prices)),
+                              len(window_prices), now)
+                changed.clear()
+                published = now
+    finally:
+        ring.close()
+        table.close()
+
+
+class Analytics(object):
+    """ trading process side: publish observations, read derived prices """
+
+    def __init__(self, ring_size=65536, table_size=4096):
+        self.ring = Ring(ring_size)
+        self.table = PriceTable(table_size)
+        ctx = multiprocessing.get_context('spawn')
+        self.stopped = ctx.Event()
+        self.process = ctx.Process(
+            target=worker,
+            args=(self.ring.name, ring_size, self.table.name, table_size,
+                  self.stopped),
+            daemon=True)
+        self.process.start()
+
+    def publish(self, items, kind):
+        if items:
+            self.ring.write(records(items, kind))
+
+    def price(self, resourceId):
+        """ median buy now of the last searches or None """
+        found = self.table.get(resourceId)
+        return found[0] if found else None
+
+    def stats(self):
+        return {
+            'written': int(self.ring.head[0]),
+            'alive': self.process.is_alive(),
+        }
+
+    def close(self):
+        self.stopped.set()
+        self.process.join(5)
+        self.ring.close(unlink=True)
+        self.table.close(unlink=True)
+
+
+class NoAnalytics(object):
+    """ used when analytics isn't set in config """
+
+    def publish(self, items, kind):
+        pass
+
+    def price(self, resourceId):
+        return None
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+    Offline backtester for the items yaml
+
+    Replays stored market observations through the template search params,
+    templates.suited_mask (the ItemSuited rule) and the Auction listing price.
+    The reference price of an observation is the median of the earlier ones,
+    so no decision sees prices from its future.
+
+    Observations are read from an Influx csv export of the "items"
+    measurement or from the json lines market_history store.
+
+    ./backtest.py -i items.yaml observations.csv
+    ./backtest.py -i items.yaml observations.jsonl --sweep rating=82,84 \\
+        --sweep profit=500,1000
+"""
+import sys
+import os
+import csv
+import argparse
+import itertools
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+import numpy as np
+import codec
+import ladder
+import templates
+
+LISTING_DURATION = 3600  # in seconds, same as Auction
+PRICE_WINDOW = 32  # observations in the reference median, as in analytics
+LEVELS = {
+    'bronze': (0, 64),
+    'silver': (65, 74),
+    'gold': (75, 99),
+}
+INT_COLUMNS = ('rating', 'resourceId', 'cardsubtypeid', 'leagueId', 'nation')
+STR_COLUMNS = ('itemType', 'preferredPosition')
+
+
+def parse_time(value):
+    """ RFC3339 from influx or unix seconds/nanoseconds """
+    try:
+        value = float(value)
+        return value / 1e9 if value > 1e12 else value
+    except ValueError:
+        return np.datetime64(value.rstrip('Z'), 'ns').astype(np.int64) / 1e9
+
+
+def read_influx_csv(filename):
+    """ annotated csv, one table per series with repeated headers """
+    rows = []
+    header = None
+    with open(filename, newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#'):
+                header = None
+                continue
+            if header is None:
+                header = row
+                continue
+            rec = dict(zip(header, row))
+            if rec.get('_field', 'buynow') != 'buynow':
+                continue
+            rec['time'] = rec.pop('_time')
+            rec['buynow'] = rec.pop('_value')
+            rows.append(rec)
+
+    return rows
+
+
+def read_jsonl(filename):
+    rows = []
+    with open(filename) as f:
+        for line in f:
+            try:
+                rows.append(codec.loads(line))
+            except ValueError:
+                continue
+
+    return rows
+
+
+def load_observations(filename):
+    if filename.endswith('.csv'):
+        rows = read_influx_csv(filename)
+    else:
+        rows = read_jsonl(filename)
+
+    obs = {
+        'time': np.array([parse_time(r['time']) for r in rows]),
+        'buynow': np.array([float(r['buynow']) for r in rows]),
+    }
+    for col in INT_COLUMNS:
+        obs[col] = np.array([int(r.get(col) or 0) for r in rows],
+                            dtype=np.int64)
+    for col in STR_COLUMNS:
+        obs[col] = np.array([str(r.get(col) or '') for r in rows])
+
+    order = np.argsort(obs['time'], kind='stable')
+    return {k: v[order] for k, v in obs.items()}
+
+
+def median_prices(obs, window=PRICE_WINDOW, chunk=1 << 16):
+    """
+        reference price of every observation: median buy now of the last
+        window observations of the resourceId seen before it, nan without
+        any. Observations at the same time don't see each other.
+    """
+    rid = obs['resourceId']
+    times = obs['time']
+    order = np.lexsort((times, rid))
+    sorted_rid = rid[order]
+    sorted_time = times[order]
+    sorted_price = obs['buynow'][order].astype(np.float64)
+
+    new_rid = np.r_[True, sorted_rid[1:] != sorted_rid[:-1]]
+    new_time = new_rid | np.r_[True, sorted_time[1:] != sorted_time[:-1]]
+    positions = np.arange(len(rid))
+    # group of the resourceId and first observation at the same time
+    group = np.maximum.accumulate(np.where(new_rid, positions, 0))
+    end = np.maximum.accumulate(np.where(new_time, positions, 0))
+
+    prices = np.full(len(rid), np.nan)
+    offsets = np.arange(window, 0, -1)
+    for start in range(0, len(rid), chunk):
+        stop = min(start + chunk, len(rid))
+        idx = end[start:stop, None] - offsets[None, :]
+        earlier = sorted_price[np.maximum(idx, 0)]
+        earlier[idx < group[start:stop, None]] = np.nan
+        with warnings.catch_warnings():
+            # all-nan rows of observations without history
+            warnings.simplefilter('ignore', RuntimeWarning)
+            prices[order[start:stop]] = np.nanmedian(earlier, axis=1)
+
+    return prices
+
+
+def search_mask(template, obs):
+    """ observations which the template search would return """
+    params = template.get('params', {})
+    mask = np.ones(len(obs['time']), dtype=bool)
+
+    if 'type' in params:
+        mask &= obs['itemType'] == params['type']
+    if params.get('lev') in LEVELS:
+        low, high = LEVELS[params['lev']]
+        mask &= (obs['rating'] >= low) & (obs['rating'] <= high)
+    if 'maskedDefId' in params:
+        mask &= obs['resourceId'] == int(params['maskedDefId'])
+    if template.get('resourceId'):
+        mask &= obs['resourceId'] == template['resourceId']
+    if 'pos' in params:
+        mask &= obs['preferredPosition'] == params['pos']
+    if 'nat' in params:
+        mask &= obs['nation'] == int(params['nat'])
+    if 'leag' in params:
+        mask &= obs['leagueId'] == int(params['leag'])
+    if 'maxb' in params:
+        mask &= obs['buynow'] <= float(params['maxb'])
+    if 'minb' in params:
+        mask &= obs['buynow'] >= float(params['minb'])
+
+    return mask
+
+
+def peak_capital(times, spent, hold=LISTING_DURATION):
+    """ maximum coins tied up if every item is held for hold seconds """
+    if not len(times):
+        return 0.0
+    cum = np.r_[0, np.cumsum(spent)]
+    released = np.searchsorted(times, times - hold, side='right')
+    return float((cum[1:] - cum[released]).max())
+
+
+def backtest_template(template, obs, prices, hold=LISTING_DURATION):
+    template = templates.normalize(dict(template))
+    seen = search_mask(template, obs)
+    ref = prices if 'price' not in template else \
+        np.full(len(prices), float(template['price']))
+    # nothing to sell for before the first price of the resourceId
+    hits = seen & np.isfinite(ref) & templates.suited_mask(template, obs, ref)
+
+    buynow = obs['buynow'][hits]
+    # Auction lists for the reference price snapped to the ladder
+    sell = templates.listing_price_array(ref[hits], ladder.MAX_PRICE)
+    profit = templates.potential_profit(sell, buynow)
+    n_seen = int(seen.sum())
+    n_hits = int(hits.sum())
+
+    result = {
+        'name': template.get('name', ''),
+        'seen': n_seen,
+        'hits': n_hits,
+        'hit_rate': n_hits / n_seen if n_seen else 0.0,
+        'spent': float(buynow.sum()),
+        'peak_capital': peak_capital(obs['time'][hits], buynow, hold),
+        'profit': float(profit.sum()),
+    }
+    if n_hits:
+        p10, p50, p90 = np.percentile(profit, [10, 50, 90])
+        result.update({
+            'profit_mean': float(profit.mean()),
+            'profit_p10': float(p10),
+            'profit_p50': float(p50),
+            'profit_p90': float(p90),
+            'profitable': float((profit > 0).mean()),
+        })
+
+    return result
+
+
+def backtest(items, obs, hold=LISTING_DURATION):
+    prices = median_prices(obs)
+    return [backtest_template(t, obs, prices, hold) for t in items]
+
+
+# Parameter sweeps run in worker processes which load observations once
+_worker = {}
+
+
+def _init_worker(filename):
+    _worker['obs'] = load_observations(filename)
+    _worker['prices'] = median_prices(_worker['obs'])
+
+
+def _run_variant(args):
+    variant, items, hold = args
+    results = []
+    for template in items:
+        template = dict(template)
+        for key, value in variant.items():
+            if key == 'maxb':
+                template['params'] = dict(template['params'], maxb=value)
+            else:
+                template[key] = value
+        result = backtest_template(template, _worker['obs'],
+                                   _worker['prices'], hold)
+        result['variant'] = variant
+        results.append(result)
+
+    return results
+
+
+def parse_sweep(sweeps):
+    keys = []
+    values = []
+    for sweep in sweeps:
+        key, _, vals = sweep.partition('=')
+        keys.append(key)
+        values.append([yaml.safe_load(v) for v in vals.split(',')])
+
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def sweep(filename, items, variants, hold=LISTING_DURATION, workers=None):
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(filename, )) as pool:
+        for results in pool.map(_run_variant,
+                                [(v, items, hold) for v in variants]):
+            yield from results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fifa items backtester')
+    parser.add_argument('-i', '--items', type=str, required=True,
+                        help='items yaml file')
+    parser.add_argument('observations', type=str,
+                        help='influx csv export or json lines history')
+    parser.add_argument('--template', type=int, default=None,
+                        help='index of the template in items yaml')
+    parser.add_argument('--hold', type=int, default=LISTING_DURATION,
+                        help='seconds the coins stay in a bought item')
+    parser.add_argument('--sweep', action='append', default=[],
+                        help='key=v1,v2 for rating, profit or maxb')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(os.path.expanduser(args.items)) as f:
+        items = yaml.safe_load(f)
+    if args.template is not None:
+        items = [items[args.template]]
+
+    if args.sweep:
+        results = sweep(args.observations, items, parse_sweep(args.sweep),
+                        args.hold, args.workers)
+    else:
+        results = backtest(items, load_observations(args.observations),
+                           args.hold)
+
+    for result in results:
+        print(codec.dumps(result))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+    Thompson sampling over item templates
+
+    Every template keeps a Beta posterior of "search request finds a suited
+    item" and the mean profit of suited items. Templates with a profit
+    threshold learn the potential profit of suited items, templates without
+    one learn the realised profit when a bought item is sold. The template
+    with the highest sampled success rate times sampled profit is searched
+    next. The state is stored as json keyed by templates.template_key, so it
+    survives restarts and items reloads.
+"""
+import os
+import random
+from math import sqrt
+import codec
+import templates
+
+PRIOR_PROFIT = 500  # expected profit of an unknown template
+PRIOR_STD = 500
+
+
+class Arm(object):
+
+    def __init__(self, data={}):
+        self.successes = data.get('successes', 0)
+        self.failures = data.get('failures', 0)
+        self.profit_n = data.get('profit_n', 0)
+        self.profit_sum = data.get('profit_sum', 0.0)
+        self.profit_sq = data.get('profit_sq', 0.0)
+
+    def sample(self, rng):
+        p = rng.betavariate(1 + self.successes, 1 + self.failures)
+        if self.profit_n:
+            mean = self.profit_sum / self.profit_n
+            var = max(self.profit_sq / self.profit_n - mean**2, 0)
+            std = sqrt(var + PRIOR_STD**2 / (1 + self.profit_n)) / \
+                sqrt(self.profit_n)
+        else:
+            mean, std = PRIOR_PROFIT, PRIOR_STD
+        return p * max(rng.gauss(mean, std), 1)
+
+    def update(self, requests, suited, profits):
+        successes = min(suited, requests)
+        self.successes += successes
+        self.failures += requests - successes
+        for profit in profits:
+            self.profit_n += 1
+            self.profit_sum += profit
+            self.profit_sq += profit**2
+
+    def dump(self):
+        return self.__dict__
+
+
+class TemplateSelector(object):
+
+    def __init__(self, filename=None, save_every=10, seed=None,
+                 pending_limit=10000):
+        self.filename = os.path.expanduser(filename) if filename else None
+        self.save_every = save_every
+        self.pending_limit = pending_limit
+        self.updates = 0
+        self.rng = random.Random(seed)
+        self.arms = {}
+        self.pending = {}  # itemId -> [template key, buy price]
+        if self.filename and os.path.exists(self.filename):
+            with open(self.filename, 'rb') as f:
+                try:
+                    data = codec.loads(f.read())
+                except codec.DecodeError:
+                    data = {}
+            self.arms = {k: Arm(v) for k, v in data.get('arms', {}).items()}
+            self.pending = data.get('pending', {})
+
+    def arm(self, template):
+        return self.arms.setdefault(templates.template_key(template), Arm())
+
+    def choose(self, items):
+        """ index of the template to search next """
+        scores = [self.arm(template).sample(self.rng) for template in items]
+        return scores.index(max(scores))
+
+    def update(self, template, requests, suited, profits):
+        self.arm(template).update(requests, suited, profits)
+        self.changed()
+
+    def bought(self, template, itemId, price):
+        """ templates without profit learn when the item is sold """
+        if 'profit' in template:
+            return
+        if len(self.pending) >= self.pending_limit:
+            # items which went to the club are never sold
+            self.pending.pop(next(iter(self.pending)))
+        self.pending[str(itemId)] = [templates.template_key(template), price]
+
+    def sold(self, itemId, price, tax=templates.EA_TAX):
+        """ realised profit of a bought item, price None only forgets it,
+            quick sells of items without pack history have no price """
+        try:
+            key, bought = self.pending.pop(str(itemId))
+        except KeyError:
+            return
+        if price is not None:
+            self.arms.setdefault(key, Arm()).update(
+                0, 0, [price * tax - bought])
+            self.changed()
+
+    def changed(self):
+        self.updates += 1
+        if not self.updates % self.save_every:
+            self.save()
+
+    def save(self):
+        if not self.filename:
+            return
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(codec.dumps({
+                'arms': {k: a.dump() for k, a in self.arms.items()},
+                'pending': self.pending,
+            }))
+        os.replace(tmp, self.filename)
+
+    def stats(self):
+        return {k: a.dump() for k, a in self.arms.items()}
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+    JSON codec benchmark on the payloads captured in notes.txt
+
+    ./benchmarks/bench_codec.py
+"""
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import codec  # noqa: E402
+
+NOTES = os.path.join(os.path.dirname(__file__), '..', 'notes.txt')
+
+
+def load_payloads():
+    """ pack, purchased items and settings responses from notes.txt """
+    payloads = {}
+    with open(NOTES) as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith('{'):
+                continue
+            data = json.loads(line)
+            name = next(iter(data))
+            payloads[name] = line.encode()
+
+    return payloads
+
+
+PAYLOADS = load_payloads()
+DECODED = {name: json.loads(raw) for name, raw in PAYLOADS.items()}
+
+
+def bench_loads():
+    for raw in PAYLOADS.values():
+        codec.loads(raw)
+
+
+def bench_dumps():
+    for data in DECODED.values():
+        codec.dumps(data)
+
+
+def bench_stdlib_loads():
+    for raw in PAYLOADS.values():
+        json.loads(raw)
+
+
+def bench_stdlib_dumps():
+    for data in DECODED.values():
+        json.dumps(data)
+
+
+def main():
+    print('backend: {}, payloads: {}'.format(
+        codec.BACKEND,
+        ', '.join('{} {}b'.format(k, len(v)) for k, v in PAYLOADS.items())))
+    for name in ('bench_loads', 'bench_stdlib_loads', 'bench_dumps',
+                 'bench_stdlib_dumps'):
+        timer = timeit.Timer(globals()[name])
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=5, number=number)) / number
+        print('{:20} {:10.1f} us'.format(name, best * 1e6))
+
+
+if __name__ == '__main__':
+    main()
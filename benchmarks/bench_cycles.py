@@ -0,0 +1,28 @@
+"""
+    Whole trading cycles against the stand-in backend with sleeps disabled
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+import standin  # noqa: E402
+
+WEB = standin.make_fifa()
+
+
+def bench_buy_item_by_index():
+    with standin.no_sleeps():
+        WEB.BuyItemByIndex(0)
+
+
+def bench_move_purchased_items():
+    with standin.no_sleeps():
+        WEB.MovePurchasedItems()
+
+
+def bench_sell_from_tradepile():
+    # forget the known state, so every run processes the whole tradepile
+    WEB.tradepile_state.items = {}
+    WEB.tradepile_state.touch()
+    with standin.no_sleeps():
+        WEB.SellFromTradePile()
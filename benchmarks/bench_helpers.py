@@ -0,0 +1,46 @@
+"""
+    Micro benchmarks for pricing helpers and hot FifaWeb paths
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+import standin  # noqa: E402
+from standin import fifa  # noqa: E402
+
+PRICES = [150, 950, 4200, 27750, 99000, 640000]
+ITEM = standin.market_page()['auctionInfo'][0]
+RESPONSE = standin.StandInAdapter().send(
+    fifa.requests.Request('GET', standin.BASE_URL +
+                          '/ut/game/fifa23/transfermarket').prepare())
+WEB = standin.make_fifa()
+
+
+def bench_delta_by_price():
+    for price in PRICES:
+        fifa.delta_by_price(price)
+
+
+def bench_blur_price():
+    for price in PRICES:
+        fifa.blur_price(price, 0.7, min_price=150)
+
+
+def bench_itemdata2tags():
+    fifa.itemdata2tags(ITEM['itemData'])
+
+
+def bench_auction_info_items():
+    # drop the cached body, so every run decodes the response
+    RESPONSE.__dict__.pop('_decoded', None)
+    fifa.auction_info_items(RESPONSE)
+
+
+def bench_item_suited():
+    WEB.ItemSuited(0, ITEM)
+    WEB.ItemSuited(1, ITEM)
+
+
+def bench_getattribute_hook():
+    WEB.SaveItem
+    WEB.ItemSuited
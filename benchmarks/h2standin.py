@@ -0,0 +1,94 @@
+"""
+    Local HTTP/2 stand-in for the UT backend
+
+    Serves the canned StandInAdapter routes over cleartext HTTP/2 (prior
+    knowledge) from a background thread, for HttpxSession with http1=False.
+
+    ./benchmarks/h2standin.py    # timings of a few calls through httpx
+"""
+import os
+import sys
+import asyncio
+import threading
+import h2.config
+import h2.connection
+import h2.events
+
+sys.path.insert(0, os.path.dirname(__file__))
+import standin  # noqa: E402
+
+
+class H2Protocol(asyncio.Protocol):
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False))
+        self.requests = {}  # stream id -> (method, path)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                headers = dict(event.headers)
+                self.requests[event.stream_id] = (headers[b':method'],
+                                                  headers[b':path'])
+            elif isinstance(event, h2.events.DataReceived):
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded):
+                self.respond(event.stream_id)
+        self.transport.write(self.conn.data_to_send())
+
+    def respond(self, stream_id):
+        method, path = self.requests.pop(stream_id)
+        method = method.decode()
+        path = path.decode().split('?')[0]
+        self.adapter.requests += 1
+        status, body = 404, b''
+        for m, pattern, b, code in self.adapter.bodies:
+            if m == method and pattern.search(path):
+                status, body = code, b
+                break
+        self.conn.send_headers(stream_id, [
+            (':status', str(status)),
+            ('content-type', 'application/json'),
+            ('content-length', str(len(body))),
+        ])
+        # canned bodies fit the initial flow control window
+        size = self.conn.max_outbound_frame_size
+        for start in range(0, len(body), size):
+            self.conn.send_data(stream_id, body[start:start + size])
+        self.conn.end_stream(stream_id)
+
+
+def serve(host='127.0.0.1', port=0):
+    """ starts the server thread, returns (base url, adapter, stop) """
+    adapter = standin.StandInAdapter()
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(
+        loop.create_server(lambda: H2Protocol(adapter), host, port))
+    port = server.sockets[0].getsockname()[1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    def stop():
+        loop.call_soon_threadsafe(server.close)
+        loop.call_soon_threadsafe(loop.stop)
+
+    return 'http://{}:{}'.format(host, port), adapter, stop
+
+
+if __name__ == '__main__':
+    import transport
+    base_url, adapter, stop = serve()
+    session = transport.HttpxSession(http1=False, http2=True)
+    for path in ('/ut/game/fifa23/transfermarket', '/ut/game/fifa23/tradepile',
+                 '/ut/game/fifa23/user/credits'):
+        r = session.get(base_url + path)
+        print(r.http_version, r.status_code, len(r.content), r.timing)
+    session.close()
+    stop()
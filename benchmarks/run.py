@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+    Benchmark runner
+
+    Runs every bench_* function from benchmarks/bench_*.py, stores results as
+    json baselines and compares a run against a stored baseline.
+
+    ./benchmarks/run.py --save main
+    ./benchmarks/run.py --compare main --threshold 0.2
+    ./benchmarks/run.py -k cycles
+"""
+import os
+import sys
+import glob
+import timeit
+import platform
+import argparse
+import importlib
+from time import time
+from statistics import median
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(HERE, 'baselines')
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, '..'))
+import codec  # noqa: E402
+
+
+def collect(keyword=''):
+    benches = []
+    for path in sorted(glob.glob(os.path.join(HERE, 'bench_*.py'))):
+        name = os.path.basename(path)[:-3]
+        module = importlib.import_module(name)
+        for attr in sorted(dir(module)):
+            full_name = '{}.{}'.format(name[6:], attr[6:])
+            if attr.startswith('bench_') and callable(getattr(module, attr)) \
+                    and keyword in full_name:
+                benches.append((full_name, getattr(module, attr)))
+
+    return benches
+
+
+def measure(func, repeat=5, min_time=0.2):
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time / 10:
+        number *= 2
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min': min(times),
+        'median': median(times),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run(keyword='', repeat=5, min_time=0.2):
+    results = {}
+    for name, func in collect(keyword):
+        results[name] = measure(func, repeat, min_time)
+        print('{:40} {:12.2f} us'.format(name, results[name]['min'] * 1e6))
+
+    return {
+        'time': time(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'codec': codec.BACKEND,
+        'results': results,
+    }
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else \
+        os.path.join(BASELINES, name + '.json')
+
+
+def save(run_data, name):
+    os.makedirs(BASELINES, exist_ok=True)
+    with open(baseline_path(name), 'w') as f:
+        f.write(codec.dumps(run_data))
+
+
+def compare(run_data, name, threshold):
+    """ returns names of benchmarks slower than baseline by threshold """
+    with open(baseline_path(name), 'rb') as f:
+        base = codec.loads(f.read())['results']
+
+    regressions = []
+    for bench, result in sorted(run_data['results'].items()):
+        if bench not in base:
+            continue
+        ratio = result['min'] / base[bench]['min']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(bench)
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print('{:40} {:8.2f}x {}'.format(bench, ratio, flag))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fifa benchmarks')
+    parser.add_argument('-k', dest='keyword', type=str, default='',
+                        help='run only benchmarks matching the keyword')
+    parser.add_argument('--save', type=str, help='store results as baseline')
+    parser.add_argument('--compare', type=str, help='baseline to compare')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown, 0.2 is 20%%')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='seconds per repeat')
+    args = parser.parse_args()
+
+    run_data = run(args.keyword, args.repeat, args.min_time)
+    if args.save:
+        save(run_data, args.save)
+
+    if args.compare and compare(run_data, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""
+    Local stand-in for the UT backend
+
+    A requests transport adapter which answers UT calls with canned responses,
+    a FifaWeb factory wired to it and a context manager which disables the
+    sleeps of fifa.py.
+"""
+import os
+import re
+import sys
+import copy
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+import yaml
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import codec  # noqa: E402
+import fifa  # noqa: E402
+
+BASE_URL = 'https://utas.standin.local'
+SID = 'c9bf9e57-1685-4c89-bafb-ff5af830be8a'
+NOTES = os.path.join(os.path.dirname(__file__), '..', 'notes.txt')
+
+
+def notes_payloads():
+    payloads = {}
+    with open(NOTES) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                data = codec.loads(line)
+                payloads[next(iter(data))] = data
+    return payloads
+
+
+PAYLOADS = notes_payloads()
+PURCHASED = PAYLOADS['itemData']['itemData']
+PLAYERS = [i for i in PURCHASED if i['itemType'] == 'player']
+
+
+def auction_item(item_data, trade_id, buy_now=900, state='active'):
+    item_data = dict(item_data, marketDataMinPrice=150,
+                     marketDataMaxPrice=10000)
+    return {
+        'tradeId': trade_id,
+        'itemData': item_data,
+        'tradeState': state,
+        'buyNowPrice': buy_now,
+        'currentBid': 0,
+        'startingBid': 150,
+        'expires': 3600 if state == 'active' else -1,
+    }
+
+
+def market_page(size=21):
+    return {
+        'auctionInfo': [
+            auction_item(dict(PLAYERS[n % len(PLAYERS)], id=n + 1),
+                         1000 + n, buy_now=300 + 50 * n) for n in range(size)
+        ]
+    }
+
+
+def tradepile_page():
+    states = ['expired', None, 'active', 'closed']
+    return {
+        'auctionInfo': [
+            auction_item(item_data, 2000 + n, buy_now=1000,
+                         state=states[n % len(states)])
+            for n, item_data in enumerate(PURCHASED)
+        ]
+    }
+
+
+class StandInAdapter(BaseAdapter):
+    """ routes (method, path) to canned json bodies """
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+        self.routes = [
+            ('GET', r'/transfermarket$', market_page()),
+            ('PUT', r'/trade/\d+/bid$', {'credits': 100000}),
+            ('GET', r'/purchased/items$', PAYLOADS['itemData']),
+            ('POST', r'/purchased/items$', PAYLOADS['duplicateItemIdList']),
+            ('PUT', r'/item$', {'itemData': []}),
+            ('POST', r'/item/\d+$', {}),
+            ('DELETE', r'/item/\d+$', PAYLOADS['items']),
+            ('POST', r'/delete/game/fifa23/item$', {}),
+            ('GET', r'/tradepile$', tradepile_page()),
+            ('POST', r'/auctionhouse$', {'id': 1}),
+            ('DELETE', r'/trade/sold$', {}),
+            ('GET', r'/user/credits$', PAYLOADS['credits']),
+        ]
+        self.bodies = [(m, re.compile(p), codec.dumps(b).encode(), 200)
+                       for m, p, b in self.routes]
+
+    def route(self, method, path, body, status=200):
+        """ answers path before the canned routes, e.g. with an error """
+        self.bodies.insert(
+            0, (method, re.compile(path), codec.dumps(body).encode(), status))
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        path = request.path_url.split('?')[0]
+        r = Response()
+        r.request = request
+        r.url = request.url
+        r.elapsed = timedelta(0)
+        r.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        r.status_code = 404
+        r._content = b''
+        for method, pattern, body, status in self.bodies:
+            if method == request.method and pattern.search(path):
+                r.status_code = status
+                r._content = body
+                break
+        return r
+
+    def close(self):
+        pass
+
+
+def no_sleep(*args, **kwargs):
+    pass
+
+
+@contextmanager
+def no_sleeps():
+    """ fifa.sleep and fifa.random_sleep do nothing inside the block """
+    saved = fifa.sleep, fifa.random_sleep
+    fifa.sleep = fifa.random_sleep = no_sleep
+    try:
+        yield
+    finally:
+        fifa.sleep, fifa.random_sleep = saved
+
+
+def make_fifa(items=None, h2=False, cfg=None):
+    """ FifaWeb against the stand-in backend, with h2 through HttpxSession
+        and the local HTTP/2 server, cfg overrides fifa23.yaml keys; run it
+        inside no_sleeps()
+    """
+    overrides = cfg or {}
+    with open(os.path.join(os.path.dirname(__file__), '..',
+                           'fifa23.yaml')) as f:
+        cfg = yaml.safe_load(f)
+    cfg.update(overrides)
+    cfg.update({
+        'base_url': BASE_URL,
+        'logfile': os.devnull,
+        'market_page_limit': 3,
+    })
+    cfg['headers']['X-UT-SID'] = SID
+    if h2:
+        import h2standin
+        cfg['base_url'], adapter, stop = h2standin.serve()
+        cfg['transport'] = {'client': 'httpx', 'http1': False}
+
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml',
+                                     delete=False) as f:
+        yaml.safe_dump(cfg, f)
+    web = fifa.FifaWeb(f.name)
+    os.unlink(f.name)
+
+    if h2:
+        web.adapter = adapter
+    else:
+        web.adapter = StandInAdapter()
+        web.requests.mount(BASE_URL, web.adapter)
+    web.AuthError = False
+    web.bid_limit = 10**9
+
+    web.catalog = fifa.catalog.Catalog([
+        fifa.templates.normalize(copy.deepcopy(t)) for t in items or [
+            {
+                'name': 'any',
+                'params': {'type': 'player', 'maxb': 1000},
+                'rating': 60,
+            },
+            {
+                'name': 'profit',
+                'params': {'type': 'player', 'maxb': 2000},
+                'profit': 100,
+            },
+        ]
+    ], {})
+
+    # warm external prices, futcards is never called
+    for item_data in PURCHASED + market_page()['auctionInfo']:
+        item_data = item_data.get('itemData', item_data)
+        web.prices_cache[item_data['resourceId']] = {
+            'price': 1200,
+            'actual': 0,
+        }
+
+    return web
@@ -0,0 +1,107 @@
+"""
+    Item templates catalogue
+
+    A Catalog is built and validated completely before it is used, so the bot
+    swaps a whole catalogue with one assignment. CatalogWatcher polls the
+    items yaml and hands over new catalogues.
+"""
+import os
+import threading
+import yaml
+import templates
+
+
+class CatalogError(ValueError):
+    """ items yaml can't be used """
+
+    def __init__(self, message, item=None):
+        super().__init__(message)
+        self.item = item
+
+
+class Catalog(object):
+
+    def __init__(self, items=None, items_dict=None, filename=None, mtime=0,
+                 keyed=False):
+        self.items = items if items is not None else []
+        self.items_dict = items_dict if items_dict is not None else {}
+        self.keyed = keyed  # items_dict is required
+        self.filename = filename
+        self.mtime = mtime
+
+
+def numeric(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def load(filename, items_dict=False):
+    filename = os.path.expanduser(filename)
+    mtime = os.stat(filename).st_mtime
+    with open(filename) as f:
+        try:
+            items = yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            raise CatalogError(str(e))
+
+    if not isinstance(items, list):
+        raise CatalogError('items yaml must be a list')
+    if not items:
+        raise CatalogError('items yaml has no templates')
+
+    by_id = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise CatalogError('wrong item', item)
+        if not isinstance(item.get('params', {}), dict):
+            raise CatalogError('wrong params', item)
+        # Define Default Arrays
+        templates.normalize(item)
+        if not numeric(item['rating']):
+            raise CatalogError('wrong rating', item)
+        params = item.get('params', {})
+        for key in ('maxb', 'minb'):
+            if key in params and not numeric(params[key]):
+                raise CatalogError('wrong {}'.format(key), item)
+        if 'profit' in item and not numeric(item['profit']):
+            raise CatalogError('wrong profit', item)
+
+        if items_dict:
+            try:
+                # or item['price'] < 0:
+                if item['definitionId'] in by_id:
+                    raise CatalogError('wrong item', item)
+            except (KeyError, ValueError, TypeError):
+                raise CatalogError('wrong item', item)
+
+            by_id[item['definitionId']] = item
+
+    return Catalog(items, by_id, filename, mtime, items_dict)
+
+
+class CatalogWatcher(threading.Thread):
+    """ polls mtime of the items yaml and loads changed files """
+
+    def __init__(self, filename, items_dict, callback, error_callback,
+                 interval=5):
+        super().__init__(daemon=True)
+        self.filename = os.path.expanduser(filename)
+        self.items_dict = items_dict
+        self.callback = callback
+        self.error_callback = error_callback
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.mtime = os.stat(self.filename).st_mtime
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                mtime = os.stat(self.filename).st_mtime
+                if mtime == self.mtime:
+                    continue
+                self.mtime = mtime
+                self.callback(load(self.filename, self.items_dict))
+            except (OSError, CatalogError) as e:
+                self.error_callback(e)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,107 @@
+"""
+    JSON codec used for responses, logs and local stores
+
+    orjson or msgspec are used when installed, stdlib json otherwise.
+    Every backend error is raised as DecodeError.
+"""
+import re
+import json
+
+try:
+    import orjson
+
+    BACKEND = 'orjson'
+    _errors = (orjson.JSONDecodeError, )
+    _loads = orjson.loads
+
+    def _dumps(obj):
+        return orjson.dumps(
+            obj, option=orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+except ImportError:
+    try:
+        import msgspec
+
+        BACKEND = 'msgspec'
+        _errors = (msgspec.DecodeError, )
+        _loads = msgspec.json.decode
+        _encoder = msgspec.json.Encoder()
+
+        def _dumps(obj):
+            return _encoder.encode(obj).decode()
+
+    except ImportError:
+        BACKEND = 'json'
+        _errors = (ValueError, )
+        _loads = json.loads
+        _dumps = json.dumps
+
+
+class DecodeError(ValueError):
+    """ body isn't a valid json """
+    pass
+
+
+def loads(data):
+    try:
+        if isinstance(data, str):
+            # lone surrogates can't be encoded
+            data = data.encode()
+        return _loads(data)
+    except _errors + (UnicodeError, ) as e:
+        raise DecodeError(str(e))
+
+
+def dumps(obj):
+    return _dumps(obj)
+
+
+_TOKEN = re.compile(r'["{}\[\]]')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+
+
+def value_end(text, pos):
+    """ end of the json object or array at pos, None if text ends first """
+    depth = 0
+    while True:
+        m = _TOKEN.search(text, pos)
+        if m is None:
+            return None
+        if m.group() == '"':
+            string = _STRING.match(text, m.start())
+            if string is None:
+                return None
+            pos = string.end()
+            continue
+        depth += 1 if m.group() in '{[' else -1
+        pos = m.end()
+        if not depth:
+            return pos
+
+
+def response_json(r):
+    """ decoded response body, every response is decoded only once """
+    try:
+        data = r.__dict__['_decoded']
+    except KeyError:
+        try:
+            data = loads(r.content)
+        except DecodeError as e:
+            data = e
+        r.__dict__['_decoded'] = data
+
+    if isinstance(data, DecodeError):
+        raise data
+
+    return data
+
+
+def response_data(r):
+    """ decoded body for logs: json or the raw text """
+    if not r.content:
+        return ''
+    try:
+        return response_json(r)
+    except DecodeError:
+        return r.text
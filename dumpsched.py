@@ -0,0 +1,124 @@
+"""
+    Dump scheduler for market templates
+
+    Every template gets a due time: the last dump plus an interval which
+    shrinks with the observed price volatility. State is kept by
+    templates.template_key, so it follows a template when a reload moves it.
+    Templates are kept in a heap
+    by due time and a token bucket limits UT requests per minute, every page
+    of a dump takes a token.
+
+    Volatility is tracked on the cheapest buy now of every dump. The search
+    maxb moves between dumps, so the median of a dump follows the search
+    window, while the cheapest listing below maxb is set by the market.
+"""
+import heapq
+from math import log, sqrt
+
+
+class TemplateState(object):
+
+    def __init__(self, key):
+        self.key = key
+        self.dumps = 0
+        self.observations = 0
+        self.last_dump = None
+        self.floor = None  # cheapest buy now of the last dump
+        self.variance = None  # ewma of squared log changes of the floor
+
+    def volatility(self):
+        # unknown volatility counts as high
+        return sqrt(self.variance) if self.variance is not None else 1.0
+
+    def observe(self, prices, alpha):
+        self.dumps += 1
+        self.observations += len(prices)
+        if not prices:
+            return
+
+        floor = min(prices)
+        if self.floor and floor > 0:
+            change = log(floor / self.floor)**2
+            self.variance = change if self.variance is None else \
+                alpha * change + (1 - alpha) * self.variance
+        self.floor = floor
+
+
+class DumpScheduler(object):
+
+    def __init__(self, keys, budget=20, interval=600, alpha=0.3):
+        self.budget = budget  # requests per minute
+        self.interval = interval  # refresh interval of a calm template
+        self.alpha = alpha
+        self.tokens = budget
+        self.refilled = None
+        self.keys = []
+        self.states = {}  # template key -> TemplateState
+        self.heap = []
+        self.update(keys)
+
+    def update(self, keys):
+        """ template keys after items reload, known ones keep their state """
+        self.keys = list(keys)
+        self.states = {
+            key: self.states.get(key) or TemplateState(key)
+            for key in self.keys
+        }
+        self.heap = [(self.due(s), s.key) for s in self.states.values()]
+        heapq.heapify(self.heap)
+
+    def due(self, state):
+        if state.last_dump is None:
+            return 0
+        return state.last_dump + self.interval / (1 + 10 * state.volatility())
+
+    def refill(self, now):
+        if self.refilled is not None:
+            self.tokens = min(
+                self.budget,
+                self.tokens + (now - self.refilled) * self.budget / 60)
+        self.refilled = now
+
+    def token_wait(self, now):
+        """ seconds to wait until the budget allows one more request """
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) * 60 / self.budget
+
+    def charge(self, now, requests=1):
+        self.refill(now)
+        self.tokens -= requests
+
+    def wait_time(self, now):
+        """ seconds until the earliest template is due """
+        if not self.heap:
+            return self.interval
+        return max(self.heap[0][0] - now, 0)
+
+    def pop(self):
+        """ key of the template with the earliest due time or None """
+        if not self.heap:
+            return None
+        due, key = heapq.heappop(self.heap)
+        return key
+
+    def requeue(self, key):
+        """ the dump failed, keep the due time of the last one """
+        heapq.heappush(self.heap, (self.due(self.states[key]), key))
+
+    def done(self, key, prices, now):
+        state = self.states[key]
+        state.observe(prices, self.alpha)
+        state.last_dump = now
+        heapq.heappush(self.heap, (self.due(state), key))
+
+    def metrics(self, now):
+        """ coverage and freshness per template """
+        return [{
+            'template': s.key,
+            'dumps': s.dumps,
+            'observations': s.observations,
+            'age': now - s.last_dump if s.last_dump is not None else -1,
+            'volatility': s.volatility(),
+        } for s in self.states.values()]
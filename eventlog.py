@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+    Binary event log
+
+    Typed events (search, bid, move, quick sell, list, sold, pack) are kept as
+    fixed-width records in segment files, written in batches. A sealed
+    segment ends with an index of blocks of BLOCK_SIZE records: time range and
+    event types of every block, so queries mmap a segment and only look at
+    the blocks they need. A segment without the index (still open or after a
+    crash) is scanned whole. Open logs are closed at exit and by close_all
+    on paths which skip atexit.
+
+    ./eventlog.py events/ --type bid --template 3 --since 2026-10-18
+    ./eventlog.py events/ --resource 20801 --since '2026-10-18 12:00' --summary
+"""
+import os
+import sys
+import atexit
+import struct
+import weakref
+import argparse
+from datetime import datetime
+from time import time
+import numpy as np
+import codec
+
+SEARCH = 1
+BID = 2
+MOVE = 3
+QUICK_SELL = 4
+LIST = 5
+SOLD = 6
+PACK = 7
+TYPES = {
+    'search': SEARCH,
+    'bid': BID,
+    'move': MOVE,
+    'quick_sell': QUICK_SELL,
+    'list': LIST,
+    'sold': SOLD,
+    'pack': PACK,
+}
+TYPE_NAMES = {v: k for k, v in TYPES.items()}
+
+EVENT = np.dtype([
+    ('time', '<f8'),
+    ('type', 'u1'),
+    ('template', '<i2'),  # -1 if the event isn't tied to a template
+    ('resourceId', '<i8'),
+    ('itemId', '<i8'),
+    ('tradeId', '<i8'),
+    ('price', '<i4'),
+    ('value', '<i4'),  # profit, count, pile, packId - depends on the type
+])
+BLOCK = np.dtype([
+    ('first', '<f8'),
+    ('last', '<f8'),
+    ('types', '<u4'),  # bit per event type
+    ('count', '<u4'),
+])
+BLOCK_SIZE = 1024
+
+MAGIC = b'FEVT'
+INDEX_MAGIC = b'FIDX'
+HEADER = struct.Struct('<4sII4x')  # magic, version, record size
+TRAILER = struct.Struct('<QI4s')  # index offset, blocks, magic
+VERSION = 1
+
+_open_logs = weakref.WeakSet()
+
+
+def blocks(events):
+    """ index entries of a record array """
+    index = np.zeros((len(events) + BLOCK_SIZE - 1) // BLOCK_SIZE, BLOCK)
+    for n in range(len(index)):
+        block = events[n * BLOCK_SIZE:(n + 1) * BLOCK_SIZE]
+        index[n] = (block['time'].min(), block['time'].max(),
+                    np.bitwise_or.reduce(1 << block['type'].astype('<u4')),
+                    len(block))
+    return index
+
+
+class EventLog(object):
+
+    def __init__(self, directory, batch=256, flush_interval=5,
+                 segment_records=1 << 20):
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.segment_records = segment_records
+        self.pending = []
+        self.flushed_at = time()
+        self.f = None
+        self.records = 0
+        self.index = []  # BLOCK entries of the open segment
+        self.tail = np.zeros(0, EVENT)  # records of the unfinished block
+        _open_logs.add(self)
+
+    def open_segment(self, now):
+        filename = os.path.join(self.directory,
+                                'events-{:.6f}.seg'.format(now))
+        self.f = open(filename, 'wb')
+        self.f.write(HEADER.pack(MAGIC, VERSION, EVENT.itemsize))
+        self.records = 0
+        self.index = []
+        self.tail = np.zeros(0, EVENT)
+
+    def add(self, type, template=-1, resourceId=0, itemId=0, tradeId=0,
+            price=0, value=0, now=None):
+        now = now or time()
+        self.pending.append((now, type, template, resourceId or 0, itemId
+                             or 0, tradeId or 0, price or 0, value or 0))
+        if len(self.pending) >= self.batch or \
+                now - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def tick(self, now=None):
+        """ flush events which waited flush_interval, between loop steps """
+        if self.pending and \
+                (now or time()) - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.flushed_at = time()
+        if not self.pending:
+            return
+        events = np.array(self.pending, EVENT)
+        self.pending = []
+
+        while len(events):
+            if self.f is None:
+                self.open_segment(events['time'][0])
+            n = min(len(events), self.segment_records - self.records)
+            self.f.write(events[:n].tobytes())
+            self.records += n
+            self.tail = np.concatenate([self.tail, events[:n]])
+            full = len(self.tail) // BLOCK_SIZE * BLOCK_SIZE
+            if full:
+                self.index.append(blocks(self.tail[:full]))
+                self.tail = self.tail[full:]
+            events = events[n:]
+            if self.records >= self.segment_records:
+                self.seal()
+        if self.f is not None:
+            self.f.flush()
+
+    def seal(self):
+        """ write the block index and close the segment """
+        index = np.concatenate(self.index + [blocks(self.tail)])
+        offset = self.f.tell()
+        self.f.write(index.tobytes())
+        self.f.write(TRAILER.pack(offset, len(index), INDEX_MAGIC))
+        self.f.close()
+        self.f = None
+
+    def close(self):
+        self.flush()
+        if self.f is not None:
+            self.seal()
+
+
+def close_all():
+    """ flush and seal every open log """
+    for log in list(_open_logs):
+        log.close()
+
+
+atexit.register(close_all)
+
+
+class NoEventLog(object):
+    """ used when event_log isn't set in config """
+
+    def add(self, *args, **kwargs):
+        pass
+
+    def tick(self, now=None):
+        pass
+
+    def close(self):
+        pass
+
+
+def read_segment(filename):
+    """ (mmapped records, block index or None) """
+    size = os.path.getsize(filename)
+    if size < HEADER.size:
+        return np.zeros(0, EVENT), None
+    with open(filename, 'rb') as f:
+        magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or record_size != EVENT.itemsize:
+            raise ValueError('{} is not an event segment'.format(filename))
+        f.seek(max(size - TRAILER.size, 0))
+        offset, count, index_magic = TRAILER.unpack(f.read(TRAILER.size))
+
+    data = np.memmap(filename, np.uint8, 'r')
+    if index_magic == INDEX_MAGIC:
+        records = data[HEADER.size:offset].view(EVENT)
+        index = data[offset:offset + count * BLOCK.itemsize].view(BLOCK)
+        return records, index
+
+    # open or torn segment, whole records only
+    count = (size - HEADER.size) // EVENT.itemsize
+    end = HEADER.size + count * EVENT.itemsize
+    return data[HEADER.size:end].view(EVENT), None
+
+
+def segment_start(filename):
+    try:
+        return float(os.path.basename(filename)[len('events-'):-len('.seg')])
+    except ValueError:
+        return 0
+
+
+def query(directory, since=None, until=None, types=None, resourceId=None,
+          template=None):
+    """ yields record arrays which match all given filters """
+    since = since or 0
+    until = until or float('inf')
+    mask = 0
+    for t in types or []:
+        mask |= 1 << t
+
+    filenames = sorted(
+        (os.path.join(directory, f)
+         for f in os.listdir(directory) if f.endswith('.seg')),
+        key=segment_start)
+    for n, filename in enumerate(filenames):
+        # next segment starts after the last event of this one
+        if segment_start(filename) > until or \
+                (n + 1 < len(filenames)
+                 and segment_start(filenames[n + 1]) < since):
+            continue
+
+        records, index = read_segment(filename)
+        if index is not None:
+            wanted = (index['last'] >= since) & (index['first'] <= until)
+            if mask:
+                wanted &= (index['types'] & mask) != 0
+            chunks = [
+                records[i * BLOCK_SIZE:(i + 1) * BLOCK_SIZE]
+                for i in np.flatnonzero(wanted)
+            ]
+        else:
+            chunks = [records]
+
+        for chunk in chunks:
+            found = (chunk['time'] >= since) & (chunk['time'] <= until)
+            if types:
+                found &= np.isin(chunk['type'], list(types))
+            if resourceId is not None:
+                found &= chunk['resourceId'] == resourceId
+            if template is not None:
+                found &= chunk['template'] == template
+            if found.any():
+                yield np.array(chunk[found])
+
+
+def to_dict(event):
+    return {
+        'time': datetime.fromtimestamp(event['time']).isoformat(),
+        'type': TYPE_NAMES.get(int(event['type']), int(event['type'])),
+        'template': int(event['template']),
+        'resourceId': int(event['resourceId']),
+        'itemId': int(event['itemId']),
+        'tradeId': int(event['tradeId']),
+        'price': int(event['price']),
+        'value': int(event['value']),
+    }
+
+
+def parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the event log')
+    parser.add_argument('directory')
+    parser.add_argument('--since', type=parse_time,
+                        help='unix time or iso date')
+    parser.add_argument('--until', type=parse_time)
+    parser.add_argument('--type', action='append', choices=sorted(TYPES))
+    parser.add_argument('--resource', type=int, help='resourceId')
+    parser.add_argument('--template', type=int, help='template index')
+    parser.add_argument('--summary', action='store_true',
+                        help='count, price and value sums per event type')
+    args = parser.parse_args()
+
+    found = query(args.directory, args.since, args.until,
+                  [TYPES[t] for t in args.type or []], args.resource,
+                  args.template)
+
+    if not args.summary:
+        for events in found:
+            for event in events:
+                sys.stdout.write(codec.dumps(to_dict(event)) + '\n')
+        return
+
+    summary = {}
+    for events in found:
+        for t in np.unique(events['type']):
+            selected = events[events['type'] == t]
+            s = summary.setdefault(TYPE_NAMES.get(int(t), int(t)), {
+                'count': 0,
+                'price': 0,
+                'value': 0,
+            })
+            s['count'] += len(selected)
+            s['price'] += int(selected['price'].sum())
+            s['value'] += int(selected['value'].sum())
+    print(codec.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
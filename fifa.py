@@ -3,8 +3,6 @@ import sys
 import os
 import requests
 import yaml
-import simplejson
-import json
 from random import randint, uniform
 from time import sleep, time_ns, time
 import argparse
@@ -15,23 +13,32 @@ from influxdb_client.client.write_api import ASYNCHRONOUS
 from aiohttp import web
 import asyncio
 import threading
+import gc
 from uuid import UUID
+import codec
+import ladder
+import sbc
+import templates
+import packs
+from packs import PackHistory
+from tradepile import TradePile
+from observations import ObservationFilter
+import recovery
+import journal
+from journal import Journal, NoJournal
+import catalog
+from catalog import CatalogError
+from dumpsched import DumpScheduler
+from bandit import TemplateSelector
+from ledger import Ledger
+import analytics
+import memwatch
+import eventlog
+import transport
 
 
 def delta_by_price(price):
-    steps = (
-        (1000, 50),
-        (10000, 100),
-        (50000, 250),
-        (100000, 500),
-        (1000000, 1000),
-    )
-
-    for step in steps:
-        if price < step[0]:
-            return step[1]
-
-    return 0
+    return ladder.tick(price)
 
 
 def blur_price(s, ratio=1, min_price=200):
@@ -64,7 +71,7 @@ def blur_price(s, ratio=1, min_price=200):
     if value > s:
         value = s
 
-    value = (value // delta) * delta
+    value = ladder.floor(value)
 
     return value if value > min_price else min_price
 
@@ -78,40 +85,53 @@ def jsonize(text):
         return ''
 
     try:
-        return json.loads(text)
-    except json.decoder.JSONDecodeError:
+        return codec.loads(text)
+    except codec.DecodeError:
         return text
 
 
-def itemdata2tags(itemdata):
-    tag_keys = [
-        'rating',
-        'itemType',
-        'resourceId',
-        'cardsubtypeid',
-        'preferredPosition',
-        'rareflag',
-        'playStyle',
-        'leagueId',
-        'nation',
-        'attributeArray',
-        'skillmoves',
-        'weakfootabilitytypecode',
-        'attackingworkrate',
-        'defensiveworkrate',
-        'preferredfoot',
-    ]
-    tags = {}
-    for k in itemdata:
-        if k in tag_keys:
-            tags[k] = str(itemdata[k])
-
-    return tags
+TAG_KEYS = (
+    'rating',
+    'itemType',
+    'resourceId',
+    'cardsubtypeid',
+    'rareflag',
+    'leagueId',
+    'nation',
+    'attributeArray',
+    'skillmoves',
+    'weakfootabilitytypecode',
+    'attackingworkrate',
+    'defensiveworkrate',
+    'preferredfoot',
+)
+# can differ between cards of the same player
+CARD_TAG_KEYS = (
+    'preferredPosition',
+    'playStyle',
+)
+
+
+def itemdata2tags(itemdata, keys=TAG_KEYS + CARD_TAG_KEYS):
+    return {k: str(itemdata[k]) for k in keys if k in itemdata}
+
+
+def card_tags(itemdata):
+    return itemdata2tags(itemdata, CARD_TAG_KEYS)
+
+
+def player_tags(itemdata):
+    return itemdata2tags(itemdata, TAG_KEYS)
 
 
 def move_maxb(maxb, multiplier=1.01, delta=100):
-    new_maxb = maxb * multiplier // 100 * 100
-    return new_maxb if abs(new_maxb - maxb) > abs(delta) else maxb + delta
+    """ move maxb by multiplier, but not less than delta, on the ladder """
+    if abs(maxb * multiplier - maxb) <= abs(delta):
+        return ladder.ceil(maxb + delta) if delta > 0 else \
+            max(ladder.floor(maxb + delta), ladder.MIN_PRICE)
+
+    return ladder.ceil(maxb * multiplier) if multiplier > 1 else \
+        max(ladder.floor(maxb * multiplier), ladder.MIN_PRICE)
 
 
 def is_valid_uuid(uuid_to_test, version=4):
@@ -144,8 +164,8 @@ def is_valid_uuid(uuid_to_test, version=4):
 
 def auction_info_items(r):
     try:
-        return r.json()['auctionInfo']
-    except (KeyError, json.decoder.JSONDecodeError):
+        return codec.response_json(r)['auctionInfo']
+    except (KeyError, codec.DecodeError):
         pass
 
     return []
@@ -162,7 +182,22 @@ def pure_item(item):
 
 class SessionException(Exception):
     """ Exception Session """
-    pass
+
+    def __init__(self, message='', status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# runtime state which survives restarts through the journal
+JOURNAL_KEYS = (
+    'quick_sell_ids',
+    'purchased_count',
+    'bid_limit',
+    'credits',
+    'buy_pack_fails',
+    'transfer_closed',
+    'dump_maxb',
+)
 
 
 class FifaWeb(object):
@@ -182,11 +217,25 @@ class FifaWeb(object):
         self.bid_limit = 1
         self.prices_cache = {}
         self.buy_pack_fails = 0
+        self.catalog = catalog.Catalog()
+        self.pending_catalog = None
+        self.catalog_watcher = None
+        self.dump_maxb = {}  # template key -> maxb of the next dump
+        self.dump_scheduler = None
+        self.last_dump = None
         with open(os.path.expanduser(config_file)) as f:
             self.cfg = yaml.safe_load(f)
 
+        # uniform choice of templates when template_policy is random
+        self.selector = None
+        if self.cfg.get('template_policy', 'thompson') == 'thompson':
+            self.selector = TemplateSelector(self.cfg.get('template_stats'))
+        self.last_search = None
+        self.last_profit = None
+
         # define some constants
         self.purchased_count = 0
+        self.purchased_dirty = True  # purchased pile needs a fetch
         self.empty_searches = 0
         self.transfer_closed = False
         self.SID_NAME = 'X-UT-SID'
@@ -251,10 +300,64 @@ class FifaWeb(object):
             self.influx_write_client = self.influxdb.write_api(
                 write_options=ASYNCHRONOUS)
 
-        # Create requests session
-        self.requests = requests.Session()
+        # Typed events for the query cli
+        self.events = eventlog.EventLog(
+            self.cfg['event_log'],
+            flush_interval=self.cfg.get('event_flush_interval', 5)) \
+            if 'event_log' in self.cfg else eventlog.NoEventLog()
+
+        # RSS and structure entry counts, tracemalloc diffs when tracing
+        soft_limit = self.cfg.get('memory_soft_limit')  # MB
+        self.memory = memwatch.MemoryWatch(
+            self.cfg.get('memory_interval', 300),
+            soft_limit * 1024 * 1024 if soft_limit else None)
+
+        # Deduplication of market observations
+        self.observations = ObservationFilter(
+            player_tags, card_tags,
+            seen_limit=self.cfg.get('seen_limit', 100000))
+
+        # Local market observations store for backtest.py
+        self.market_history = None
+        if 'market_history' in self.cfg:
+            self.market_history = open(
+                os.path.expanduser(self.cfg['market_history']), 'a',
+                buffering=1)
+
+        # Observations for the analytics process
+        self.analytics = analytics.NoAnalytics()
+        if self.cfg.get('analytics'):
+            self.analytics = analytics.Analytics(
+                self.cfg.get('analytics_ring_size', 65536),
+                self.cfg.get('analytics_table_size', 4096))
+
+        # Credits and capital from responses
+        self.ledger = Ledger(self.cfg.get('credits_max_age', 600))
+
+        # Pack analytics
+        self.packs = PackHistory(self.cfg.get('pack_history'),
+                                 prices=self.cfg.get('pack_prices', {}))
+
+        # Known tradepile state
+        self.tradepile_state = TradePile(
+            self.cfg.get('tradepile_max_interval', 600),
+            self.cfg.get('tradepile_active_interval', 60))
+
+        # In-process recovery from session errors
+        self.recovery = recovery.Recovery(
+            self.cfg.get('recovery_backoff', {}),
+            self.cfg.get('recovery_max_attempts', 10))
+        self.recovery_kind = None
+        self.stopped = threading.Event()
+
+        # Create requests session, httpx with transport: {client: httpx}
+        self.requests = transport.session(self.cfg.get('transport', {}))
         self.requests.headers.update(self.cfg['headers'])
 
+        # attached last, so the defaults above don't go to the journal
+        self.journal = Journal(self.cfg['journal']) if 'journal' in self.cfg \
+            else NoJournal()
+
         # Validate request
         self.AuthError = self.valid_request()
 
@@ -277,46 +380,85 @@ class FifaWeb(object):
 
         return method
 
+    def __setattr__(self, attr, value):
+        """ Journal runtime state changes """
+        object.__setattr__(self, attr, value)
+        if attr in JOURNAL_KEYS and 'journal' in self.__dict__:
+            self.journal.record(**{attr: value})
+
+    def RestoreJournal(self):
+        """ restore state from the journal, makes no requests """
+        for key in JOURNAL_KEYS:
+            if key in self.journal.state:
+                object.__setattr__(self, key, self.journal.state[key])
+        if 'credits' in self.journal.state:
+            self.ledger.restored(self.credits)
+
+        self.log({'journal_restored': self.journal.state})
+
+    @property
+    def Items(self):
+        return self.catalog.items
+
+    @property
+    def ItemsDict(self):
+        return self.catalog.items_dict
+
     def load_items(self, filename, items_dict=False):
-        self.Items = []
-        self.ItemsDict = {}
-        with open(os.path.expanduser(filename)) as f:
-            self.Items = yaml.safe_load(f)
+        try:
+            self.catalog = catalog.load(filename, items_dict)
+        except CatalogError as e:
+            self.log({str(e): e.item})
+            return False
 
-        # Define Default Arrays
-        for item in self.Items:
-            # any excludePositions
-            item['excludePositions'] = item['excludePositions'] if 'excludePositions' in item \
-                else []
-            item['rating'] = item[
-                'rating'] if 'rating' in item else 0  # any rating
-            # any resourceId
-            item['resourceId'] = item[
-                'resourceId'] if 'resourceId' in item else 0
-
-            if items_dict:
-                try:
-                    # or item['price'] < 0:
-                    if item['definitionId'] in self.ItemsDict:
-                        self.log({'wrong item': item})
-                        return False
-                except (KeyError, ValueError, TypeError):
-                    self.log({'wrong item': item})
-                    return False
-
-                self.ItemsDict[item['definitionId']] = item
+        return True
+
+    def ReloadItems(self):
+        """ parse items yaml off the loop, it is applied by ApplyCatalog """
+        try:
+            self.SetPendingCatalog(
+                catalog.load(self.catalog.filename,
+                             self.catalog.keyed))
+        except (OSError, CatalogError) as e:
+            self.CatalogError(e)
+            return False
 
         return True
 
+    def SetPendingCatalog(self, new_catalog):
+        self.pending_catalog = new_catalog
+        self.log({'items_reloaded': new_catalog.filename})
+
+    def CatalogError(self, e):
+        self.log({
+            'items_reload_error': str(e),
+            'item': getattr(e, 'item', None),
+        })
+
+    def ApplyCatalog(self):
+        """ swap the whole catalogue between loop steps """
+        new_catalog, self.pending_catalog = self.pending_catalog, None
+        if new_catalog:
+            self.catalog = new_catalog
+            self.log({'items_applied': len(new_catalog.items)})
+
+    def WatchItems(self, interval):
+        self.catalog_watcher = catalog.CatalogWatcher(
+            self.catalog.filename, self.catalog.keyed,
+            self.SetPendingCatalog, self.CatalogError, interval)
+        self.catalog_watcher.start()
+
     def log_request(self, r, level='debug'):
         if level not in ['info', 'debug']:
             return
 
+        fields = {
+            'size': len(r.content),
+            'request_time': r.elapsed.total_seconds(),
+        }
+        fields.update(getattr(r, 'timing', {}))
         self.SaveToInflux('request',
-                          fields={
-                              'size': len(r.content),
-                              'request_time': r.elapsed.total_seconds(),
-                          },
+                          fields=fields,
                           tags={
                               'status_code': r.status_code,
                               'url': r.request.url,
@@ -334,7 +476,7 @@ class FifaWeb(object):
             'response': {
                 'status': r.status_code,
                 'headers': dict(r.headers),
-                'data': jsonize(r.text),
+                'data': codec.response_data(r),
             }
         }
 
@@ -351,9 +493,10 @@ class FifaWeb(object):
         self.log({
             'headers': '{}'.format(self.app['headers']),
         })
-        while not self.app or \
-                self.SID_NAME not in self.app['headers'] or \
-                self.app['headers'][self.SID_NAME] == self.invalid_sid:
+        while (not self.app or
+               self.SID_NAME not in self.app['headers'] or
+               self.app['headers'][self.SID_NAME] == self.invalid_sid) and \
+                not self.stopped.is_set():
 
             try:
                 self.log({
@@ -365,7 +508,7 @@ class FifaWeb(object):
                 self.log({
                     'text': 'wait first headers from plugin',
                 })
-            sleep(1)
+            self.stopped.wait(1)
 
             self.get_headers_from_app()
 
@@ -431,7 +574,7 @@ class FifaWeb(object):
             self.log_request(r)
         else:
             self.log_request(r, level='info')
-            raise SessionException('UT API Error')
+            raise SessionException('UT API Error', r.status_code)
 
     def get(self, url, params={}):
         r = self.requests.get(url, params=params)
@@ -464,7 +607,7 @@ class FifaWeb(object):
         except AttributeError:
             func = getattr(self.logger, 'info')
 
-        return func(json.dumps(message))
+        return func(codec.dumps(message))
 
     def search(self, params):
         payload = self.cfg['params'].copy()
@@ -472,6 +615,7 @@ class FifaWeb(object):
         r = self.get(self.cfg['urls']['market'], params=payload)
 
         items = auction_info_items(r)
+        self.analytics.publish(items, analytics.SEARCH)
         if len(items) == 0 and \
                 'start' in params and \
                 params['start'] == 0:
@@ -481,7 +625,9 @@ class FifaWeb(object):
 
     def tradepile(self):
         r = self.get(self.cfg['urls']['tradepile'])
-        return auction_info_items(r)
+        items = auction_info_items(r)
+        self.analytics.publish(items, analytics.TRADEPILE)
+        return items
 
     def SearchByIndex(self, index, page=0, maxb=None):
         try:
@@ -497,7 +643,10 @@ class FifaWeb(object):
                 if 'minb' in params:
                     params['minb'] = blur_price(params['maxb'], 0.4)
             params['start'] = self.cfg['market_page_size'] * page
-            return self.search(params)
+            items = self.search(params)
+            self.events.add(eventlog.SEARCH, template=index,
+                            price=params.get('maxb', 0), value=len(items))
+            return items
         except (IndexError, KeyError):
             return {}
 
@@ -509,8 +658,8 @@ class FifaWeb(object):
         r = self.get(self.cfg['urls']['club'], params=payload)
 
         try:
-            return r.json()['itemData']
-        except (KeyError, json.decoder.JSONDecodeError):
+            return codec.response_json(r)['itemData']
+        except (KeyError, codec.DecodeError):
             pass
 
         return []  # retrun empty dict if something wrong
@@ -529,52 +678,132 @@ class FifaWeb(object):
 
         return players
 
+    def GetSbcSets(self):
+        r = self.get(self.cfg['urls']['sets'])
+        try:
+            return [
+                s for category in codec.response_json(r)['categories']
+                for s in category['sets']
+            ]
+        except (KeyError, codec.DecodeError):
+            pass
+
+        return []
+
+    def GetSbcChallenges(self, setId):
+        r = self.get(self.cfg['urls']['setId'].format(setId))
+        try:
+            return codec.response_json(r)['challenges']
+        except (KeyError, codec.DecodeError):
+            pass
+
+        return []
+
+    def GetSbcMarket(self):
+        """ market fill-ins from sbc_market search params in config """
+        items = []
+        for params in self.cfg.get('sbc_market', []):
+            items += self.search(params)
+            random_sleep(0.5, 1.5)
+
+        return items
+
+    def ListSbcSets(self):
+        sets = [{
+            'setId': s.get('setId'),
+            'name': s.get('name'),
+            'challenges': s.get('challengesCount'),
+        } for s in self.GetSbcSets()]
+        self.log({'sbc_sets': sets})
+        return sets
+
+    def SbcPriceFunc(self):
+        """ club card prices from what is known already, no requests """
+        templates = {
+            i['resourceId']: i['price']
+            for i in self.Items if i.get('resourceId') and 'price' in i
+        }
+
+        def price(item_data):
+            resourceId = item_data.get('resourceId')
+            found = self.MarketPrice(resourceId)
+            if found is None:
+                found = self.prices_cache.get(resourceId,
+                                              templates.get(resourceId))
+            if isinstance(found, dict):  # futcards player info
+                found = found.get('price')
+            try:
+                return int(found)
+            except (TypeError, ValueError):
+                return item_data.get('discardValue', 0)
+
+        return price
+
+    def SolveSbc(self, setId):
+        club = self.GetClubPlayers()
+        market = self.GetSbcMarket()
+        price_func = self.SbcPriceFunc()
+        results = []
+        for challenge in self.GetSbcChallenges(setId):
+            if challenge.get('status') == 'COMPLETED':
+                continue
+            result = sbc.solve(challenge, club, market, price_func=price_func)
+            self.log({'sbc': result})
+            results.append(result)
+
+        return results
+
     def ItemSuited(self, index, item):
-        if item['itemData']['itemType'] == 'player':
-            if item['itemData']['rating'] < self.Items[index]['rating']:
-                return False
-
-            if item['itemData']['preferredPosition'] in self.Items[index][
-                    'excludePositions']:
-                return False
-
-            if 'profit' in self.Items[index]:
-                profit = self.GetExternalPrice(item['itemData']['resourceId']
-                                               ) * 0.95 - item['buyNowPrice']
-                self.log({'potential_profit': profit, 'credits': self.credits})
-                if profit >= self.Items[index]['profit']:
-                    return True
-                else:
-                    return False
-            elif item['buyNowPrice'] <= self.Items[index]['params']['maxb']:
-                return True
-
-        if item['itemData']['itemType'] == 'training' and \
-                item['itemData']['cardsubtypeid'] in [220, 107, 108, 268, 266, 262]:
-            return True
+        suited, profit = templates.item_suited(self.Items[index], item,
+                                               self.GetExternalPrice)
+        self.last_profit = profit
+        if profit is not None:
+            self.log({
+                'potential_profit': profit,
+                'credits': self.credits,
+                'market_price':
+                self.MarketPrice(item['itemData']['resourceId']),
+            })
+            if suited and self.last_search is not None:
+                self.last_search['profits'].append(profit)
 
-        return False
+        return suited
+
+    def MarketPrice(self, resourceId):
+        """ median buy now from the analytics process or None """
+        return self.analytics.price(resourceId)
 
     def set_credits(self, credits):
-        """ dumb function for budget calculatein in future """
-        self.credits = int(credits)
+        """ balance from a server response """
+        self.ledger.balance(credits)
+        self.credits = self.ledger.credits
         self.SaveToInflux('credits', fields={'total': self.credits}, tags={})
 
+    def CanAfford(self, coins):
+        available = self.ledger.available()
+        if available is None or coins <= available:
+            return True
+        self.log({'cant_afford': coins, 'available': available})
+        return False
+
     def Bid(self, tradeId, bid):
+        self.ledger.bid(tradeId, bid)
         r = self.put(
             self.cfg['urls']['bid'].format(tradeId),
             json={'bid': bid},
         )
 
         try:
-            self.set_credits(r.json()['credits'])
-        except (KeyError, json.decoder.JSONDecodeError,
-                simplejson.errors.JSONDecodeError):
-            pass
+            credits = codec.response_json(r)['credits']
+        except (KeyError, codec.DecodeError):
+            credits = None
+        self.ledger.bid_done(tradeId, r.status_code == 200, credits)
+        self.credits = self.ledger.credits or 0
 
         if r.status_code != 200:
             return False
 
+        self.purchased_dirty = True
         if self.bid_limit:
             self.bid_limit -= 1
 
@@ -582,11 +811,21 @@ class FifaWeb(object):
         return True
 
     def SaveItem(self, item):
+        # same trade with the same price and state is already saved
+        if not self.observations.changed(item):
+            return
+
+        tags = self.observations.item_tags(item['itemData'])
+        if self.market_history:
+            record = dict(tags)
+            record.update({'time': time(), 'buynow': item['buyNowPrice']})
+            self.market_history.write(codec.dumps(record) + '\n')
+
         if self.influx_write_client:
             self.influx_write_client.write(
                 self.cfg['influxdb']['bucket'], self.cfg['influxdb']['org'], {
                     "measurement": "items",
-                    "tags": itemdata2tags(item['itemData']),
+                    "tags": tags,
                     "fields": {
                         "buynow": item['buyNowPrice']
                     },
@@ -607,8 +846,15 @@ class FifaWeb(object):
         if not maxb:
             maxb = self.Items[index]['params']['maxb']
 
+        # seen prices for the dump scheduler
+        self.last_dump = {'requests': 0, 'prices': []}
         for page in range(self.cfg['market_page_limit']):
+            if self.dump_scheduler:
+                # every page is a request within the budget
+                self.stopped.wait(self.dump_scheduler.token_wait(time()))
+                self.dump_scheduler.charge(time())
             items = self.SearchByIndex(index, page=page, maxb=maxb)
+            self.last_dump['requests'] += 1
             random_sleep(0.5, 1.5)
             if not items and page == 0:
                 maxb = move_maxb(maxb, 1.05, delta=100)
@@ -616,6 +862,7 @@ class FifaWeb(object):
 
             for item in items:
                 self.SaveItem(item)
+                self.last_dump['prices'].append(item['buyNowPrice'])
                 # self.log(item)
 
             if len(items
@@ -628,14 +875,94 @@ class FifaWeb(object):
 
         return maxb
 
+    def DumpNext(self):
+        """ dump the earliest due template within the request budget """
+        keys = [templates.template_key(t) for t in self.Items]
+        if keys != self.dump_scheduler.keys:
+            self.dump_scheduler.update(keys)
+
+        if self.stopped.wait(self.dump_scheduler.wait_time(time())):
+            return
+        key = self.dump_scheduler.pop()
+        if key is None:
+            return
+        index = keys.index(key)
+        try:
+            maxb = self.DumpItemByIndex(index, self.dump_maxb.get(key, 0))
+        except Exception:
+            # keep the template in the queue, nothing was observed
+            self.dump_scheduler.requeue(key)
+            raise
+
+        self.dump_maxb = dict(self.dump_maxb, **{key: maxb})
+        self.dump_scheduler.done(key, self.last_dump['prices'], time())
+
+        for m in self.dump_scheduler.metrics(time()):
+            if m['template'] == key:
+                self.SaveToInflux('dump',
+                                  fields={
+                                      'maxb': maxb,
+                                      'volatility': m['volatility'],
+                                      'dumps': m['dumps'],
+                                      'observations': m['observations'],
+                                  },
+                                  tags={'template': key})
+        self.log({
+            'dump': key,
+            'next_price': maxb,
+            'requests': self.last_dump['requests'],
+        })
+
+    def DumpMetrics(self):
+        now = time()
+        metrics = self.dump_scheduler.metrics(now)
+        for m in metrics:
+            if m['age'] >= 0:
+                self.SaveToInflux('dump_freshness',
+                                  fields={'age': m['age']},
+                                  tags={'template': m['template']})
+        self.log({
+            'dump_coverage':
+            sum(1 for m in metrics if m['dumps']) / (len(metrics) or 1),
+            'dump_templates': metrics,
+        })
+
     def BuyItemByIndex(self, index):
+        self.last_search = {'requests': 0, 'suited': 0, 'profits': []}
+        try:
+            self.BuyItemPages(index)
+        finally:
+            if self.selector:
+                self.selector.update(self.Items[index], **self.last_search)
+            self.last_search = None
+
+        if self.bid_limit > 0:
+            random_sleep(1, 4)
+
+    def BuyItemPages(self, index):
         for page in range(self.cfg['market_page_limit']):
             items = self.SearchByIndex(index, page=page)
+            self.last_search['requests'] += 1
             for item in items:
                 self.SaveItem(item)
-                if self.ItemSuited(index, item):
+                if not self.ItemSuited(index, item):
+                    continue
+                # found, even when the coins are short
+                self.last_search['suited'] += 1
+                if self.CanAfford(item['buyNowPrice']):
                     self.log(item)
-                    self.Bid(item['tradeId'], item['buyNowPrice'])
+                    if self.Bid(item['tradeId'], item['buyNowPrice']):
+                        if self.selector:
+                            self.selector.bought(self.Items[index],
+                                                 item['itemData']['id'],
+                                                 item['buyNowPrice'])
+                        self.events.add(
+                            eventlog.BID, template=index,
+                            resourceId=item['itemData']['resourceId'],
+                            itemId=item['itemData']['id'],
+                            tradeId=item['tradeId'],
+                            price=item['buyNowPrice'],
+                            value=int(self.last_profit or 0))
                     self.purchased_count += 1
                     # sleep over 1s
                     random_sleep(0.5, 1)
@@ -645,45 +972,92 @@ class FifaWeb(object):
             if len(items) < self.cfg['market_page_size']:  # last page
                 break
 
-        random_sleep(1, 4)
+    def UpdateCredits(self, force=False):
+        """ explicit credits call, only when the ledger can't be trusted """
+        if force or self.ledger.stale():
+            try:
+                self.set_credits(
+                    codec.response_json(self.get(
+                        self.cfg['urls']['credits']))['credits'])
+            except (KeyError, ValueError):
+                self.log({'message': "Can't get credits"})
 
-    def UpdateCredits(self):
-        try:
-            self.set_credits(
-                self.get(self.cfg['urls']['credits']).json()['credits'])
-        except (KeyError, ValueError):
-            self.log({'message': "Can't get credits"})
+        self.SaveToInflux('ledger', fields=self.ledger.fields(), tags={})
 
     def BuyPack(self, packId=100):
         self.log({
             'packId': packId,
         })
+        if not self.CanAfford(self.packs.prices.get(packId, 0)):
+            return {}
 
-        r = self.post(
-            self.cfg['urls']['purchased_items'],
-            json={
-                'packId': packId,
-                'currency': 'COINS',
-            },
-        )
+        try:
+            r = self.post(
+                self.cfg['urls']['purchased_items'],
+                json={
+                    'packId': packId,
+                    'currency': 'COINS',
+                },
+            )
+        except Exception:
+            # the pack may be bought, the purchased pile tells
+            self.purchased_dirty = True
+            raise
 
         if r.status_code != 200:
+            # 471 - unassigned items are in the purchased pile
+            self.purchased_dirty = True
             self.buy_pack_fails += 1
             if self.buy_pack_fails > 1:
                 self.log_request(r)
-                raise SessionException('BuyPack API Error')
-            return []
+                raise SessionException('BuyPack API Error', r.status_code)
+            return {}
+
+        try:
+            return self.PackBought(packId, r)
+        except Exception:
+            self.purchased_dirty = True
+            raise
 
+    def PackBought(self, packId, r):
         self.buy_pack_fails = 0
+        if packId in self.packs.prices:
+            self.ledger.spent(self.packs.prices[packId])
+            self.credits = self.ledger.credits or 0
+        else:
+            self.ledger.unknown()
         self.SaveToInflux('pack', fields={'buyed': 1}, tags={'packId': packId})
+        self.events.add(eventlog.PACK,
+                        price=self.packs.prices.get(packId, 0),
+                        value=packId)
 
         try:
-            return r.json()['itemData']
-        except KeyError:
-            return []
+            pack = codec.response_json(r)
+        except codec.DecodeError:
+            self.purchased_dirty = True
+            return {}
+        self.packs.opened(packId, pack)
+        return pack
+
+    def PackWorthBuying(self, packId, min_profit=0):
+        worth, estimate = self.packs.worth_buying(
+            packId, min_profit, self.cfg.get('pack_min_samples', 30))
+        self.log({'pack_estimate': estimate, 'worth': worth})
+        if 'ev' in estimate:
+            self.SaveToInflux('pack_ev',
+                              fields={
+                                  'ev': estimate['ev'],
+                                  'ev_std': estimate['ev_std'],
+                              },
+                              tags={'packId': packId})
+        return worth
 
     def BuyRandomItem(self):
-        self.BuyItemByIndex(randint(0, len(self.Items) - 1))
+        if self.selector:
+            index = self.selector.choose(self.Items)
+        else:
+            index = randint(0, len(self.Items) - 1)
+        self.BuyItemByIndex(index)
 
     def GetItemByResourseId(self, resourceId):
         default_item = {}
@@ -715,10 +1089,11 @@ class FifaWeb(object):
             r = requests.get(
                 'https://www.futbin.com/20/playerPrices?player={}'.format(
                     resourceId))
-            price = int(r.json()[str(resourceId)]['prices'][platform]
-                        [price_type].replace(',', ''))
+            price = int(
+                codec.response_json(r)[str(resourceId)]['prices'][platform]
+                [price_type].replace(',', ''))
             self.prices_cache[resourceId] = price
-        except (KeyError, TypeError, json.decoder.JSONDecodeError):
+        except (KeyError, TypeError, codec.DecodeError):
             return 0
 
         return price
@@ -731,7 +1106,8 @@ class FifaWeb(object):
             r = requests.get(
                 'https://futcards.info/api/cards/price/free/{}'.format(
                     resourceId))
-            player_info = r.json()[str(resourceId)]['prices'][platform]
+            player_info = codec.response_json(r)[str(
+                resourceId)]['prices'][platform]
             price = int(player_info['price'])
 
             # QuckSell item if price isn't fresh enought
@@ -740,7 +1116,7 @@ class FifaWeb(object):
                 return 0
 
             self.prices_cache[resourceId] = player_info
-        except (KeyError, TypeError, json.decoder.JSONDecodeError):
+        except (KeyError, TypeError, codec.DecodeError):
             return 0
 
         return price
@@ -787,33 +1163,39 @@ class FifaWeb(object):
 
         return 0
 
-    def MoveToPile(self, item_data, pile='trade'):
-        # default pile is trade
-        if pile not in ('trade', 'club'):
+    def MoveToPiles(self, moves):
+        """ moves - (item_data, pile) pairs, all go in one request """
+        if not moves:
+            return True
+        if any(pile not in ('trade', 'club') for item_data, pile in moves):
             return False
 
         try:
-            r = self.put(
-                self.cfg['urls']['item'],
-                json={
-                    'itemData': [
-                        {
-                            'id': item_data['id'],
-                            'pile': pile,
-                        },
-                    ],
-                },
-            )
-        except TypeError:
-            print('--- Item ---')
-            print(item_data)
-            print('------------')
-            print(pile)
-            sys.exit(1)
+            payload = [{
+                'id': item_data['id'],
+                'pile': pile,
+            } for item_data, pile in moves]
+        except (KeyError, TypeError):
+            self.log({'wrong_moves': repr(moves)}, level='error')
+            return False
 
+        r = self.put(self.cfg['urls']['item'], json={'itemData': payload})
         if r.status_code != 200:
             return False
-        return True
+
+        if any(pile == 'trade' for item_data, pile in moves):
+            self.tradepile_state.touch()
+        for item_data, pile in moves:
+            self.events.add(eventlog.MOVE,
+                            resourceId=item_data.get('resourceId'),
+                            itemId=item_data['id'],
+                            value=1 if pile == 'club' else 0)
+        try:
+            return all(
+                i.get('success', True)
+                for i in codec.response_json(r)['itemData'])
+        except (KeyError, codec.DecodeError):
+            return True
 
     def RedeamReward(self, item_data):
         r = self.post('{}/{}'.format(self.cfg['urls']['item'],
@@ -823,25 +1205,66 @@ class FifaWeb(object):
             return False
         return True
 
-    def ProcessPurchasedItem(self, item_data):
-        price = self.GetPrice(item_data)
-        if item_data['itemType'] == 'misc':
+    def GetPrices(self, items):
+        """ itemId -> price, one lookup per distinct player or definition """
+        prices = {}
+        found = {}
+        for item_data in items:
+            if item_data['itemType'] == 'misc':
+                continue
+            key = (item_data['itemType'], item_data.get('resourceId'),
+                   item_data.get('definitionId'))
+            if key not in found:
+                found[key] = self.GetPrice(item_data)
+            prices[item_data['id']] = found[key]
+        return prices
+
+    def ProcessItems(self, items, duplicates=()):
+        """ prices all items first, then moves and quick sells in batches """
+        prices = self.GetPrices(items)
+        actions = packs.plan(items, set(duplicates), prices)
+        self.packs.priced({i['id']: prices[i['id']] for i in actions['trade']})
+        self.log({'plan': {k: len(v) for k, v in actions.items()}})
+
+        done = True
+        for item_data in actions['redeem']:
             # Redeam reward if its a misc like Gold or Draft ...
-            self.RedeamReward(item_data)
-        elif price == 0:
-            self.PutToQuickSell(item_data)
+            done = self.RedeamReward(item_data) and done
+            random_sleep(1, 2)
+
+        done = self.MoveToPiles(
+            [(i, 'trade') for i in actions['trade']] +
+            [(i, 'club') for i in actions['club']]) and done
+
+        # assign a new list, so the change goes to the journal
+        self.quick_sell_ids = self.quick_sell_ids + [
+            i['id'] for i in actions['quick_sell']
+        ]
+        return self.QuickSellItems() and done
+
+    def ProcessPack(self, pack):
+        """ pack - BuyPack response with itemList and duplicateItemIdList """
+        if 'itemList' not in pack:
+            self.purchased_dirty = True
             return False
-        elif price < 0:
-            return self.MoveToPile(item_data, 'club')
-        else:
-            return self.MoveToPile(item_data, 'trade')
-        return True
+
+        self.analytics.publish(pack['itemList'], analytics.PACK)
+
+        done = self.ProcessItems(
+            pack['itemList'],
+            [d['itemId'] for d in pack.get('duplicateItemIdList', [])])
+        if not done:
+            # leftovers are picked up from the purchased pile
+            self.purchased_dirty = True
+        return done
 
     def ClearSold(self):
         r = self.delete(self.cfg['urls']['sold'])
         self.transfer_closed = False
         if r.status_code != 200:
             return False
+
+        self.tradepile_state.clear_closed()
         return True
 
     def QuickSellItem(self, item):
@@ -851,12 +1274,20 @@ class FifaWeb(object):
         if r.status_code != 200:
             return False
 
+        try:
+            self.set_credits(codec.response_json(r)['totalCredits'])
+        except (KeyError, codec.DecodeError):
+            self.ledger.unknown()
+        self.packs.quick_sold(item_data['id'])
+        self.events.add(eventlog.QUICK_SELL,
+                        resourceId=item_data.get('resourceId'),
+                        itemId=item_data['id'])
+        if self.selector:
+            # quick sell isn't taxed
+            self.selector.sold(item_data['id'],
+                               item_data.get('discardValue', 0), tax=1)
         return True
 
-    def PutToQuickSell(self, item_data):
-        self.quick_sell_ids.append(item_data['id'])
-        return False
-
     def QuickSellItems(self):
         if not self.quick_sell_ids:
             return True
@@ -871,6 +1302,24 @@ class FifaWeb(object):
         if r.status_code != 200:
             return False
 
+        # bulk quick sell doesn't return the balance,
+        # the opened packs know the quick sell values
+        values = {
+            itemId: self.packs.discard.get(itemId)
+            for itemId in self.quick_sell_ids
+        }
+        if None in values.values():
+            # items restored from the journal without pack history
+            self.ledger.unknown()
+        else:
+            self.ledger.earned(sum(values.values()))
+        self.credits = self.ledger.credits or 0
+        for itemId, value in values.items():
+            self.packs.quick_sold(itemId)
+            self.events.add(eventlog.QUICK_SELL, itemId=itemId)
+            if self.selector:
+                # quick sell isn't taxed
+                self.selector.sold(itemId, value, tax=1)
         self.quick_sell_ids = []
         return True
 
@@ -882,12 +1331,23 @@ class FifaWeb(object):
             return False
         if item['tradeState'] == 'closed':
             self.transfer_closed = True
+            self.packs.sold(item_data['id'], item.get('currentBid', 0))
+            self.ledger.sold(item_data['id'])
+            self.credits = self.ledger.credits or 0
+            self.events.add(eventlog.SOLD,
+                            resourceId=item_data.get('resourceId'),
+                            itemId=item_data['id'],
+                            tradeId=item.get('tradeId'),
+                            price=item.get('currentBid', 0))
+            if self.selector:
+                self.selector.sold(item_data['id'], item.get('currentBid', 0))
             return False
+        self.ledger.unlisted(item_data['id'])
         # self.log({'debug': item_data})
 
         min_price = item_data['marketDataMinPrice']
         if item['tradeState'] == 'expired' and\
-           min_price + delta_by_price(min_price) >= item['buyNowPrice']:
+           ladder.up(min_price) >= item['buyNowPrice']:
             return self.QuickSellItem(item)
 
         price = self.GetPrice(item_data)
@@ -895,10 +1355,8 @@ class FifaWeb(object):
             return self.QuickSellItem(item)
 
         start = blur_price(price, 0.7, min_price=min_price)
-        buynow = price
-
-        if buynow > item_data['marketDataMaxPrice']:
-            buynow = item_data['marketDataMaxPrice']
+        buynow = templates.listing_price(price,
+                                         item_data['marketDataMaxPrice'])
 
         self.log({
             'item': item_data,
@@ -919,64 +1377,67 @@ class FifaWeb(object):
         if r.status_code != 200:
             return False
 
+        self.tradepile_state.listed(item_data['id'], 3600)
+        self.ledger.listed(item_data['id'], buynow)
+        self.events.add(eventlog.LIST,
+                        resourceId=item_data.get('resourceId'),
+                        itemId=item_data['id'],
+                        price=buynow,
+                        value=start)
         self.log({
             'item': item_data,
             'purchase': buynow,
         })
         return True
 
-    def GetPurchasedItems(self):
+    def GetPurchased(self):
+        r = self.get(self.cfg['urls']['purchased_items'])
         try:
-            r = self.get(
-                self.cfg['urls']['purchased_items']).json()['itemData']
-            return r
-        except KeyError:
-            return []
-        except json.decoder.JSONDecodeError:
+            return codec.response_json(r)
+        except codec.DecodeError:
             self.log_request(r)
-            raise SessionException('get purchased_items error')
+            raise SessionException('get purchased_items error',
+                                   r.status_code)
 
     def MovePurchasedItems(self):
-        for item_data in self.GetPurchasedItems():
-            random_sleep(1, 2)
+        """ reconciliation with the purchased pile """
+        purchased = self.GetPurchased()
+        items = purchased.get('itemData', [])
+        for item_data in items:
             self.log({'purchased_item': item_data})
-            self.ProcessPurchasedItem(item_data)
 
-        self.QuickSellItems()
+        done = self.ProcessItems(items, [
+            d['itemId'] for d in purchased.get('duplicateItemIdList', [])
+        ])
+        self.purchased_dirty = not done
         self.purchased_count = 0
 
     def SellFromTradePile(self):
-        for item in self.tradepile():
+        # nothing has expired or was moved to the tradepile since last fetch
+        if not self.tradepile_state.due():
+            return
+
+        tradepile = self.tradepile()
+        self.ledger.listings_from(tradepile)
+        for item in self.tradepile_state.update(tradepile):
             if self.Auction(item):
                 random_sleep(2, 4)
+            elif item['tradeState'] != 'closed':
+                self.tradepile_state.retry(item['itemData']['id'])
 
-    def DecodeSearchUrl(self, url):
-        r = self.get(url)
-        try:
-            first = r.json()['auctionInfo'][0]
-        except (
-                KeyError,
-                IndexError,
-        ):
-            self.log('Try one more time, or increase maxb')
-            self.exit()
-
-        # print(json.dumps(first))
-        item_tmpl = [{
-            'name':
-            'OptionalValue',
-            'resourceId':
-            first['itemData']['resourceId'],
-            'params':
-            dict(parse.parse_qsl(parse.urlsplit(r.request.url).query)),
-            'price':
-            first['buyNowPrice'],
-        }]
-
-        if first['itemData']['itemType'] == 'player':
-            item_tmpl[0]['rating'] = 'OptionalValue'
-
-        print(yaml.dump(item_tmpl))
+        self.SaveToInflux('tradepile', fields=self.tradepile_state.counts())
+        self.log({
+            'tradepile': self.tradepile_state.counts(),
+            'next_refresh': self.tradepile_state.next_refresh(),
+        })
+
+    def WaitTradePile(self, max_wait=None):
+        """ wait for the next tradepile refresh or stop() """
+        delay = self.tradepile_state.next_refresh() - time()
+        if max_wait is not None:
+            delay = min(delay, max_wait)
+        if delay > 0 and not self.tradepile_state.dirty:
+            self.stopped.wait(delay)
 
     def aiohttp_server(self):
 
@@ -985,9 +1446,36 @@ class FifaWeb(object):
             headers = {'Access-Control-Allow-Origin': '*'}
             return web.Response(text='OK', headers=headers)
 
+        async def http_reload(request):
+            # parse in a worker thread, the loop keeps serving headers
+            loop = asyncio.get_running_loop()
+            if await loop.run_in_executor(None, self.ReloadItems):
+                return web.Response(text='OK')
+            return web.Response(text='ERROR', status=400)
+
+        async def http_memory(request):
+            loop = asyncio.get_running_loop()
+            report = await loop.run_in_executor(None, self.CheckMemory)
+            return web.Response(text=codec.dumps(report),
+                                content_type='application/json')
+
+        def http_memory_trace(request):
+            if request.method == 'DELETE':
+                self.memory.stop_trace()
+            else:
+                self.memory.start_trace()
+            return web.Response(text='OK')
+
         self.app = web.Application()
         self.app['headers'] = {}
-        self.app.add_routes([web.get('/', http_get)])
+        self.app.add_routes([
+            web.get('/', http_get),
+            web.get('/memory', http_memory),
+            web.post('/memory/trace', http_memory_trace),
+            web.delete('/memory/trace', http_memory_trace),
+        ])
+        if self.catalog.filename:
+            self.app.add_routes([web.post('/reload', http_reload)])
         self.runner = web.AppRunner(self.app)
         return self.runner
 
@@ -1004,8 +1492,119 @@ class FifaWeb(object):
         self.loop.run_until_complete(site.start())
         self.loop.run_forever()
 
+    def Run(self, step):
+        """ run one loop step, recover in-process from session errors """
+        self.ApplyCatalog()
+        self.events.tick()
+        self.journal.tick()
+        try:
+            step()
+        except (SessionException, requests.exceptions.RequestException) as e:
+            status = getattr(e, 'status', None)
+            kind = recovery.classify(status, self.AuthError
+                                     or not self.valid_request())
+            delay = self.recovery.failed(kind, time())
+            self.log({
+                'recovery': kind,
+                'status': status,
+                'error': str(e),
+                'delay': delay,
+            })
+            # can't get new headers without the plugin server
+            if delay is None or (kind == recovery.AUTH and not self.app):
+                raise
+
+            self.recovery_kind = kind
+            # Event.wait sleeps without polling and wakes up on stop()
+            self.stopped.wait(delay)
+            if kind == recovery.AUTH:
+                self.invalid_sid = self.requests.headers.get(self.SID_NAME)
+                self.update_headers()
+            return False
+
+        if self.recovery.failed_at is not None:
+            attempts = self.recovery.attempts
+            downtime = self.recovery.succeeded(self.recovery_kind, time())
+            self.SaveToInflux('recovery',
+                              fields={
+                                  'downtime': downtime,
+                                  'attempts': attempts,
+                              },
+                              tags={'kind': self.recovery_kind})
+            self.log({'recovered': self.recovery.stats()})
+
+        if self.memory.due():
+            self.CheckMemory()
+        # trims touch caches the step uses, so only between steps
+        if self.memory.trim_requested:
+            self.TrimCaches()
+        return True
+
+    def Repeat(self, step, tries):
+        """ yields after every finished step, recovered ones aren't counted """
+        done = 0
+        while done < tries and not self.stopped.is_set():
+            if self.Run(step):
+                done += 1
+                yield done
+
+    def MemoryCounts(self):
+        """ entries in the structures which live for the whole run """
+        return {
+            'prices_cache': len(self.prices_cache),
+            'headers': len(self.app['headers']) if self.app else 0,
+            'observations_seen': len(self.observations.seen),
+            'observations_tags': len(self.observations.tags),
+            'tradepile': len(self.tradepile_state.items),
+            'listings': len(self.ledger.listings),
+            'journal': len(self.journal.state),
+            'quick_sell_ids': len(self.quick_sell_ids),
+            'templates': len(self.Items),
+        }
+
+    def CheckMemory(self):
+        """ sample and report, safe off the trading thread: over the soft
+            limit it only asks Run to trim
+        """
+        report = self.memory.sample(self.MemoryCounts())
+        self.log({'memory': report})
+        fields = {k + '_count': v for k, v in report['counts'].items()}
+        fields['rss'] = report['rss']
+        if 'traced' in report:
+            fields['traced'] = report['traced']
+        self.SaveToInflux('memory', fields=fields, tags={})
+        report['trim_requested'] = self.memory.check(report)
+        return report
+
+    def TrimCaches(self):
+        """ soft memory limit is reached, drop what can be fetched again """
+        # dicts keep insertion order, the older half goes
+        stale = list(self.prices_cache)[:len(self.prices_cache) // 2]
+        for resourceId in stale:
+            del self.prices_cache[resourceId]
+        while len(self.observations.seen) > self.observations.seen_limit // 2:
+            self.observations.seen.popitem(last=False)
+        self.observations.tags.clear()
+        self.memory.trims += 1
+        self.memory.trim_requested = False
+        gc.collect()
+        self.log({'memory_trimmed': self.memory.trims, 'rss': memwatch.rss()})
+
     def stop(self):
+        if self.catalog_watcher:
+            self.catalog_watcher.stop()
+        self.log({'observations': self.observations.stats()})
+        self.log({'recovery': self.recovery.stats()})
+        if self.selector:
+            self.selector.save()
         self.log('STOP')
+        self.stopped.set()
+        self.journal.close()
+        if self.market_history:
+            self.market_history.close()
+        self.analytics.close()
+        self.events.close()
+        self.requests.close()
         if self.loop:
             self.loop.call_soon_threadsafe(self.loop.stop)
 
@@ -1018,11 +1617,6 @@ def main():
                         default='fifa23.yaml',
                         help='config yaml file')
     parser.add_argument('-i', '--items', type=str, help='items yaml file')
-    parser.add_argument(
-        '--decode-url',
-        type=str,
-        default='',
-        help='decode search url copied from browser debug console')
     parser.add_argument('--tries',
                         type=int,
                         default=sys.maxsize,
@@ -1033,15 +1627,25 @@ def main():
                         help='Maximun QuckSell item price')
     parser.add_argument('--bid-limit',
                         type=int,
-                        default=1,
-                        help='how many items we will buy')
+                        help='how many items we will buy, 1 or the restored '
+                        'value by default')
     parser.add_argument('--pack',
                         type=int,
                         default=0,
                         choices=[100, 101, 200, 201, 300, 301],
                         help='Pack type for buying')
-    # 100 - bronze 400
-    # 301 - gold 7500
+    # prices are in packs.PACK_PRICES
+    parser.add_argument('--pack-min-profit',
+                        type=int,
+                        default=None,
+                        help='skip the pack if expected profit is lower')
+    parser.add_argument('--sbc',
+                        type=int,
+                        default=0,
+                        help='solve challenges of the SBC set id')
+    parser.add_argument('--sbc-sets',
+                        action='store_true',
+                        help='log SBC sets with their ids')
     parser.add_argument('--dump', dest='dump', action='store_true')
     parser.add_argument('--web', dest='web', action='store_true')
     parser.add_argument('--futbin', dest='futbin', action='store_true')
@@ -1049,10 +1653,21 @@ def main():
     parser.add_argument('--no-futcards', dest='futcards', action='store_false')
     parser.add_argument('--buy', dest='buy', action='store_true')
     parser.add_argument('--sell', dest='sell', action='store_true')
+    parser.add_argument('--watch-items',
+                        type=int,
+                        default=0,
+                        help='reload items yaml on change, poll interval')
+    parser.add_argument('--fresh',
+                        dest='fresh',
+                        action='store_true',
+                        help='don\'t restore state from the journal')
+    parser.add_argument('--memtrace',
+                        dest='memtrace',
+                        action='store_true',
+                        help='report top growing allocation sites')
     parser.add_argument('-v', '--verbose', dest='debug', action='store_true')
     parser.set_defaults(buy=False)
     parser.set_defaults(sell=False)
-    parser.set_defaults(decode_url=False)
     parser.set_defaults(debug=False)
     args = parser.parse_args()
 
@@ -1062,10 +1677,18 @@ def main():
             args.items, items_dict=True if args.pack else False):
         fifa.log('Can\'t parse item yaml')
         sys.exit(1)
-    fifa.bid_limit = args.bid_limit
+    if args.items and args.watch_items:
+        fifa.WatchItems(args.watch_items)
+    # command line options override the restored state
+    if not args.fresh:
+        fifa.RestoreJournal()
+    if args.bid_limit is not None:
+        fifa.bid_limit = args.bid_limit
     fifa.quick_sell_price = args.quick_sell_price
     if args.debug:
         fifa.logger.setLevel(logging.DEBUG)
+    if args.memtrace:
+        fifa.memory.start_trace()
 
     if args.futbin:
         fifa.futbin = args.futbin
@@ -1078,29 +1701,56 @@ def main():
 
         fifa.update_headers()
 
+    # quick sells which were pending before a restart
+    if fifa.quick_sell_ids:
+        fifa.Run(fifa.QuickSellItems)
+
     # Choose the active action
+    # every loop step runs through fifa.Run, which recovers from session
+    # errors in-process and resumes the loop
     if args.pack:
-        for i in range(args.tries):
-            if args.buy:
-                fifa.BuyPack(args.pack)
+
+        def pack_step():
+            if args.buy and (args.pack_min_profit is None
+                             or fifa.PackWorthBuying(args.pack,
+                                                     args.pack_min_profit)):
+                pack = fifa.BuyPack(args.pack)
+                if args.sell and pack:
+                    fifa.ProcessPack(pack)
             random_sleep(1, 2)
+            if args.sell and not args.buy:
+                # sell only mode, nothing can change before an expiry
+                fifa.WaitTradePile()
             if args.sell:
                 fifa.UpdateCredits()
-                fifa.MovePurchasedItems()
+                if fifa.purchased_dirty:
+                    fifa.MovePurchasedItems()
                 fifa.SellFromTradePile()
                 if fifa.transfer_closed:
                     fifa.ClearSold()
 
+        for _ in fifa.Repeat(pack_step, args.tries):
+            pass
+
     if args.dump:
-        maxb = 0  # set default value from item yaml
-        for i in range(args.tries):
-            # save maxb from preview search
-            maxb = fifa.DumpItemByIndex(0, maxb)
-            fifa.log('next price {}'.format(maxb))
-            random_sleep(5, 15)
+        fifa.dump_scheduler = DumpScheduler(
+            [templates.template_key(t) for t in fifa.Items],
+            budget=fifa.cfg.get('dump_budget', 20),
+            interval=fifa.cfg.get('dump_interval', 600))
+
+        def dump_step():
+            fifa.DumpNext()
+            random_sleep(1, 3)
+
+        for done in fifa.Repeat(dump_step, args.tries):
+            if not done % len(fifa.Items):
+                fifa.DumpMetrics()
 
     if args.buy:
-        for i in range(args.tries):
+
+        def buy_step():
+            # only asks for the balance when the ledger is stale
+            fifa.UpdateCredits()
             fifa.BuyRandomItem()
             random_sleep(1, 2)
             # try to sell all items once per 5 purchase
@@ -1111,15 +1761,20 @@ def main():
             # Long sleep after to many empty searches
             if not fifa.empty_searches % 10:
                 random_sleep(30, 90)
+
+        for _ in fifa.Repeat(buy_step, args.tries):
             if fifa.bid_limit <= 0:
                 break
 
     if args.sell:
-        fifa.MovePurchasedItems()
-        fifa.SellFromTradePile()
+        fifa.Run(fifa.MovePurchasedItems)
+        fifa.Run(fifa.SellFromTradePile)
+
+    if args.sbc_sets:
+        fifa.ListSbcSets()
 
-    if args.decode_url:
-        fifa.DecodeSearchUrl(args.decode_url)
+    if args.sbc:
+        fifa.SolveSbc(args.sbc)
 
     fifa.stop()
 
@@ -1127,5 +1782,8 @@ def main():
 if __name__ == '__main__':
     try:
         main()
-    except SessionException:
+    except (SessionException, requests.exceptions.RequestException):
+        # kill skips atexit
+        eventlog.close_all()
+        journal.close_all()
         os.system('kill %d' % os.getpid())
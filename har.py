@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+    Items yaml from HAR exports
+
+    Reads HAR files saved from the browser dev tools, takes every recorded
+    transfermarket search and its response and prints a merged items yaml,
+    one template per distinct search. No requests are made. The entries array
+    is decoded one entry at a time, so big exports aren't loaded whole.
+
+    ./har.py session1.har session2.har > items.yaml
+    ./har.py -m items.yaml session.har -o items.yaml
+"""
+import sys
+import os
+import re
+import base64
+import argparse
+from urllib import parse
+import yaml
+import codec
+
+# page and page size are set by the bot
+SKIP_PARAMS = ('start', 'num')
+ENTRIES_RE = re.compile(r'(?<!\\)"entries"\s*:\s*\[')
+MARKET_PATH = '/transfermarket'
+
+
+def entries(filename, chunk_size=1 << 20):
+    """ yields HAR entries one by one """
+    buf = ''
+    pos = None
+    with open(filename, encoding='utf-8-sig') as f:
+        while pos is None:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buf += chunk
+            m = ENTRIES_RE.search(buf)
+            if m:
+                pos = m.end()
+            else:
+                # "entries" may be split between chunks
+                buf = buf[-32:]
+
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            end = codec.value_end(buf, pos) if pos < len(buf) else None
+            if end is None:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise codec.DecodeError('{} ends inside an entry'.format(
+                        filename))
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield codec.loads(buf[pos:end])
+            pos = end
+
+
+def response_text(entry):
+    content = entry.get('response', {}).get('content', {})
+    text = content.get('text')
+    if text and content.get('encoding') == 'base64':
+        text = base64.b64decode(text).decode('utf-8')
+    return text
+
+
+def searches(filename):
+    """ (params, auctionInfo) of recorded transfermarket searches """
+    for entry in entries(filename):
+        request = entry.get('request', {})
+        url = parse.urlsplit(request.get('url', ''))
+        if request.get('method') != 'GET' or \
+                not url.path.endswith(MARKET_PATH):
+            continue
+        try:
+            auction_info = codec.loads(response_text(entry))['auctionInfo']
+        except (TypeError, KeyError, ValueError):
+            continue
+
+        params = {
+            k: int(v) if v.isdigit() else v
+            for k, v in parse.parse_qsl(url.query) if k not in SKIP_PARAMS
+        }
+        yield params, auction_info
+
+
+def params_key(params):
+    return tuple(sorted((k, str(v)) for k, v in params.items()))
+
+
+def template(params, auction_info):
+    """ same template as the bot got from one search url """
+    cheapest = min(auction_info, key=lambda a: a['buyNowPrice'])
+    resourceId = cheapest['itemData']['resourceId']
+    item = {
+        # params are unique per template
+        'name': '{} {}'.format(
+            resourceId,
+            ','.join('{}={}'.format(k, v) for k, v in params_key(params))),
+        'resourceId': resourceId,
+        'params': params,
+        'price': cheapest['buyNowPrice'],
+    }
+    ratings = [
+        a['itemData']['rating'] for a in auction_info
+        if a['itemData'].get('itemType') == 'player'
+        and 'rating' in a['itemData']
+    ]
+    if ratings:
+        item['rating'] = min(ratings)
+    return item
+
+
+def merge(filenames, items=None):
+    """ items plus one template per new search params """
+    merged = {params_key(i.get('params', {})): i for i in items or []}
+    new = {}
+    for filename in filenames:
+        for params, auction_info in searches(filename):
+            key = params_key(params)
+            if key in merged or not auction_info:
+                continue
+            item = template(params, auction_info)
+            if key not in new or item['price'] < new[key]['price']:
+                new[key] = item
+
+    return list(merged.values()) + list(new.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Items yaml from HAR files')
+    parser.add_argument('har', nargs='+')
+    parser.add_argument('-m', '--merge',
+                        help='items yaml with templates to keep')
+    parser.add_argument('-o', '--output', help='write yaml here, not stdout')
+    args = parser.parse_args()
+
+    items = []
+    if args.merge and os.path.exists(args.merge):
+        with open(args.merge) as f:
+            items = yaml.safe_load(f) or []
+
+    items = merge(args.har, items)
+    if args.output:
+        with open(args.output, 'w') as f:
+            yaml.dump(items, f)
+    else:
+        yaml.dump(items, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+    Crash-safe runtime journal
+
+    State changes are appended as json lines, every record is flushed to the
+    OS and fsyncs are batched. Every snapshot_every records the whole state
+    is written to a snapshot file and the journal is truncated. Records hold
+    absolute values, so replaying the journal over a newer snapshot is
+    harmless. Open journals are closed at exit and by close_all on paths
+    which skip atexit.
+"""
+import os
+import atexit
+import weakref
+from time import time
+import codec
+
+_open_journals = weakref.WeakSet()
+
+
+class Journal(object):
+
+    def __init__(self, filename, fsync_every=20, fsync_interval=5,
+                 snapshot_every=1000):
+        self.filename = os.path.expanduser(filename)
+        self.snapshot_file = self.filename + '.snapshot'
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.state = {}
+        self.pending = 0  # records written but not fsynced
+        self.records = 0  # records since the last snapshot
+        self.synced_at = time()
+
+        self.load()
+        self.f = open(self.filename, 'a')
+        _open_journals.add(self)
+
+    def load(self):
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'rb') as f:
+                try:
+                    self.state = codec.loads(f.read())
+                except codec.DecodeError:
+                    self.state = {}
+
+        if os.path.exists(self.filename):
+            with open(self.filename, 'rb') as f:
+                for line in f:
+                    try:
+                        self.state.update(codec.loads(line))
+                        self.records += 1
+                    except codec.DecodeError:
+                        # torn last line after a crash
+                        break
+        self.state.pop('t', None)
+
+    def record(self, **changes):
+        self.state.update(changes)
+        changes['t'] = time()
+        self.f.write(codec.dumps(changes) + '\n')
+        # a killed process keeps what reached the OS
+        self.f.flush()
+        self.pending += 1
+        self.records += 1
+
+        if self.records >= self.snapshot_every:
+            self.snapshot()
+        elif self.pending >= self.fsync_every:
+            self.sync()
+        else:
+            self.tick()
+
+    def tick(self, now=None):
+        """ fsync records which waited fsync_interval, between loop steps """
+        if self.pending and \
+                (now or time()) - self.synced_at >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+        self.synced_at = time()
+
+    def snapshot(self):
+        tmp = self.snapshot_file + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(codec.dumps(self.state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_file)
+
+        self.f.close()
+        self.f = open(self.filename, 'w')
+        self.pending = 0
+        self.records = 0
+        self.synced_at = time()
+
+    def get(self, key, default=None):
+        return self.state.get(key, default)
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.sync()
+        self.f.close()
+
+
+def close_all():
+    """ fsync and close every open journal """
+    for journal in list(_open_journals):
+        journal.close()
+
+
+atexit.register(close_all)
+
+
+class NoJournal(object):
+    """ used when journal isn't set in config """
+    state = {}
+
+    def record(self, **changes):
+        pass
+
+    def tick(self, now=None):
+        pass
+
+    def get(self, key, default=None):
+        return default
+
+    def close(self):
+        pass
@@ -0,0 +1,94 @@
+"""
+    Transfer market price ladder
+
+    Every valid market price is precomputed once. Scalar helpers snap with
+    bisect, *_array helpers do the same for numpy arrays.
+"""
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+MIN_PRICE = 150
+MAX_PRICE = 15000000
+
+# (upper bound, tick) - prices below the bound change by tick
+STEPS = (
+    (1000, 50),
+    (10000, 100),
+    (50000, 250),
+    (100000, 500),
+    (MAX_PRICE + 1, 1000),
+)
+BOUNDS = [bound for bound, step in STEPS]
+
+
+def _build():
+    prices = []
+    price = MIN_PRICE
+    for bound, step in STEPS:
+        while price < bound:
+            prices.append(price)
+            price += step
+    return prices
+
+
+PRICES = _build()
+PRICES_ARRAY = np.array(PRICES, dtype=np.int64)
+LAST = len(PRICES) - 1
+
+
+def tick(price):
+    """ price step at price """
+    i = bisect_right(BOUNDS, price)
+    return STEPS[min(i, len(STEPS) - 1)][1]
+
+
+def floor(price):
+    """ the highest valid price not above price, price itself below the
+        ladder
+    """
+    if price < MIN_PRICE:
+        return price
+    return PRICES[bisect_right(PRICES, price) - 1]
+
+
+def ceil(price):
+    """ the lowest valid price not below price """
+    return PRICES[min(bisect_left(PRICES, price), LAST)]
+
+
+def up(price, n=1):
+    """ n ticks above price """
+    return PRICES[min(bisect_right(PRICES, price) + n - 1, LAST)]
+
+
+def down(price, n=1):
+    """ n ticks below price """
+    return PRICES[max(bisect_left(PRICES, price) - n, 0)]
+
+
+def floor_array(prices):
+    prices = np.asarray(prices)
+    idx = np.searchsorted(PRICES_ARRAY, prices, side='right') - 1
+    return np.where(prices < MIN_PRICE, prices,
+                    PRICES_ARRAY[np.clip(idx, 0, LAST)])
+
+
+def ceil_array(prices):
+    idx = np.searchsorted(PRICES_ARRAY, prices, side='left')
+    return PRICES_ARRAY[np.clip(idx, 0, LAST)]
+
+
+def up_array(prices, n=1):
+    idx = np.searchsorted(PRICES_ARRAY, prices, side='right') + n - 1
+    return PRICES_ARRAY[np.clip(idx, 0, LAST)]
+
+
+def down_array(prices, n=1):
+    idx = np.searchsorted(PRICES_ARRAY, prices, side='left') - n
+    return PRICES_ARRAY[np.clip(idx, 0, LAST)]
+
+
+def tick_array(prices):
+    ticks = np.array([step for bound, step in STEPS], dtype=np.int64)
+    idx = np.searchsorted(BOUNDS, prices, side='right')
+    return ticks[np.clip(idx, 0, len(STEPS) - 1)]
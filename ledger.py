@@ -0,0 +1,115 @@
+"""
+    Credits and capital ledger
+
+    The balance is taken from every response which carries it (bid, single
+    quick sell, user/credits) and adjusted locally for calls which don't
+    (packs, bulk quick sell). Local adjustments and failed calls make the
+    balance less trustworthy, stale() tells when the explicit credits call is
+    worth it. Sold listings aren't added, the server may have credited them
+    already, they wait for the next balance.
+"""
+from time import time
+from templates import EA_TAX
+
+
+class Ledger(object):
+
+    def __init__(self, max_age=600, max_estimates=5):
+        self.credits = None  # unknown until the first balance
+        self.updated_at = 0  # time of the last balance from the server
+        self.estimates = 0  # local adjustments since the balance
+        self.inconsistent = False
+        self.max_age = max_age
+        self.max_estimates = max_estimates
+        self.pending_bids = {}  # tradeId -> bid
+        self.listings = {}  # itemId -> buy now price
+
+    def balance(self, credits, now=None):
+        """ balance from a server response """
+        self.credits = int(credits)
+        self.updated_at = now or time()
+        self.estimates = 0
+        self.inconsistent = False
+
+    def restored(self, credits):
+        """ balance saved before a restart, stale until the server sends one """
+        if self.credits is None and credits:
+            self.credits = int(credits)
+            self.updated_at = 0
+
+    def spent(self, coins):
+        """ coins went away without a balance in the response """
+        if self.credits is None:
+            return
+        self.credits -= coins
+        self.estimates += 1
+        if self.credits < 0:
+            self.inconsistent = True
+
+    def earned(self, coins):
+        if self.credits is None:
+            return
+        self.credits += int(coins)
+        self.estimates += 1
+
+    def unknown(self):
+        """ the balance has changed by an unknown amount """
+        self.inconsistent = True
+
+    def bid(self, tradeId, coins):
+        self.pending_bids[tradeId] = coins
+
+    def bid_done(self, tradeId, won, credits=None):
+        """ bid is answered, credits is the balance of the response """
+        coins = self.pending_bids.pop(tradeId, 0)
+        if credits is not None:
+            self.balance(credits)
+        elif won:
+            self.spent(coins)
+
+    def listings_from(self, auction_items):
+        """ listings from a fresh tradepile """
+        self.listings = {
+            item['itemData']['id']: item['buyNowPrice']
+            for item in auction_items if item.get('tradeState') == 'active'
+        }
+
+    def listed(self, itemId, buy_now):
+        self.listings[itemId] = buy_now
+
+    def sold(self, itemId):
+        """ the sale may be in the balance already, the next one tells """
+        self.listings.pop(itemId, None)
+        self.unknown()
+
+    def unlisted(self, itemId):
+        self.listings.pop(itemId, None)
+
+    def stale(self, now=None):
+        return self.credits is None or self.inconsistent or \
+            self.estimates >= self.max_estimates or \
+            (now or time()) - self.updated_at >= self.max_age
+
+    def available(self):
+        """ coins free for new bids or None if the balance is unknown """
+        if self.credits is None:
+            return None
+        return self.credits - sum(self.pending_bids.values())
+
+    def locked(self):
+        """ buy now value of items listed on the tradepile """
+        return sum(self.listings.values())
+
+    def expected_income(self):
+        return int(self.locked() * EA_TAX)
+
+    def fields(self):
+        return {
+            'credits': self.credits or 0,
+            'available': self.available() or 0,
+            'pending_bids': sum(self.pending_bids.values()),
+            'locked': self.locked(),
+            'expected_income': self.expected_income(),
+            'listings': len(self.listings),
+            'age': time() - self.updated_at if self.updated_at else -1,
+        }
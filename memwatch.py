@@ -0,0 +1,93 @@
+"""
+    Memory watchdog
+
+    Samples RSS and entry counts of the bot's long lived structures every
+    interval seconds. With tracing on, tracemalloc snapshots are compared with the
+    previous sample and the fastest growing allocation sites are reported.
+    Tracing keeps one frame per allocation, which is cheap enough to keep on.
+"""
+import os
+import resource
+import tracemalloc
+from time import time
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss():
+    """ resident set size in bytes """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # peak instead of current, kilobytes on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryWatch(object):
+
+    def __init__(self, interval=300, soft_limit=None, top=10, frames=1):
+        self.interval = interval
+        self.soft_limit = soft_limit  # bytes
+        self.top = top
+        self.frames = frames
+        self.sampled = 0
+        self.snapshot = None
+        self.trims = 0
+        self.trim_requested = False  # trimmed on the trading thread
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start_trace(self):
+        if not self.tracing:
+            tracemalloc.start(self.frames)
+            self.snapshot = None
+
+    def stop_trace(self):
+        tracemalloc.stop()
+        self.snapshot = None
+
+    def due(self, now=None):
+        return (now or time()) - self.sampled >= self.interval
+
+    def growth(self):
+        """ top growing allocation sites since the previous call """
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        previous, self.snapshot = self.snapshot, snapshot
+        if previous is None:
+            return []
+
+        return [{
+            'site': '{}:{}'.format(s.traceback[0].filename,
+                                   s.traceback[0].lineno),
+            'size': s.size,
+            'size_diff': s.size_diff,
+            'count_diff': s.count_diff,
+        } for s in snapshot.compare_to(previous, 'lineno')[:self.top]
+                if s.size_diff > 0]
+
+    def sample(self, counts):
+        """ counts - structure name -> number of entries """
+        self.sampled = time()
+        report = {'rss': rss(), 'counts': counts}
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            report['traced'] = current
+            report['traced_peak'] = peak
+            report['growth'] = self.growth()
+        return report
+
+    def over_limit(self, report):
+        return self.soft_limit is not None and \
+            report['rss'] > self.soft_limit
+
+    def check(self, report):
+        """ asks for a trim when the report is over the soft limit """
+        if self.over_limit(report):
+            self.trim_requested = True
+        return self.trim_requested
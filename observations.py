@@ -0,0 +1,67 @@
+"""
+    Write path filter for market observations
+
+    Drops repeated observations of the same trade and caches player tags per
+    item definition, so only changes are written to Influx and
+    market_history. Card tags (chemistry style, position) differ between
+    cards of one player and are taken from every item.
+"""
+from collections import OrderedDict
+
+
+class ObservationFilter(object):
+
+    def __init__(self, tags_func, card_tags_func=None, seen_limit=100000,
+                 tags_limit=20000):
+        self.tags_func = tags_func
+        self.card_tags_func = card_tags_func
+        self.seen = OrderedDict()  # (tradeId, price, state) -> None
+        self.seen_limit = seen_limit
+        self.tags = {}  # definitionId/resourceId -> tags
+        self.tags_limit = tags_limit
+        self.emitted = 0
+        self.dropped = 0
+
+    def changed(self, item):
+        """ True if this trade wasn't seen with the same price and state """
+        try:
+            key = (item['tradeId'], item['buyNowPrice'], item['tradeState'])
+        except KeyError:
+            self.emitted += 1
+            return True
+
+        if key in self.seen:
+            self.seen.move_to_end(key)
+            self.dropped += 1
+            return False
+
+        self.seen[key] = None
+        if len(self.seen) > self.seen_limit:
+            self.seen.popitem(last=False)
+        self.emitted += 1
+        return True
+
+    def item_tags(self, item_data):
+        """ cached player tags plus the card tags of this item """
+        key = item_data.get('definitionId', item_data.get('resourceId'))
+        tags = self.tags.get(key)
+        if tags is None:
+            tags = self.tags_func(item_data)
+            if key is not None:
+                if len(self.tags) >= self.tags_limit:
+                    self.tags.clear()
+                self.tags[key] = tags
+
+        if self.card_tags_func is None:
+            return tags
+        tags = dict(tags)
+        tags.update(self.card_tags_func(item_data))
+        return tags
+
+    def stats(self):
+        return {
+            'emitted': self.emitted,
+            'dropped': self.dropped,
+            'seen': len(self.seen),
+            'tags': len(self.tags),
+        }
@@ -0,0 +1,194 @@
+"""
+    Pack analytics
+
+    Every opened pack and every realised item price (sale or quick sell) is
+    appended to a json lines history file. Expected value of a pack is
+    estimated with an empirical bootstrap over the stored pack values. Items
+    which are not sold yet count with their market price estimate after tax,
+    only items without an estimate count with their quick sell value.
+
+    plan() decides where every item of an opened pack goes.
+"""
+import os
+import codec
+import numpy as np
+
+# store pack prices in coins, can be overwritten with pack_prices in config
+PACK_PRICES = {
+    100: 400,  # bronze
+    101: 750,  # premium bronze
+    200: 2500,  # silver
+    201: 3750,  # premium silver
+    300: 5000,  # gold
+    301: 7500,  # premium gold
+}
+EA_TAX = 0.95
+
+
+class PackHistory(object):
+
+    def __init__(self, filename=None, prices={}, resamples=2000, seed=None):
+        self.filename = os.path.expanduser(filename) if filename else None
+        self.prices = PACK_PRICES.copy()
+        self.prices.update(prices)
+        self.resamples = resamples
+        self.rng = np.random.default_rng(seed)
+        self.packs = []  # [(packId, [itemId, ...]), ...]
+        self.discard = {}  # itemId -> quick sell value
+        self.realised = {}  # itemId -> realised price
+        self.expected = {}  # itemId -> market estimate after tax
+        self.values_cache = {}  # packId -> np.array of pack values
+
+        if self.filename and os.path.exists(self.filename):
+            with open(self.filename) as f:
+                for line in f:
+                    try:
+                        self.apply(codec.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+
+    def apply(self, record):
+        if record['type'] == 'pack':
+            self.packs.append((record['packId'], record['items']))
+            self.discard.update(
+                (int(k), v) for k, v in record['discard'].items())
+            self.values_cache.pop(record['packId'], None)
+        elif record['type'] == 'price':
+            self.realised[record['itemId']] = record['price']
+            self.values_cache = {}
+        elif record['type'] == 'expected':
+            self.expected.update(
+                (int(k), v) for k, v in record['prices'].items())
+            self.values_cache = {}
+
+    def write(self, record):
+        self.apply(record)
+        if not self.filename:
+            return
+        with open(self.filename, 'a') as f:
+            f.write(codec.dumps(record) + '\n')
+
+    def opened(self, packId, response):
+        """ response - purchased/items POST response with itemList """
+        items = response.get('itemList', [])
+        if not items:
+            return
+        self.write({
+            'type': 'pack',
+            'packId': packId,
+            'items': [item['id'] for item in items],
+            'discard': {
+                str(item['id']): item.get('discardValue', 0)
+                for item in items
+            },
+            'duplicates': [
+                d['itemId'] for d in response.get('duplicateItemIdList', [])
+            ],
+        })
+
+    def priced(self, prices, tax=EA_TAX):
+        """ prices - itemId -> market price of items going to be sold """
+        expected = {
+            str(itemId): price * tax
+            for itemId, price in prices.items() if price > 0
+            and itemId in self.discard and itemId not in self.realised
+        }
+        if expected:
+            self.write({'type': 'expected', 'prices': expected})
+
+    def sold(self, itemId, price, tax=EA_TAX):
+        """ item from a pack was sold on the transfer market """
+        if itemId not in self.discard or itemId in self.realised:
+            return
+        self.write({'type': 'price', 'itemId': itemId, 'price': price * tax})
+
+    def quick_sold(self, itemId):
+        if itemId in self.discard and itemId not in self.realised:
+            self.write({
+                'type': 'price',
+                'itemId': itemId,
+                'price': self.discard[itemId],
+            })
+
+    def item_value(self, itemId):
+        if itemId in self.realised:
+            return self.realised[itemId]
+        if itemId in self.expected:
+            return self.expected[itemId]
+        return self.discard.get(itemId, 0)
+
+    def values(self, packId):
+        """ realised value of every stored pack of packId """
+        if packId not in self.values_cache:
+            values = [
+                sum(self.item_value(i) for i in items)
+                for pid, items in self.packs if pid == packId
+            ]
+            self.values_cache[packId] = np.array(values, dtype=np.float64)
+
+        return self.values_cache[packId]
+
+    def estimate(self, packId):
+        """ bootstrap expected value and its variance for packId """
+        values = self.values(packId)
+        n = len(values)
+        if not n:
+            return {'packId': packId, 'samples': 0}
+
+        # keep the resample matrix within a few million cells
+        resamples = min(self.resamples, max(100, 2000000 // n))
+        idx = self.rng.integers(0, n, size=(resamples, n))
+        means = values[idx].mean(axis=1)
+        price = self.prices.get(packId, 0)
+        return {
+            'packId': packId,
+            'samples': n,
+            'price': price,
+            'ev': float(means.mean()),
+            'ev_std': float(means.std()),
+            'variance': float(values.var()),
+            'p_profit': float((means > price).mean()),
+        }
+
+    def worth_buying(self, packId, min_profit=0, min_samples=30):
+        """ never without a pack price, always while there is not enough
+            history to decide
+        """
+        estimate = self.estimate(packId)
+        if packId not in self.prices:
+            return False, estimate
+        if estimate['samples'] < min_samples:
+            return True, estimate
+
+        return estimate['ev'] - estimate['price'] >= min_profit, estimate
+
+
+def plan(items, duplicates, prices):
+    """ items - itemList of a pack or purchased items, duplicates - ids of
+        items which are already in the club, prices - itemId -> GetPrice
+        (0 quick sell, < 0 keep in the club, > 0 sell on the market)
+    """
+    actions = {'redeem': [], 'club': [], 'trade': [], 'quick_sell': []}
+    for item in items:
+        if item['itemType'] == 'misc':
+            actions['redeem'].append(item)
+            continue
+
+        price = prices.get(item['id'], 0)
+        duplicate = item['id'] in duplicates
+        tradeable = not item.get('untradeable', False)
+        if price == 0:
+            action = 'quick_sell'
+        elif price < 0 and not duplicate:
+            action = 'club'
+        elif price > 0 and tradeable:
+            # duplicates can't go to the club, sell them
+            action = 'trade'
+        elif not duplicate:
+            action = 'club'
+        else:
+            # the tradepile needs a price
+            action = 'quick_sell'
+        actions[action].append(item)
+
+    return actions
@@ -0,0 +1,75 @@
+"""
+    Session recovery policy
+
+    Classifies failures and computes how long to wait before the loop is
+    resumed, keeps recovery counts and downtime per kind.
+"""
+
+AUTH = 'auth'
+BLOCKED = 'blocked'
+CONFLICT = 'conflict'
+TRANSIENT = 'transient'
+
+AUTH_CODES = (401, 403, 426, 458, 459, 482)
+BLOCKED_CODES = (512, 521)
+CONFLICT_CODES = (409, 471, 475, 478)
+
+# (first delay, max delay) in seconds
+DEFAULT_BACKOFF = {
+    AUTH: (1, 60),
+    BLOCKED: (3600, 12 * 3600),
+    CONFLICT: (5, 60),
+    TRANSIENT: (5, 300),
+}
+
+
+def classify(status=None, auth_error=False):
+    if auth_error or status in AUTH_CODES:
+        return AUTH
+    if status in BLOCKED_CODES:
+        return BLOCKED
+    if status in CONFLICT_CODES:
+        return CONFLICT
+    return TRANSIENT
+
+
+class Recovery(object):
+
+    def __init__(self, backoff={}, max_attempts=10):
+        self.backoff = DEFAULT_BACKOFF.copy()
+        self.backoff.update((k, tuple(v)) for k, v in backoff.items())
+        self.max_attempts = max_attempts
+        self.attempts = 0  # failures in a row
+        self.counts = {}
+        self.downtime = {}
+        self.failed_at = None
+
+    def failed(self, kind, now):
+        """ returns delay before the next try or None to give up """
+        if self.attempts >= self.max_attempts:
+            return None
+
+        if self.failed_at is None:
+            self.failed_at = now
+        self.attempts += 1
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+        first, limit = self.backoff[kind]
+        return min(first * 2**(self.attempts - 1), limit)
+
+    def succeeded(self, kind, now):
+        """ loop step passed after a failure, returns downtime """
+        if self.failed_at is None:
+            return 0
+        downtime = now - self.failed_at
+        self.downtime[kind] = self.downtime.get(kind, 0) + downtime
+        self.failed_at = None
+        self.attempts = 0
+        return downtime
+
+    def stats(self):
+        return {
+            'counts': self.counts,
+            'downtime': self.downtime,
+            'attempts': self.attempts,
+        }
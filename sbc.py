@@ -0,0 +1,678 @@
+#!/usr/bin/env python3
+"""
+    Squad Building Challenge solver
+
+    Challenge requirements (elgReq) are turned into a list of constraints and
+    the cheapest squad is searched over club items plus market fill-ins. The
+    rating, rare and id constraints are solved exactly by dynamic programming
+    over rating sums, nation/league/club constraints by branch-and-bound on
+    top of it. The branch-and-bound is best effort on big clubs: when the
+    time budget runs out the cheapest squad found so far is returned with
+    timeout set, it is valid but not proven to be the cheapest.
+
+    Offline usage:
+        ./sbc.py challenge.json club.json [market.json]
+"""
+import sys
+import itertools
+from collections import Counter
+from time import time
+import numpy as np
+import codec
+
+SQUAD_SIZE = 11
+DEFAULT_TIME_BUDGET = 0.8  # in seconds
+INF = float('inf')
+TABLE_INF = 2**30 - 1  # int32 tables, two of them still add up in int32
+
+# Card quality by rating
+BRONZE, SILVER, GOLD = 1, 2, 3
+
+# elgReq scopes
+GREATER = 'GREATER'
+LOWER = 'LOWER'
+EXACT = 'EXACT'
+
+
+def card_quality(rating):
+    if rating >= 75:
+        return GOLD
+    if rating >= 65:
+        return SILVER
+    return BRONZE
+
+
+def round_div(x, size):
+    """ round(x / size) of integers, ties to even as round() does """
+    q, rem = divmod(x, size)
+    if 2 * rem > size or (2 * rem == size and q % 2):
+        q += 1
+    return q
+
+
+def rating_points(ratings, size=SQUAD_SIZE):
+    """ size * (total + excess) in integers """
+    total = sum(ratings)
+    return size * total + sum(size * r - total for r in ratings
+                              if size * r > total)
+
+
+def points_rating(points, size=SQUAD_SIZE):
+    return round_div(points, size) // size
+
+
+def team_rating(ratings, size=SQUAD_SIZE):
+    """ FUT team rating: players above average count twice for the excess """
+    return points_rating(rating_points(ratings, size), size)
+
+
+def min_points(rating, size=SQUAD_SIZE):
+    """ the least rating_points of a squad with the team rating """
+    points = size * size * rating - size
+    while points_rating(points, size) < rating:
+        points += 1
+    return points
+
+
+class Candidate(object):
+    """ One card which can be put into the squad """
+    __slots__ = ('id', 'assetId', 'rating', 'nation', 'league', 'club',
+                 'rare', 'quality', 'cost', 'source')
+
+    def __init__(self, item_data, cost, source='club'):
+        self.id = item_data['id']
+        self.assetId = item_data.get('assetId', item_data.get('resourceId'))
+        self.rating = item_data['rating']
+        self.nation = item_data.get('nation', 0)
+        self.league = item_data.get('leagueId', 0)
+        self.club = item_data.get('teamid', 0)
+        self.rare = 1 if item_data.get('rareflag', 0) else 0
+        self.quality = card_quality(self.rating)
+        self.cost = cost
+        self.source = source
+
+    def dump(self):
+        return {
+            'id': self.id,
+            'assetId': self.assetId,
+            'rating': self.rating,
+            'cost': self.cost,
+            'source': self.source,
+        }
+
+
+class Challenge(object):
+    """
+        Parsed challenge requirements
+
+        min_rating       - minimum team rating
+        min_player / max_player - per player rating bounds
+        min_quality / max_quality - per player card quality bounds
+        min_rare         - minimum amount of rare players
+        distinct         - {'nation': (min, max), ...} distinct value counts
+        same             - {'nation': n, ...} at least n players share a value
+        ids              - [(field, set(values), count), ...] at least count
+                           players with field in values
+    """
+    FIELDS = {
+        'NATION': 'nation',
+        'LEAGUE': 'league',
+        'CLUB': 'club',
+    }
+
+    def __init__(self, challenge_id=0, name='', size=SQUAD_SIZE):
+        self.id = challenge_id
+        self.name = name
+        self.size = size
+        self.min_rating = 0
+        self.min_player = 0
+        self.max_player = 99
+        self.min_quality = BRONZE
+        self.max_quality = GOLD
+        self.min_rare = 0
+        self.distinct = {}
+        self.same = {}
+        self.ids = []
+
+    @classmethod
+    def from_json(cls, data):
+        """ data - one item of the setId challenges response """
+        challenge = cls(data.get('challengeId', 0), data.get('name', ''))
+        for req in data.get('elgReq', []):
+            challenge.add_requirement(req)
+        return challenge
+
+    def add_requirement(self, req):
+        kind = req.get('type', '')
+        scope = req.get('scope', GREATER)
+        value = req.get('eligibilityValue', 0)
+        count = req.get('count', -1)
+
+        if kind == 'TEAM_RATING':
+            self.min_rating = value
+        elif kind == 'PLAYER_COUNT':
+            self.size = value
+        elif kind == 'PLAYER_MIN_OVR':
+            self.min_player = value
+        elif kind == 'PLAYER_MAX_OVR':
+            self.max_player = value
+        elif kind == 'PLAYER_QUALITY' or kind == 'PLAYER_LEVEL':
+            if scope == LOWER:
+                self.max_quality = value
+            elif scope == EXACT:
+                self.min_quality = self.max_quality = value
+            else:
+                self.min_quality = value
+        elif kind == 'PLAYER_RARITY' or kind == 'RARE_COUNT':
+            self.min_rare = count if count > 0 else value
+        elif kind.endswith('_COUNT') and kind[:-6] in self.FIELDS:
+            # NATION_COUNT, LEAGUE_COUNT, CLUB_COUNT - distinct values
+            field = self.FIELDS[kind[:-6]]
+            low, high = self.distinct.get(field, (0, self.size))
+            if scope == LOWER:
+                high = value
+            elif scope == EXACT:
+                low = high = value
+            else:
+                low = value
+            self.distinct[field] = (low, high)
+        elif kind.startswith('SAME_') and kind[5:-6] in self.FIELDS:
+            # SAME_NATION_COUNT, SAME_LEAGUE_COUNT, SAME_CLUB_COUNT
+            self.same[self.FIELDS[kind[5:-6]]] = value
+        elif kind.endswith('_ID') and kind[:-3] in self.FIELDS:
+            # NATION_ID, LEAGUE_ID, CLUB_ID
+            values = req.get('eligibilityValues', [value])
+            self.ids.append((self.FIELDS[kind[:-3]], set(values),
+                             count if count > 0 else 1))
+        else:
+            return False
+
+        return True
+
+    def signature(self, c):
+        """ cards with the same signature are equal for the challenge """
+        return (c.rating, c.rare if self.min_rare else 0) + \
+            tuple(getattr(c, field) for field in self.distinct) + \
+            tuple(getattr(c, field) for field in self.same) + \
+            tuple(getattr(c, field) in values
+                  for field, values, need in self.ids)
+
+    def player_allowed(self, c):
+        return self.min_player <= c.rating <= self.max_player and \
+            self.min_quality <= c.quality <= self.max_quality
+
+    def violation(self, squad):
+        """ (kind, field) of the first broken nation/league/club constraint """
+        for field, (low, high) in self.distinct.items():
+            if len(set(getattr(c, field) for c in squad)) > high:
+                return 'max', field
+        for field, need in self.same.items():
+            if max(Counter(getattr(c, field)
+                           for c in squad).values()) < need:
+                return 'same', field
+        for field, (low, high) in self.distinct.items():
+            if len(set(getattr(c, field) for c in squad)) < low:
+                return 'min', field
+        return None
+
+    def check(self, squad):
+        """ full validation of the finished squad """
+        if len(squad) != self.size:
+            return False
+        if team_rating([c.rating for c in squad], self.size) < self.min_rating:
+            return False
+        if sum(c.rare for c in squad) < self.min_rare:
+            return False
+        for field, (low, high) in self.distinct.items():
+            n = len(set(getattr(c, field) for c in squad))
+            if n < low or n > high:
+                return False
+        for field, need in self.same.items():
+            counts = {}
+            for c in squad:
+                v = getattr(c, field)
+                counts[v] = counts.get(v, 0) + 1
+            if max(counts.values()) < need:
+                return False
+        for field, values, need in self.ids:
+            if sum(1 for c in squad if getattr(c, field) in values) < need:
+                return False
+        return True
+
+
+def prepare_candidates(challenge, candidates):
+    """
+        Drop cards which can't be used and keep only the cheapest copy of each
+        player and at most squad size cards which are equal for the challenge
+    """
+    by_asset = {}
+    for c in candidates:
+        if not challenge.player_allowed(c):
+            continue
+        if c.assetId not in by_asset or by_asset[c.assetId].cost > c.cost:
+            by_asset[c.assetId] = c
+
+    result = []
+    per_signature = {}
+    for c in sorted(by_asset.values(), key=lambda c: (c.cost, -c.rating)):
+        sig = challenge.signature(c)
+        if per_signature.get(sig, 0) >= challenge.size:
+            continue
+        per_signature[sig] = per_signature.get(sig, 0) + 1
+        result.append(c)
+
+    return result
+
+
+def cap_shift(table, axis, n):
+    """ quota counts on the axis go up by n, counts stop at the need """
+    need = table.shape[axis] - 1
+
+    def at(i):
+        return (slice(None), ) * axis + (i, )
+
+    top = table[at(slice(max(need - n, 0), None))].min(axis=axis)
+    if n < need:
+        table[at(slice(n, need))] = table[at(slice(None, need - n))]
+    table[at(slice(None, min(n, need)))] = TABLE_INF
+    table[at(need)] = top
+    return table
+
+
+class SquadTable(object):
+    """
+        Cheapest squad of a card pool by dynamic programming
+
+        Cards are grouped by rating and by the quotas they count for, inside
+        a group only the cheapest ones can be picked. A table keeps the least
+        cost of k cards per quota counts (capped at the need) and rating sum.
+        The team rating depends on which cards are above the average, so
+        tables are built from the highest rating down and from the lowest up
+        and every split between two ratings is tried as the average.
+
+        quotas - [(field, values, need), ...] at least need cards with the
+                 field in values, 'rare' counts as a field
+    """
+
+    def __init__(self, cards, size, min_rating=0, quotas=()):
+        self.size = size
+        self.min_rating = min_rating
+        self.needs = tuple(need for field, values, need in quotas)
+
+        # Cards are sorted by cost. A card is never needed if size cards
+        # before it have at least its rating and count for its quotas: one
+        # of them is free to take its place.
+        groups = {}
+        above = {}
+        for c in cards:
+            pattern = tuple(getattr(c, field) in values
+                            for field, values, need in quotas)
+            if sum(above.get(pattern, [])[c.rating:]) >= size:
+                continue
+            for sub in itertools.product(*((False, True) if p else (False, )
+                                           for p in pattern)):
+                above.setdefault(sub, [0] * 100)[c.rating] += 1
+            groups.setdefault((c.rating, pattern), []).append(c)
+        self.keys = sorted(groups, key=lambda k: -k[0])
+        self.groups = [groups[k] for k in self.keys]
+        self.cum = [
+            np.minimum(np.cumsum([0] + [c.cost for c in g]),
+                       TABLE_INF).astype(np.int32)
+            for g in self.groups
+        ]
+
+        ratings = [k[0] for k in self.keys]
+        self.base = min(ratings, default=0)
+        self.width = size * (max(ratings, default=0) - self.base) + 1
+        self.shape = (size + 1, ) + tuple(n + 1 for n in self.needs) + \
+            (self.width, )
+
+    def empty(self):
+        table = np.full(self.shape, TABLE_INF, np.int32)
+        table[(0, ) * (len(self.shape) - 1) + (0, )] = 0
+        return table
+
+    def add(self, table, g):
+        """ table plus the cards of the group g """
+        out = table.copy()
+        d = self.keys[g][0] - self.base
+        pattern = self.keys[g][1]
+        quotas = (slice(None), ) * len(self.needs)
+        for n in range(1, len(self.cum[g])):
+            cost = self.cum[g][n]
+            dst = out[(slice(n, None), ) + quotas + (slice(n * d, None), )]
+            src = (slice(None, self.size + 1 - n), ) + quotas + \
+                (slice(None, self.width - n * d), )
+            if any(pattern):
+                moved = table + cost
+                for axis, counted in enumerate(pattern):
+                    if counted:
+                        moved = cap_shift(moved, axis + 1, n)
+                np.minimum(dst, moved[src], out=dst)
+            else:
+                np.minimum(dst, table[src] + cost, out=dst)
+        return out
+
+    def solve(self, limit=INF):
+        """ (cost, squad), squad is None if there is none below the limit """
+        size = self.size
+        if sum(len(g) for g in self.groups) < size or \
+                any(n > size for n in self.needs):
+            return INF, None
+
+        count = len(self.groups)
+        # high[g] - groups before g, low[g] - groups g and after
+        self.high = [self.empty()]
+        for g in range(count):
+            self.high.append(self.add(self.high[-1], g))
+        full = self.high[count][(size, ) + self.needs]
+        s = int(np.argmin(full))
+        # without the rating constraint this is the answer, else a bound
+        if full[s] >= min(limit, TABLE_INF):
+            return INF, None
+        if self.min_rating <= 0:
+            return int(full[s]), self.walk_high(count, size, self.needs,
+                                                  s)
+
+        self.low = [None] * count + [self.empty()]
+        for g in range(count - 1, -1, -1):
+            self.low[g] = self.add(self.low[g + 1], g)
+
+        best = (limit, None)
+        x_min = min_points(self.min_rating, size)
+        quotas = len(self.needs)
+        flip = (slice(None), ) + (slice(None, None, -1), ) * quotas
+        for b in range(count + 1):
+            if 0 < b < count and self.keys[b - 1][0] == self.keys[b][0]:
+                continue
+            # sums where the cards before b are exactly the ones above the
+            # average
+            lo = size * self.keys[b][0] if b < count else -INF
+            hi = size * self.keys[b - 1][0] - 1 if b else INF
+            lo = max(lo, size * self.base) - size * self.base
+            hi = min(hi, size * self.base + self.width - 1) - \
+                size * self.base
+            if lo > hi:
+                continue
+            # the cheapest h high and size - h low cards bound every h
+            bound = self.high[b].reshape(size + 1, -1).min(axis=1) + \
+                self.low[b].reshape(size + 1, -1).min(axis=1)[::-1]
+            if bound.min() >= min(best[0], TABLE_INF):
+                continue
+            sums = np.arange(lo, hi + 1)
+            totals = sums + size * self.base
+            # low part with at least need - q quota cards at the index q
+            low = self.low[b]
+            for axis in range(1, quotas + 1):
+                low = np.flip(np.minimum.accumulate(np.flip(low, axis), axis),
+                              axis)
+            low = low[flip]
+
+            for h in range(size + 1):
+                if bound[h] >= min(best[0], TABLE_INF):
+                    continue
+                high = self.high[b][h].reshape(-1, self.width)
+                lows = low[size - h].reshape(-1, self.width)
+                found = np.flatnonzero((high < TABLE_INF).any(axis=0))
+                if not len(found) or not (lows < TABLE_INF).any():
+                    continue
+                hs = np.arange(found[0], found[-1] + 1)
+                ls = sums[:, None] - hs[None, :]
+                points = size * (h * self.base + hs)
+                need = x_min - size * totals + h * totals
+                ok = (ls >= 0) & (ls < self.width) & \
+                    (points[None, :] >= need[:, None])
+                if not ok.any():
+                    continue
+                ls = np.clip(ls, 0, self.width - 1)
+                # [q, sum, high sum]
+                cost = high[:, None, hs] + lows[:, ls]
+                cost[:, ~ok] = TABLE_INF
+                i = int(np.argmin(cost))
+                if cost.flat[i] < min(best[0], TABLE_INF):
+                    q, si, j = np.unravel_index(i, cost.shape)
+                    q = np.unravel_index(q, self.shape[1:-1]) if quotas \
+                        else ()
+                    q = tuple(int(k) for k in q)
+                    rest = tuple(n - k for n, k in zip(self.needs, q))
+                    best = (int(cost.flat[i]),
+                            (b, h, q, rest, int(hs[j]), int(ls[si, j])))
+
+        cost, split = best
+        if split is None:
+            return INF, None
+        b, h, q, rest, hs, ls = split
+        squad = self.walk_high(b, h, q, hs)
+        # the real quota counts of the low part may be above the rest
+        counts = itertools.product(*(range(k, n + 1)
+                                     for k, n in zip(rest, self.needs)))
+        r = min(counts, key=lambda r: self.low[b][(size - h, ) + r + (ls, )])
+        return cost, squad + self.walk_low(b, size - h, r, ls)
+
+    def previous(self, g, k, q, s):
+        """ (n, state before the group g) pairs which lead to the state """
+        d = self.keys[g][0] - self.base
+        pattern = self.keys[g][1]
+        for n in range(min(k, len(self.cum[g]) - 1) + 1):
+            if s - n * d < 0:
+                break
+            choices = []
+            for counted, have, need in zip(pattern, q, self.needs):
+                if not counted or not n:
+                    choices.append([have])
+                elif have < need:
+                    choices.append([have - n] if have >= n else [])
+                else:
+                    choices.append(range(max(need - n, 0), need + 1))
+            for before in itertools.product(*choices):
+                yield n, (k - n, ) + before + (s - n * d, )
+
+    def walk_high(self, b, k, q, s):
+        """ cards of the high table b state """
+        squad = []
+        state = (k, ) + tuple(q) + (s, )
+        for g in range(b - 1, -1, -1):
+            value = self.high[g + 1][state]
+            for n, before in self.previous(g, state[0], state[1:-1],
+                                           state[-1]):
+                if self.high[g][before] + self.cum[g][n] == value:
+                    squad += self.groups[g][:n]
+                    state = before
+                    break
+        return squad
+
+    def walk_low(self, b, k, q, s):
+        """ cards of the low table b state """
+        squad = []
+        state = (k, ) + tuple(q) + (s, )
+        for g in range(b, len(self.groups)):
+            value = self.low[g][state]
+            for n, before in self.previous(g, state[0], state[1:-1],
+                                           state[-1]):
+                if self.low[g + 1][before] + self.cum[g][n] == value:
+                    squad += self.groups[g][:n]
+                    state = before
+                    break
+        return squad
+
+
+class Solver(object):
+    """
+        Branch-and-bound over the value constraints
+
+        Every node solves the squad table of its card pool, which is exact
+        for the rating, rare and id constraints. If the squad breaks a
+        nation/league/club constraint the node branches: on a used value to
+        keep or to drop for max distinct, on the shared value for same
+        counts and on a new value to add or to drop for min distinct. A node
+        costs a table, so time is checked on every node.
+    """
+
+    def __init__(self, challenge, candidates, time_budget=DEFAULT_TIME_BUDGET):
+        self.challenge = challenge
+        self.c = prepare_candidates(challenge, candidates)
+        self.time_budget = time_budget
+        self.best = None
+        self.best_cost = INF
+        self.nodes = 0
+        self.timeout = False
+        self.quotas = list(challenge.ids)
+        if challenge.min_rare:
+            self.quotas.append(('rare', {1}, challenge.min_rare))
+
+    def expired(self):
+        self.nodes += 1
+        if time() - self.started > self.time_budget:
+            self.timeout = True
+        return self.timeout
+
+    def solve(self):
+        self.started = time()
+        self.search({}, {}, ())
+        return self.best
+
+    def pool(self, keep, drop):
+        """ candidates left after the keep/drop decisions """
+        cards = self.c
+        for field, values in keep.items():
+            if len(values) >= self.challenge.distinct[field][1]:
+                cards = [c for c in cards if getattr(c, field) in values]
+        for field, values in drop.items():
+            cards = [c for c in cards if getattr(c, field) not in values]
+        return cards
+
+    def search(self, keep, drop, quotas, found=None):
+        """
+            keep   - field -> values which may be used under max distinct,
+                     once full only these values are left in the pool
+            drop   - field -> values removed from the pool
+            quotas - extra (field, values, need) quotas
+            found  - (cost, squad) of the pool when the parent had the same
+        """
+        if self.expired():
+            return
+
+        ch = self.challenge
+        pool = self.pool(keep, drop)
+        if found is None:
+            found = SquadTable(pool, ch.size, ch.min_rating,
+                               self.quotas + list(quotas)).solve(
+                                   self.best_cost)
+        cost, squad = found
+        if squad is None or cost >= self.best_cost:
+            return
+
+        broken = ch.violation(squad)
+        if broken is None:
+            if ch.check(squad):
+                self.best = squad
+                self.best_cost = cost
+            return
+
+        kind, field = broken
+        used = Counter(getattr(c, field) for c in squad)
+        if kind == 'max':
+            kept = keep.get(field, frozenset())
+            v = max((v for v in used if v not in kept), key=used.get)
+            high = ch.distinct[field][1]
+            if len(kept) < high:
+                child = dict(keep, **{field: kept | {v}})
+                self.search(child, drop, quotas,
+                            found if len(kept) + 1 < high else None)
+            self.search(keep, dict(drop, **{field: drop.get(
+                field, frozenset()) | {v}}), quotas)
+        elif kind == 'same':
+            need = ch.same[field]
+            counts = Counter(getattr(c, field) for c in pool)
+            values = sorted((v for v in counts if counts[v] >= need),
+                            key=lambda v: (-used.get(v, 0), -counts[v]))
+            for v in values:
+                self.search(keep, drop, quotas + ((field, {v}, need), ))
+                if self.timeout:
+                    return
+        else:
+            # min distinct: the cheapest card of a value which isn't used
+            c = next((c for c in pool if getattr(c, field) not in used),
+                     None)
+            if c is None:
+                return
+            v = getattr(c, field)
+            self.search(keep, drop, quotas + ((field, {v}, 1), ))
+            self.search(keep, dict(drop, **{field: drop.get(
+                field, frozenset()) | {v}}), quotas)
+
+    def result(self):
+        return {
+            'challengeId': self.challenge.id,
+            'name': self.challenge.name,
+            'solved': self.best is not None,
+            'cost': self.best_cost if self.best else 0,
+            'nodes': self.nodes,
+            'timeout': self.timeout,
+            'candidates': len(self.c),
+            'squad': [c.dump() for c in self.best or []],
+        }
+
+
+def club_candidates(items, price_func=None):
+    """ items - club itemData list, price_func(item_data) - sell value """
+    result = []
+    for item_data in items:
+        if item_data.get('itemType', 'player') != 'player':
+            continue
+        if item_data.get('untradeable') or not price_func:
+            cost = item_data.get('discardValue', 0)
+        else:
+            cost = price_func(item_data)
+        result.append(Candidate(item_data, cost, source='club'))
+    return result
+
+
+def market_candidates(auction_items):
+    """ auction_items - auctionInfo list from the transfermarket search """
+    return [
+        Candidate(item['itemData'], item['buyNowPrice'], source='market')
+        for item in auction_items
+        if item['itemData'].get('itemType') == 'player'
+    ]
+
+
+def solve(challenge_data, club_items, auction_items=[], price_func=None,
+          time_budget=DEFAULT_TIME_BUDGET):
+    """ cheapest squad, best effort under nation/league/club constraints
+        (see timeout in the result)
+    """
+    challenge = Challenge.from_json(challenge_data)
+    candidates = club_candidates(club_items, price_func) + \
+        market_candidates(auction_items)
+    solver = Solver(challenge, candidates, time_budget)
+    solver.solve()
+    return solver.result()
+
+
+def load_json(filename, key=None):
+    with open(filename, 'rb') as f:
+        data = codec.loads(f.read())
+    if key and isinstance(data, dict):
+        return data.get(key, [])
+    return data
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    challenges = load_json(sys.argv[1])
+    if isinstance(challenges, dict):
+        challenges = challenges.get('challenges', [challenges])
+    club = load_json(sys.argv[2], 'itemData')
+    market = load_json(sys.argv[3], 'auctionInfo') if len(sys.argv) > 3 \
+        else []
+
+    for challenge in challenges:
+        print(codec.dumps(solve(challenge, club, market)))
+
+
+if __name__ == '__main__':
+    main()
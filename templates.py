@@ -0,0 +1,95 @@
+"""
+    Item template rules shared by the live bot and the backtester
+
+    item_suited works on one auction item, suited_mask is the same rule over
+    numpy arrays of observations.
+"""
+import numpy as np
+import ladder
+
+EA_TAX = 0.95
+TRAINING_SUBTYPES = (220, 107, 108, 268, 266, 262)
+
+
+def normalize(template):
+    """ fill default values of optional template keys """
+    template['excludePositions'] = template.get('excludePositions', [])
+    template['rating'] = template.get('rating', 0)  # any rating
+    template['resourceId'] = template.get('resourceId', 0)  # any resourceId
+    return template
+
+
+def template_key(template):
+    """ id which survives reloads, the name or the search params """
+    if 'name' in template:
+        return str(template['name'])
+    params = template.get('params', {})
+    return ','.join('{}={}'.format(k, params[k]) for k in sorted(params)
+                    if k not in ('maxb', 'minb'))
+
+
+def potential_profit(price, buy_now):
+    return price * EA_TAX - buy_now
+
+
+def listing_price(price, max_price):
+    """ buy now price for the auction, EA doesn't allow more than max """
+    return ladder.floor(price if price <= max_price else max_price)
+
+
+def listing_price_array(prices, max_prices):
+    return ladder.floor_array(np.minimum(prices, max_prices))
+
+
+def item_suited(template, item, price_func):
+    """
+        Returns (suited, profit), profit is None when template has no profit
+
+        price_func(resourceId) - external price of the player
+    """
+    item_data = item['itemData']
+    if item_data['itemType'] == 'player':
+        if item_data['rating'] < template['rating']:
+            return False, None
+
+        if item_data['preferredPosition'] in template['excludePositions']:
+            return False, None
+
+        if 'profit' in template:
+            profit = potential_profit(price_func(item_data['resourceId']),
+                                      item['buyNowPrice'])
+            return profit >= template['profit'], profit
+        elif item['buyNowPrice'] <= template['params']['maxb']:
+            return True, None
+
+    if item_data['itemType'] == 'training' and \
+            item_data['cardsubtypeid'] in TRAINING_SUBTYPES:
+        return True, None
+
+    return False, None
+
+
+def suited_mask(template, obs, prices):
+    """
+        Vectorised item_suited
+
+        obs    - dict of equal length arrays: itemType, rating,
+                 preferredPosition, cardsubtypeid, buynow
+        prices - external price for every observation
+    """
+    player = obs['itemType'] == 'player'
+    suited = player & (obs['rating'] >= template['rating'])
+    if template['excludePositions']:
+        suited &= ~np.isin(obs['preferredPosition'],
+                           template['excludePositions'])
+
+    if 'profit' in template:
+        suited &= potential_profit(prices, obs['buynow']) >= \
+            template['profit']
+    else:
+        suited &= obs['buynow'] <= template['params']['maxb']
+
+    training = (obs['itemType'] == 'training') & \
+        np.isin(obs['cardsubtypeid'], TRAINING_SUBTYPES)
+
+    return suited | training
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def no_sleeps(monkeypatch):
+    """ the sleeps of fifa.py do nothing, restored after every test """
+    import fifa
+    import standin
+    monkeypatch.setattr(fifa, 'sleep', standin.no_sleep)
+    monkeypatch.setattr(fifa, 'random_sleep', standin.no_sleep)
@@ -0,0 +1,133 @@
+import threading
+from time import time, sleep
+import pytest
+import analytics
+
+
+@pytest.fixture
+def ring():
+    ring = analytics.Ring(8)
+    yield ring
+    ring.close(unlink=True)
+
+
+@pytest.fixture
+def table():
+    table = analytics.PriceTable(8, probes=4)
+    yield table
+    table.close(unlink=True)
+
+
+def batch(resourceIds, kind=analytics.SEARCH, buy_now=1000):
+    return analytics.records([{
+        'buyNowPrice': buy_now,
+        'itemData': {'resourceId': r, 'id': r},
+    } for r in resourceIds], kind)
+
+
+def test_ring_wraps(ring):
+    ring.write(batch(range(1, 6)))
+    assert ring.read()['resourceId'].tolist() == [1, 2, 3, 4, 5]
+    ring.write(batch(range(6, 12)))
+    read = ring.read()
+    assert read['resourceId'].tolist() == list(range(6, 12))
+    assert read['seq'].tolist() == list(range(5, 11))
+    assert ring.lost == 0 and not len(ring.read())
+
+
+def test_ring_overrun_loses_oldest(ring):
+    ring.write(batch(range(1, 6)))
+    ring.write(batch(range(6, 12)))
+    # the consumer is 11 records behind an 8 records ring
+    assert ring.read()['resourceId'].tolist() == list(range(4, 12))
+    assert ring.lost == 3
+
+    # a batch larger than the ring keeps its last records
+    ring.write(batch(range(100, 120)))
+    assert ring.read()['resourceId'].tolist() == list(range(112, 120))
+    assert ring.lost == 3 + 12
+
+
+def test_seqlock_read(table):
+    table.put(5, 900.0, 3, 1000.0)
+    assert table.get(5) == (900.0, 3, 1000.0)
+    assert table.get(13) is None
+
+    # writer in the middle of the slot
+    i = table.find(5)
+    table.slots['seq'][i] += 1
+    assert table.get(5) is None
+    table.slots['seq'][i] += 1
+    assert table.get(5) == (900.0, 3, 1000.0)
+
+
+def test_full_table_evicts_stalest(table):
+    for n, resourceId in enumerate(range(1, 9)):
+        table.put(resourceId, 100.0 * resourceId, 1, 1000.0 + n)
+    assert all(table.get(r) for r in range(1, 9))
+
+    # slots 1-4 are the probe window of 9, 1 is the stalest
+    table.put(9, 900.0, 1, 2000.0)
+    assert table.get(9) == (900.0, 1, 2000.0)
+    assert table.get(1) is None
+    assert all(table.get(r) for r in range(2, 9))
+    table.put(2, 250.0, 2, 2001.0)
+    assert table.get(2) == (250.0, 2, 2001.0)
+
+    # a miss on a full table stops after the probe window
+    assert table.find(12345) is None
+
+
+def test_worker_publishes_medians():
+    ring = analytics.Ring(64)
+    table = analytics.PriceTable(16)
+    stopped = threading.Event()
+    thread = threading.Thread(
+        target=analytics.worker,
+        args=(ring.name, 64, table.name, 16, stopped),
+        kwargs={'publish_interval': 0, 'limit': 2})
+    thread.start()
+
+    def published(resourceId, count=None):
+        deadline = time() + 5
+        while time() < deadline:
+            found = table.get(resourceId)
+            if found and count in (None, found[1]):
+                return found[:2]
+            sleep(0.01)
+
+    try:
+        ring.write(batch([1, 1, 1], buy_now=1000))
+        ring.write(batch([1], buy_now=4000))
+        assert published(1) == (1000.0, 4)
+
+        ring.write(batch([2], kind=analytics.TRADEPILE))
+        ring.write(batch([0, 3, 4]))
+        assert published(4) == (1000.0, 1)
+        assert table.get(2) is None and table.get(0) is None
+
+        # 1 is the least recently seen, its window starts again
+        ring.write(batch([1], buy_now=3000))
+        assert published(1, count=1) == (3000.0, 1)
+    finally:
+        stopped.set()
+        thread.join(5)
+        ring.close(unlink=True)
+        table.close(unlink=True)
+
+
+def test_analytics_process():
+    web_analytics = analytics.Analytics(ring_size=64, table_size=16)
+    try:
+        web_analytics.publish([{
+            'buyNowPrice': price,
+            'itemData': {'resourceId': 7, 'id': n},
+        } for n, price in enumerate([800, 900, 1000])], analytics.SEARCH)
+        deadline = time() + 30
+        while web_analytics.price(7) is None and time() < deadline:
+            sleep(0.05)
+        assert web_analytics.price(7) == 900.0
+        assert web_analytics.stats() == {'written': 3, 'alive': True}
+    finally:
+        web_analytics.close()
+    assert not web_analytics.process.is_alive()
@@ -0,0 +1,66 @@
+import numpy as np
+import backtest
+
+
+def observations(rows):
+    """ rows - [(time, resourceId, buynow), ...] """
+    obs = {
+        'time': np.array([r[0] for r in rows], dtype=np.float64),
+        'resourceId': np.array([r[1] for r in rows], dtype=np.int64),
+        'buynow': np.array([r[2] for r in rows], dtype=np.float64),
+        'rating': np.full(len(rows), 85, dtype=np.int64),
+        'cardsubtypeid': np.zeros(len(rows), dtype=np.int64),
+        'leagueId': np.zeros(len(rows), dtype=np.int64),
+        'nation': np.zeros(len(rows), dtype=np.int64),
+        'itemType': np.array(['player'] * len(rows)),
+        'preferredPosition': np.array(['ST'] * len(rows)),
+    }
+    return obs
+
+
+def test_prices_only_from_the_past():
+    obs = observations([
+        (1, 7, 1000),
+        (2, 8, 50),
+        (3, 7, 2000),
+        (4, 7, 3000),
+        (5, 7, 100000),
+    ])
+    prices = backtest.median_prices(obs)
+    assert np.isnan(prices[0]) and np.isnan(prices[1])
+    assert list(prices[2:]) == [1000, 1500, 2000]
+
+
+def test_same_time_and_window():
+    obs = observations([(1, 7, 1000), (2, 7, 10), (2, 7, 20), (3, 7, 30),
+                        (4, 7, 40)])
+    prices = backtest.median_prices(obs, window=2)
+    # both observations at 2 see only the first one
+    assert list(prices[1:]) == [1000, 1000, 15, 25]
+
+
+def test_chunks_and_order():
+    rnd = np.random.default_rng(5)
+    rows = [(float(t), int(rnd.integers(1, 5)), float(rnd.integers(1, 100)))
+            for t in rnd.permutation(300)]
+    obs = observations(rows)
+    prices = backtest.median_prices(obs, window=8, chunk=7)
+
+    for i, (t, rid, _) in enumerate(rows):
+        earlier = sorted((r for r in rows if r[1] == rid and r[0] < t),
+                         key=lambda r: r[0])[-8:]
+        if earlier:
+            assert prices[i] == np.median([r[2] for r in earlier])
+        else:
+            assert np.isnan(prices[i])
+
+
+def test_no_hits_without_history():
+    obs = observations([(1, 7, 1000), (2, 7, 400), (3, 7, 5000)])
+    template = {'name': 't', 'params': {'type': 'player', 'maxb': 10000},
+                'rating': 80, 'profit': 100}
+    result = backtest.backtest([template], obs)[0]
+    # the second observation is bought against the first price
+    assert result['seen'] == 3
+    assert result['hits'] == 1
+    assert result['spent'] == 400
@@ -0,0 +1,98 @@
+import pytest
+import templates
+from bandit import Arm, TemplateSelector
+import standin
+
+PROFIT = {'name': 'profit', 'params': {'maxb': 2000}, 'profit': 100}
+PLAIN = {'params': {'maxb': 1000, 'lev': 'gold'}}
+
+
+def test_arm_update():
+    arm = Arm()
+    arm.update(10, 3, [100, 300])
+    arm.update(2, 5, [])
+    assert (arm.successes, arm.failures) == (5, 7)
+    assert arm.profit_n == 2
+    assert arm.profit_sum == 400
+    assert arm.profit_sq == 100**2 + 300**2
+
+
+def test_choose_prefers_productive_templates():
+    selector = TemplateSelector(seed=1)
+    good = {'name': 'good', 'params': {}}
+    bad = {'name': 'bad', 'params': {}}
+    for _ in range(20):
+        selector.update(good, 10, 5, [400] * 5)
+        selector.update(bad, 10, 0, [])
+
+    picks = [selector.choose([bad, good]) for _ in range(200)]
+    assert picks.count(1) > 190
+
+
+def test_realised_profit_without_threshold():
+    selector = TemplateSelector()
+    selector.bought(PLAIN, 7, 1000)
+    selector.bought(PROFIT, 8, 1000)
+    assert list(selector.pending) == ['7']
+
+    selector.sold(8, 5000)
+    selector.sold(7, 2000)
+    arm = selector.arms[templates.template_key(PLAIN)]
+    assert arm.profit_n == 1
+    assert arm.profit_sum == pytest.approx(2000 * templates.EA_TAX - 1000)
+    assert 'profit' not in selector.arms
+    assert not selector.pending
+
+    selector.bought(PLAIN, 9, 1000)
+    selector.sold(9, None)
+    assert arm.profit_n == 1 and not selector.pending
+
+
+def test_pending_limit():
+    selector = TemplateSelector(pending_limit=3)
+    for itemId in range(5):
+        selector.bought(PLAIN, itemId, 100)
+    assert list(selector.pending) == ['2', '3', '4']
+
+
+def test_state_survives_restart(tmp_path):
+    filename = str(tmp_path / 'stats.json')
+    selector = TemplateSelector(filename)
+    selector.update(PROFIT, 4, 1, [150])
+    selector.bought(PLAIN, 7, 1000)
+    selector.save()
+
+    selector = TemplateSelector(filename)
+    assert selector.arms['profit'].successes == 1
+    selector.sold(7, 2000)
+    assert selector.arms[templates.template_key(PLAIN)].profit_n == 1
+
+    with open(filename, 'w') as f:
+        f.write('{"arms": {"profit": ')
+    assert TemplateSelector(filename).arms == {}
+
+
+def test_bulk_quick_sell_realises_discard_value():
+    web = standin.make_fifa()
+    web.selector = TemplateSelector()
+    web.selector.bought(PLAIN, 7, 100)
+    web.selector.bought(PLAIN, 8, 100)
+    web.packs.opened(300, {'itemList': [{'id': 7, 'discardValue': 300}]})
+
+    web.quick_sell_ids = [7, 8]
+    assert web.QuickSellItems()
+    arm = web.selector.arms[templates.template_key(PLAIN)]
+    # 8 has no pack history, it is only forgotten
+    assert (arm.profit_n, arm.profit_sum) == (1, 200)
+    assert not web.selector.pending
+
+
+def test_suited_is_counted_without_coins():
+    web = standin.make_fifa()
+    web.selector = TemplateSelector()
+    web.ledger.balance(0)
+    web.BuyItemByIndex(0)
+
+    arm = web.selector.arm(web.Items[0])
+    assert arm.successes > 0
+    assert web.adapter.requests == arm.successes + arm.failures
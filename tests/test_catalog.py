@@ -0,0 +1,82 @@
+import pytest
+import yaml
+import catalog
+import templates
+import standin
+
+
+def write_items(tmp_path, items):
+    path = tmp_path / 'items.yaml'
+    path.write_text(yaml.safe_dump(items) if not isinstance(items, str)
+                    else items)
+    return str(path)
+
+
+def test_load_normalizes(tmp_path):
+    loaded = catalog.load(write_items(tmp_path, [
+        {'name': 'a', 'params': {'maxb': 1000}},
+        {'params': {'maxb': 900.5, 'lev': 'gold'}, 'rating': 84},
+    ]))
+    assert [t['rating'] for t in loaded.items] == [0, 84]
+    assert loaded.items[0]['excludePositions'] == []
+    assert not loaded.keyed
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    'not: a list',
+    '[{name: a',
+    [{'params': {'maxb': 1000}, 'rating': '84'}],
+    [{'params': {'maxb': 'cheap'}}],
+    [{'params': {'maxb': True}}],
+    [{'params': {'maxb': 1000, 'minb': None}}],
+    [{'params': {'maxb': 1000}, 'profit': '100'}],
+    [{'params': 'maxb'}],
+])
+def test_load_rejects(tmp_path, items):
+    with pytest.raises(catalog.CatalogError):
+        catalog.load(write_items(tmp_path, items))
+
+
+def test_load_keyed(tmp_path):
+    loaded = catalog.load(write_items(tmp_path, [
+        {'definitionId': 1}, {'definitionId': 2}]), items_dict=True)
+    assert sorted(loaded.items_dict) == [1, 2]
+
+    for items in ([{'definitionId': 1}, {'definitionId': 1}], [{}]):
+        with pytest.raises(catalog.CatalogError):
+            catalog.load(write_items(tmp_path, items), items_dict=True)
+
+
+def test_defaults_are_not_shared():
+    first = catalog.Catalog()
+    first.items.append({})
+    first.items_dict[1] = {}
+    assert catalog.Catalog().items == []
+    assert catalog.Catalog().items_dict == {}
+
+
+def test_bad_reload_keeps_catalog(tmp_path):
+    web = standin.make_fifa()
+    filename = write_items(tmp_path, [{'name': 'a', 'params': {'maxb': 1}}])
+    assert web.load_items(filename)
+    write_items(tmp_path, [{'name': 'a', 'params': {'maxb': 'x'}}])
+    assert not web.ReloadItems()
+    web.ApplyCatalog()
+    assert web.Items[0]['params']['maxb'] == 1
+
+
+def test_template_key():
+    assert templates.template_key({'name': 'a', 'params': {}}) == 'a'
+    assert templates.template_key(
+        {'params': {'maxb': 1000, 'lev': 'gold', 'type': 'player'}}) == \
+        templates.template_key(
+            {'params': {'type': 'player', 'lev': 'gold', 'maxb': 2000}})
+
+
+def test_dump_maxb_is_keyed_by_template():
+    web = standin.make_fifa()
+    web.dump_scheduler = standin.fifa.DumpScheduler([])
+    web.DumpNext()
+    web.DumpNext()
+    assert set(web.dump_maxb) == {'any', 'profit'}
@@ -0,0 +1,90 @@
+import os
+import sys
+import importlib.util
+import numpy as np
+import pytest
+import codec
+
+PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                    'codec.py')
+BLOCKED = {
+    'orjson': (),
+    'msgspec': ('orjson', ),
+    'json': ('orjson', 'msgspec'),
+}
+
+
+@pytest.fixture(params=sorted(BLOCKED))
+def backend(request, monkeypatch):
+    """ codec loaded again with the faster backends hidden """
+    name = request.param
+    if name != 'json':
+        pytest.importorskip(name)
+    for blocked in BLOCKED[name]:
+        monkeypatch.setitem(sys.modules, blocked, None)
+    spec = importlib.util.spec_from_file_location('codec_' + name, PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.BACKEND == name
+    return module
+
+
+class Response(object):
+
+    def __init__(self, content):
+        self.content = content
+        self.text = content.decode('utf-8', 'replace')
+
+
+def test_round_trip(backend):
+    data = {'auctionInfo': [{'tradeId': 1, 'buyNowPrice': 900}],
+            'name': 'Pelé', 'nested': {'list': [1.5, None, True]}}
+    assert backend.loads(backend.dumps(data)) == data
+    assert backend.loads(backend.dumps(data).encode()) == data
+
+
+@pytest.mark.parametrize('data', [
+    b'', b'{', b'{"a": }', b'\xff\xfe', 'not json', '"\ud800"', b'[1,]',
+])
+def test_decode_error(backend, data):
+    with pytest.raises(backend.DecodeError):
+        backend.loads(data)
+    assert issubclass(backend.DecodeError, ValueError)
+
+
+def test_numpy_values():
+    if codec.BACKEND != 'orjson':
+        pytest.skip('numpy values are serialized by orjson only')
+    assert codec.loads(codec.dumps({'n': np.int64(3)})) == {'n': 3}
+
+
+def test_response_json_decodes_once(monkeypatch):
+    calls = []
+    original = codec._loads
+
+    def loads(data):
+        calls.append(data)
+        return original(data)
+
+    monkeypatch.setattr(codec, '_loads', loads)
+    r = Response(b'{"credits": 5}')
+    assert codec.response_json(r) == {'credits': 5}
+    assert codec.response_json(r) is r.__dict__['_decoded']
+    assert len(calls) == 1
+
+    r = Response(b'<html>')
+    for _ in range(2):
+        with pytest.raises(codec.DecodeError):
+            codec.response_json(r)
+    assert len(calls) == 2
+    assert codec.response_data(r) == '<html>'
+    assert codec.response_data(Response(b'')) == ''
+
+
+def test_value_end():
+    text = '[{"a": "}]\\"", "b": [1, {}]}, {"c": 2}]'
+    end = codec.value_end(text, 1)
+    assert codec.loads(text[1:end]) == {'a': '}]"', 'b': [1, {}]}
+    assert codec.value_end(text, end + 2) == len(text) - 1
+    assert codec.value_end('{"a": "b', 0) is None
+    assert codec.value_end('{"a": [1', 0) is None
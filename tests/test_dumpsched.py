@@ -0,0 +1,107 @@
+import pytest
+import requests
+from dumpsched import DumpScheduler
+import standin
+import templates
+
+
+def test_due_times():
+    scheduler = DumpScheduler(['calm', 'moving'], interval=600)
+    assert scheduler.wait_time(1000) == 0
+    first = scheduler.pop()
+    scheduler.done(first, [1000, 1200], 1000)
+    second = scheduler.pop()
+    scheduler.done(second, [1000, 1200], 1000)
+    assert {first, second} == {'calm', 'moving'}
+
+    # unknown volatility counts as high
+    due = 1000 + 600 / 11
+    assert scheduler.wait_time(1000) == pytest.approx(due - 1000)
+    assert scheduler.wait_time(due + 5) == 0
+
+    # a calm template is refreshed later than a moving one
+    # the cheapest listing is steady while the search window moves
+    calm, moving = scheduler.states['calm'], scheduler.states['moving']
+    now = due
+    for n in range(5):
+        scheduler.pop()
+        scheduler.pop()
+        scheduler.done('calm', [1000, 5000 + 1000 * n], now)
+        scheduler.done('moving', [1000 * 1.3**n], now)
+    assert calm.volatility() < 1e-9
+    assert scheduler.due(calm) == pytest.approx(now + 600)
+    assert scheduler.due(moving) < scheduler.due(calm)
+
+
+def test_token_bucket_per_request():
+    scheduler = DumpScheduler(['a'], budget=6)
+    assert scheduler.token_wait(0) == 0
+    scheduler.charge(0, 6)
+    assert scheduler.token_wait(0) == pytest.approx(10)
+    assert scheduler.token_wait(5) == pytest.approx(5)
+    assert scheduler.token_wait(10) == 0
+
+
+def test_empty_scheduler():
+    scheduler = DumpScheduler([])
+    assert scheduler.pop() is None
+    assert scheduler.wait_time(0) == scheduler.interval
+
+
+def test_dump_charges_every_page():
+    web = standin.make_fifa()
+    web.dump_scheduler = DumpScheduler([], budget=60)
+    web.DumpNext()
+    pages = web.last_dump['requests']
+    assert pages == web.adapter.requests
+    assert web.dump_scheduler.tokens == pytest.approx(60 - pages, abs=0.1)
+
+
+def test_failed_dump_is_not_recorded(monkeypatch):
+    web = standin.make_fifa()
+    web.dump_scheduler = DumpScheduler([])
+    web.catalog = standin.fifa.catalog.Catalog(web.Items[:1])
+    key = templates.template_key(web.Items[0])
+
+    def fail(*args, **kwargs):
+        raise requests.exceptions.ConnectionError('reset')
+
+    monkeypatch.setattr(web, 'SearchByIndex', fail)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        web.DumpNext()
+
+    state = web.dump_scheduler.states[key]
+    assert state.dumps == 0 and state.last_dump is None
+    assert web.dump_scheduler.pop() == key
+
+
+def test_state_follows_template_on_reload():
+    scheduler = DumpScheduler(['a', 'b'], interval=600)
+    scheduler.pop()
+    scheduler.pop()
+    scheduler.done('a', [1000, 1100], 1000)
+    scheduler.done('b', [2000, 2100], 1000)
+    a = scheduler.states['a']
+
+    # a reload reorders the templates, drops one and adds another
+    scheduler.update(['c', 'a'])
+    assert scheduler.states['a'] is a and a.dumps == 1
+    assert set(scheduler.states) == {'c', 'a'}
+    assert scheduler.pop() == 'c'
+    assert scheduler.pop() == 'a'
+    assert scheduler.pop() is None
+
+
+def test_dump_follows_reordered_items():
+    web = standin.make_fifa()
+    web.dump_scheduler = DumpScheduler([], budget=60)
+    web.DumpNext()
+    first = web.last_dump
+    key = [k for k, s in web.dump_scheduler.states.items() if s.dumps][0]
+
+    web.catalog = standin.fifa.catalog.Catalog(web.Items[::-1])
+    web.DumpNext()
+    states = web.dump_scheduler.states
+    assert states[key].dumps == 1
+    assert all(s.dumps == 1 for s in states.values())
+    assert first is not web.last_dump
@@ -0,0 +1,116 @@
+import os
+import sys
+import subprocess
+import numpy as np
+import pytest
+import eventlog
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def fill(log, count, start=1000.0):
+    events = []
+    for n in range(count):
+        event = (start + n, 1 + n % 7, n % 5 - 1, 100 + n % 13, n, 0, n * 10,
+                 n % 3)
+        log.add(event[1], event[2], event[3], event[4], price=event[6],
+                value=event[7], now=event[0])
+        events.append(event)
+    return np.array(events, eventlog.EVENT)
+
+
+def found(directory, **filters):
+    chunks = list(eventlog.query(directory, **filters))
+    return np.concatenate(chunks) if chunks else np.zeros(0, eventlog.EVENT)
+
+
+def expected(events, since=None, until=None, types=None, resourceId=None,
+             template=None):
+    mask = np.ones(len(events), bool)
+    if since is not None:
+        mask &= events['time'] >= since
+    if until is not None:
+        mask &= events['time'] <= until
+    if types:
+        mask &= np.isin(events['type'], types)
+    if resourceId is not None:
+        mask &= events['resourceId'] == resourceId
+    if template is not None:
+        mask &= events['template'] == template
+    return events[mask]
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'since': 1500, 'until': 4100.5},
+    {'types': [eventlog.BID, eventlog.SOLD]},
+    {'resourceId': 105, 'since': 3000},
+    {'template': 2, 'types': [eventlog.SEARCH]},
+    {'since': 9000},
+])
+def test_query_sealed_and_open_segments(tmp_path, filters):
+    directory = str(tmp_path)
+    log = eventlog.EventLog(directory, batch=500, segment_records=2500)
+    events = fill(log, 6000)
+    log.flush()
+
+    # two sealed segments with an index and one open segment
+    segments = sorted(os.listdir(directory))
+    assert len(segments) == 3
+    assert [eventlog.read_segment(os.path.join(directory, s))[1] is not None
+            for s in segments] == [True, True, False]
+
+    result = found(directory, **filters)
+    assert np.array_equal(np.sort(result, order='time'),
+                          expected(events, **filters))
+    log.close()
+    result = found(directory, **filters)
+    assert np.array_equal(np.sort(result, order='time'),
+                          expected(events, **filters))
+
+
+def test_torn_segment(tmp_path):
+    directory = str(tmp_path)
+    log = eventlog.EventLog(directory)
+    events = fill(log, 10)
+    log.flush()
+    log.f.write(b'\x01' * (eventlog.EVENT.itemsize // 2))
+    log.f.flush()
+    assert np.array_equal(found(directory), events)
+    log.close()
+
+
+def test_pending_events_flush_between_steps(tmp_path):
+    log = eventlog.EventLog(str(tmp_path), flush_interval=5)
+    log.add(eventlog.BID, now=1000)
+    log.flushed_at = 1000
+    log.tick(now=1001)
+    assert log.pending
+    log.tick(now=1006)
+    assert not log.pending
+    assert len(found(str(tmp_path))) == 1
+    log.close()
+
+
+KILLED = '''
+import os, signal, sys
+sys.path.insert(0, {root!r})
+import eventlog
+log = eventlog.EventLog({directory!r}, batch=1000, flush_interval=3600)
+for n in range(3):
+    log.add(eventlog.SOLD, price=n, now=1000 + n)
+{exit}
+'''
+
+
+@pytest.mark.parametrize('exit', [
+    # the kill path of fifa.py
+    'eventlog.close_all(); os.kill(os.getpid(), signal.SIGKILL)',
+    # normal exit, atexit closes the log
+    'sys.exit(0)',
+])
+def test_pending_events_survive_exit(tmp_path, exit):
+    script = KILLED.format(root=ROOT, directory=str(tmp_path), exit=exit)
+    subprocess.run([sys.executable, '-c', script], timeout=60)
+    events = found(str(tmp_path))
+    assert events['price'].tolist() == [0, 1, 2]
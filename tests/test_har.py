@@ -0,0 +1,88 @@
+import json
+import base64
+import pytest
+import yaml
+import catalog
+import codec
+import har
+import templates
+import standin
+
+
+def write_har(path, entries):
+    with open(path, 'w') as f:
+        json.dump({'log': {'version': '1.2', 'entries': entries}}, f,
+                  indent=1)
+
+
+def test_entries_across_chunks(tmp_path):
+    recorded = [{
+        'n': n,
+        'text': 'brace } bracket ] quote \\" ' * n,
+        'nested': {'list': [{'a': [n]}, '{'], 'empty': {}},
+    } for n in range(20)]
+    path = str(tmp_path / 'session.har')
+    write_har(path, recorded)
+
+    for chunk_size in (7, 64, 1 << 20):
+        assert list(har.entries(path, chunk_size)) == recorded
+
+
+def test_entries_empty_and_truncated(tmp_path):
+    path = str(tmp_path / 'empty.har')
+    write_har(path, [])
+    assert list(har.entries(path, 5)) == []
+
+    path = str(tmp_path / 'truncated.har')
+    with open(path, 'w') as f:
+        f.write('{"log": {"entries": [{"n": 1}, {"n": "2')
+    with pytest.raises(codec.DecodeError):
+        list(har.entries(path, 8))
+
+
+def search_entry(query, auction_info, encode=False):
+    text = codec.dumps({'auctionInfo': auction_info})
+    content = {'mimeType': 'application/json', 'text': text}
+    if encode:
+        content = {'encoding': 'base64',
+                   'text': base64.b64encode(text.encode()).decode()}
+    return {
+        'request': {
+            'method': 'GET',
+            'url': standin.BASE_URL +
+            '/ut/game/fifa23/transfermarket?' + query,
+        },
+        'response': {'status': 200, 'content': content},
+    }
+
+
+def test_templates_from_searches(tmp_path):
+    page = standin.market_page(6)['auctionInfo']
+    path = str(tmp_path / 'session.har')
+    write_har(path, [
+        search_entry('num=21&start=0&type=player&maxb=1000', page),
+        search_entry('num=21&start=21&type=player&maxb=1000', page[:2]),
+        search_entry('type=player&lev=gold&maxb=800', page[3:], True),
+        {'request': {'method': 'GET', 'url': standin.BASE_URL + '/other'}},
+    ])
+
+    items = har.merge([path])
+    assert len(items) == 2
+    assert len({i['name'] for i in items}) == 2
+    first = items[0]
+    assert first['params'] == {'type': 'player', 'maxb': 1000}
+    assert first['price'] == min(a['buyNowPrice'] for a in page)
+    assert first['rating'] == min(a['itemData']['rating'] for a in page)
+
+    # the yaml is a valid catalogue and its templates can be matched
+    items_path = tmp_path / 'items.yaml'
+    items_path.write_text(yaml.dump(items))
+    loaded = catalog.load(str(items_path))
+    for template in loaded.items:
+        for item in page:
+            templates.item_suited(template, item, lambda resourceId: 1000)
+
+    # kept templates aren't replaced
+    kept = [{'name': 'mine', 'params': {'type': 'player', 'maxb': 1000}}]
+    merged = har.merge([path], kept)
+    assert merged[0] is kept[0] and len(merged) == 2
@@ -0,0 +1,84 @@
+import os
+import sys
+import subprocess
+import pytest
+import standin
+from journal import Journal
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def test_records_survive_a_crash(tmp_path):
+    filename = str(tmp_path / 'state.journal')
+    journal = Journal(filename, snapshot_every=3)
+    for n in range(5):
+        journal.record(purchased_count=n)
+    journal.record(transfer_closed=True)
+    journal.sync()
+    with open(filename, 'a') as f:
+        f.write('{"purchased_count": 10')  # torn line
+
+    assert Journal(filename).state == {'purchased_count': 4,
+                                       'transfer_closed': True}
+
+
+def test_restart_restores_state(tmp_path):
+    cfg = {'journal': str(tmp_path / 'state.journal')}
+    web = standin.make_fifa(cfg=cfg)
+    web.purchased_count = 3
+    web.transfer_closed = True
+    web.quick_sell_ids = [11, 12]
+    web.dump_maxb = {'any': 1500}
+    web.journal.close()
+
+    web = standin.make_fifa(cfg=cfg)
+    # the defaults of a new instance don't overwrite the journal
+    assert web.journal.state['purchased_count'] == 3
+    assert web.purchased_count == 0
+
+    web.RestoreJournal()
+    assert web.purchased_count == 3
+    assert web.transfer_closed
+    assert web.quick_sell_ids == [11, 12]
+    assert web.dump_maxb == {'any': 1500}
+    assert web.adapter.requests == 0
+
+    # pending quick sells are flushed and the flush is journaled
+    assert web.QuickSellItems()
+    web.journal.close()
+    web = standin.make_fifa(cfg=cfg)
+    web.RestoreJournal()
+    assert web.quick_sell_ids == []
+
+
+KILLED = """
+import os, signal, sys
+sys.path.insert(0, {root!r})
+import journal
+j = journal.Journal({filename!r}, fsync_every=100, fsync_interval=3600)
+for n in range(5):
+    j.record(purchased_count=n)
+{exit}
+os.kill(os.getpid(), signal.SIGKILL)
+"""
+
+
+@pytest.mark.parametrize('exit', ['', 'journal.close_all()'])
+def test_records_survive_a_kill(tmp_path, exit):
+    filename = str(tmp_path / 'state.journal')
+    subprocess.run([sys.executable, '-c', KILLED.format(
+        root=ROOT, filename=filename, exit=exit)], timeout=60)
+    assert Journal(filename).state == {'purchased_count': 4}
+
+
+def test_tick_syncs_after_interval(tmp_path):
+    journal = Journal(str(tmp_path / 'state.journal'), fsync_every=100,
+                      fsync_interval=5)
+    journal.record(credits=1)
+    assert journal.pending == 1
+    journal.tick(now=journal.synced_at + 1)
+    assert journal.pending == 1
+    journal.tick(now=journal.synced_at + 6)
+    assert journal.pending == 0
+    journal.close()
+    journal.close()
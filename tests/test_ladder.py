@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import ladder
+
+
+@pytest.mark.parametrize('price, tick, up, down', [
+    (150, 50, 200, 150),
+    (950, 50, 1000, 900),
+    (1000, 100, 1100, 950),
+    (9900, 100, 10000, 9800),
+    (10000, 250, 10250, 9900),
+    (49750, 250, 50000, 49500),
+    (50000, 500, 50500, 49750),
+    (99500, 500, 100000, 99000),
+    (100000, 1000, 101000, 99500),
+    (1000000, 1000, 1001000, 999000),
+    (2500000, 1000, 2501000, 2499000),
+])
+def test_tick_boundaries(price, tick, up, down):
+    assert ladder.tick(price) == tick
+    assert ladder.up(price) == up
+    assert ladder.down(price) == (down if price > ladder.MIN_PRICE else 150)
+    assert ladder.floor(price) == ladder.ceil(price) == price
+    assert ladder.floor(price + 1) == price
+    assert ladder.ceil(price - 1) == (price if price > ladder.MIN_PRICE
+                                      else ladder.MIN_PRICE)
+
+
+def test_ladder_edges():
+    assert ladder.PRICES[0] == ladder.MIN_PRICE
+    assert ladder.PRICES[-1] == ladder.MAX_PRICE
+    assert ladder.up(ladder.MAX_PRICE) == ladder.MAX_PRICE
+    assert ladder.down(ladder.MIN_PRICE) == ladder.MIN_PRICE
+    # nothing on the ladder is below the price
+    for price in (-1, 0, 100, 149.5):
+        assert ladder.floor(price) == price
+    assert ladder.ceil(0) == ladder.MIN_PRICE
+
+
+def test_up_down_round_trips():
+    for price in ladder.PRICES[1:-1:7]:
+        assert ladder.down(ladder.up(price)) == price
+        assert ladder.up(ladder.down(price)) == price
+        assert ladder.up(price, 3) == ladder.up(ladder.up(ladder.up(price)))
+        assert ladder.down(price, 2) == ladder.down(ladder.down(price))
+
+
+def test_array_matches_scalar():
+    rng = np.random.default_rng(1)
+    prices = np.concatenate([
+        rng.integers(-100, 2000000, 3000),
+        ladder.PRICES[::50],
+        [b + d for b in ladder.BOUNDS[:-1] for d in (-1, 0, 1)],
+    ])
+    for name in ('floor', 'ceil', 'up', 'down', 'tick'):
+        scalar = [getattr(ladder, name)(int(p)) for p in prices]
+        array = getattr(ladder, name + '_array')(prices)
+        assert array.tolist() == scalar, name
+    for name in ('up', 'down'):
+        scalar = [getattr(ladder, name)(int(p), 3) for p in prices]
+        assert getattr(ladder, name + '_array')(prices, 3).tolist() == scalar
@@ -0,0 +1,71 @@
+from ledger import Ledger
+from templates import EA_TAX
+import standin
+
+
+def test_balance_and_estimates():
+    ledger = Ledger(max_age=600, max_estimates=2)
+    assert ledger.stale() and ledger.available() is None
+
+    ledger.balance(10000, now=1000)
+    assert not ledger.stale(now=1001)
+    ledger.bid(1, 3000)
+    assert ledger.available() == 7000
+    ledger.bid_done(1, True)
+    assert ledger.credits == 7000
+
+    ledger.listed(5, 2000)
+    assert ledger.expected_income() == int(2000 * EA_TAX)
+    ledger.earned(300)
+    assert ledger.credits == 7300
+    assert ledger.stale(now=1001)  # two local estimates
+
+    ledger.balance(10000, now=1000)
+    ledger.sold(5)
+    # the sale may be in the server balance already
+    assert ledger.credits == 10000 and ledger.locked() == 0
+    assert ledger.stale(now=1001)
+
+
+def test_restored_balance_is_stale():
+    ledger = Ledger()
+    ledger.restored(5000)
+    assert ledger.credits == 5000
+    assert ledger.stale()
+
+    ledger.balance(6000)
+    ledger.restored(5000)
+    assert ledger.credits == 6000
+
+
+def test_credits_follow_the_ledger(tmp_path):
+    cfg = {'journal': str(tmp_path / 'state.journal')}
+    web = standin.make_fifa(cfg=cfg)
+    assert web.ledger.credits is None
+
+    # buy only mode asks for the balance while the ledger is stale
+    web.UpdateCredits()
+    credits = web.ledger.credits
+    assert credits is not None and web.credits == credits
+    requests = web.adapter.requests
+    web.UpdateCredits()
+    assert web.adapter.requests == requests
+
+    web.ledger.listed(5, 1000)
+    web.Auction({'tradeState': 'closed', 'currentBid': 1000, 'tradeId': 1,
+                 'itemData': {'id': 5, 'resourceId': 1}})
+    assert web.credits == web.ledger.credits == credits
+    assert web.ledger.stale()
+    web.UpdateCredits()
+    assert web.adapter.requests == requests + 1
+
+    web.packs.opened(300, {'itemList': [{'id': 7, 'discardValue': 150}]})
+    web.quick_sell_ids = [7]
+    assert web.QuickSellItems()
+    assert web.credits == web.ledger.credits == credits + 150
+    web.journal.close()
+
+    web = standin.make_fifa(cfg=cfg)
+    web.RestoreJournal()
+    assert web.ledger.credits == web.credits == credits + 150
+    assert web.ledger.stale()
@@ -0,0 +1,31 @@
+import memwatch
+import standin
+
+
+def test_sample_counts():
+    watch = memwatch.MemoryWatch(interval=300)
+    assert watch.due()
+    report = watch.sample({'cache': 3})
+    assert report['counts'] == {'cache': 3}
+    assert report['rss'] > 0
+    assert not watch.due()
+    assert not watch.check(report)
+
+
+def test_trim_happens_between_steps():
+    web = standin.make_fifa()
+    web.memory = memwatch.MemoryWatch(soft_limit=1)
+    filled = len(web.prices_cache)
+
+    # what the /memory endpoint runs off the trading thread
+    report = web.CheckMemory()
+    assert report['trim_requested']
+    assert report['counts']['prices_cache'] == filled
+    assert len(web.prices_cache) == filled
+
+    seen = []
+    assert web.Run(lambda: seen.append(len(web.prices_cache)))
+    assert seen == [filled]
+    assert len(web.prices_cache) == filled - filled // 2
+    assert not web.memory.trim_requested
+    assert web.memory.trims == 1
@@ -0,0 +1,40 @@
+import fifa
+from observations import ObservationFilter
+
+
+def item(tradeId, price, state='active', **item_data):
+    data = {'resourceId': 20801, 'rating': 91, 'preferredPosition': 'ST',
+            'playStyle': 250}
+    data.update(item_data)
+    return {'tradeId': tradeId, 'buyNowPrice': price, 'tradeState': state,
+            'itemData': data}
+
+
+def test_changed_drops_repeats():
+    observations = ObservationFilter(fifa.player_tags, fifa.card_tags)
+    assert observations.changed(item(1, 1000))
+    assert not observations.changed(item(1, 1000))
+    assert observations.changed(item(1, 1100))
+    assert observations.changed(item(1, 1100, 'closed'))
+    assert observations.stats()['dropped'] == 1
+
+
+def test_card_tags_are_not_cached():
+    calls = []
+
+    def player_tags(item_data):
+        calls.append(item_data['resourceId'])
+        return fifa.player_tags(item_data)
+
+    observations = ObservationFilter(player_tags, fifa.card_tags)
+    first = observations.item_tags(item(1, 1000)['itemData'])
+    second = observations.item_tags(
+        item(2, 1000, playStyle=266, preferredPosition='CF')['itemData'])
+
+    assert calls == [20801]
+    assert first == fifa.itemdata2tags(item(1, 1000)['itemData'])
+    assert first['playStyle'] == '250' and first['preferredPosition'] == 'ST'
+    assert second['playStyle'] == '266' and second['preferredPosition'] == 'CF'
+    assert second['rating'] == '91'
+    # the cached player tags are not changed by the card tags
+    assert 'playStyle' not in observations.tags[20801]
@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+import packs
+
+
+def open_pack(history, packId, items):
+    """ items - [(itemId, discardValue), ...] """
+    history.opened(packId, {
+        'itemList': [{
+            'id': itemId,
+            'discardValue': discard
+        } for itemId, discard in items],
+    })
+
+
+def test_bootstrap_estimate():
+    history = packs.PackHistory(resamples=4000, seed=1)
+    values = [300, 500, 700, 900, 1100]
+    for n, value in enumerate(values):
+        open_pack(history, 100, [(n, value)])
+
+    estimate = history.estimate(100)
+    assert estimate['samples'] == 5
+    assert estimate['price'] == 400
+    assert abs(estimate['ev'] - np.mean(values)) < 20
+    # standard error of the mean
+    assert abs(estimate['ev_std'] - np.std(values) / np.sqrt(5)) < 20
+    assert estimate['variance'] == np.var(values)
+    assert estimate['p_profit'] > 0.9
+
+
+def test_item_values():
+    history = packs.PackHistory(seed=1)
+    open_pack(history, 301, [(1, 100), (2, 200), (3, 300)])
+    assert list(history.values(301)) == [600]
+
+    # listed items count with the market estimate after tax until sold
+    history.priced({1: 2000, 2: 0, 4: 5000})
+    assert list(history.values(301)) == [2000 * packs.EA_TAX + 200 + 300]
+
+    history.sold(1, 1500)
+    history.quick_sold(2)
+    assert list(history.values(301)) == [1500 * packs.EA_TAX + 200 + 300]
+
+
+def test_history_file(tmp_path):
+    filename = str(tmp_path / 'packs.jsonl')
+    history = packs.PackHistory(filename)
+    open_pack(history, 100, [(1, 100), (2, 50)])
+    history.priced({1: 1000})
+    history.sold(2, 400)
+
+    restored = packs.PackHistory(filename)
+    assert list(restored.values(100)) == list(history.values(100))
+
+
+def test_worth_buying():
+    history = packs.PackHistory(seed=1)
+    assert history.worth_buying(100, min_samples=3)[0]
+    # without a price the estimate can't be compared
+    assert not history.worth_buying(12345, min_samples=0)[0]
+
+    for n in range(5):
+        open_pack(history, 100, [(n, 300)])
+    assert not history.worth_buying(100, min_samples=3)[0]
+    assert history.worth_buying(100, min_profit=-200, min_samples=3)[0]
+
+    history = packs.PackHistory(prices={12345: 100}, seed=1)
+    for n in range(5):
+        open_pack(history, 12345, [(n, 300)])
+    assert history.worth_buying(12345, min_samples=3)[0]
+
+
+def test_plan():
+    items = [
+        {'id': 1, 'itemType': 'misc'},
+        {'id': 2, 'itemType': 'player'},
+        {'id': 3, 'itemType': 'player'},
+        {'id': 4, 'itemType': 'player', 'untradeable': True},
+        {'id': 5, 'itemType': 'player'},
+        {'id': 6, 'itemType': 'player', 'untradeable': True},
+        {'id': 7, 'itemType': 'player'},
+    ]
+    prices = {2: 0, 3: -1, 4: 500, 5: 800, 6: 500, 7: -1}
+    actions = packs.plan(items, {5, 6, 7}, prices)
+    ids = {k: [i['id'] for i in v] for k, v in actions.items()}
+    assert ids == {
+        'redeem': [1],
+        'club': [3, 4],
+        'trade': [5],
+        'quick_sell': [2, 6, 7],
+    }
+
+
+def test_process_pack_prices_each_player_once(monkeypatch):
+    import fifa
+    import standin
+
+    asked = []
+
+    def futcards(url, *args, **kwargs):
+        asked.append(url)
+        raise fifa.codec.DecodeError('no price')
+
+    monkeypatch.setattr(fifa.requests, 'get', futcards)
+    web = standin.make_fifa()
+    web.prices_cache.clear()
+    players = [dict(p, id=n + 1, resourceId=100 + n % 2)
+               for n, p in enumerate(standin.PLAYERS[:1] * 4)]
+    pack = {'itemList': players, 'duplicateItemIdList': []}
+
+    assert web.ProcessPack(pack)
+    assert len(asked) == 2
+    # no price means quick sell, all in one request
+    assert web.quick_sell_ids == []
+    assert web.adapter.requests == 1
+
+
+def test_move_to_piles_rejects_wrong_moves():
+    import standin
+
+    web = standin.make_fifa()
+    assert not web.MoveToPiles([(None, 'trade')])
+    assert not web.MoveToPiles([({'id': 1}, 'bin')])
+    assert web.adapter.requests == 0
+    assert web.MoveToPiles([({'id': 1}, 'trade'), ({'id': 2}, 'club')])
+    assert web.adapter.requests == 1
+
+
+def test_buy_pack_471_marks_purchased_dirty():
+    import standin
+
+    web = standin.make_fifa()
+    web.ledger.balance(100000)
+    web.purchased_dirty = False
+    web.adapter.route('POST', r'/purchased/items$', {}, status=471)
+    assert web.BuyPack(100) == {}
+    assert web.purchased_dirty
+    assert web.buy_pack_fails == 1
+    assert web.ledger.credits == 100000
+
+
+def test_buy_pack_failure_after_buy_marks_purchased_dirty(monkeypatch):
+    import standin
+
+    web = standin.make_fifa()
+    web.ledger.balance(100000)
+    web.purchased_dirty = False
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(web.packs, 'opened', fail)
+    with pytest.raises(OSError):
+        web.BuyPack(100)
+    assert web.purchased_dirty
@@ -0,0 +1,59 @@
+import threading
+import time
+import pytest
+import requests
+import recovery
+import standin
+
+
+def flaky(failures):
+    calls = []
+
+    def step():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise requests.exceptions.ConnectionError('reset')
+
+    return step, calls
+
+
+def test_recovered_steps_are_not_counted():
+    web = standin.make_fifa()
+    web.recovery = recovery.Recovery({recovery.TRANSIENT: (0, 0)})
+    step, calls = flaky(2)
+
+    assert list(web.Repeat(step, 3)) == [1, 2, 3]
+    assert len(calls) == 5
+    assert web.recovery.counts == {recovery.TRANSIENT: 2}
+
+
+def test_unrecovered_request_error_is_raised():
+    web = standin.make_fifa()
+    web.recovery = recovery.Recovery({recovery.TRANSIENT: (0, 0)},
+                                     max_attempts=1)
+    step, calls = flaky(5)
+
+    with pytest.raises(requests.exceptions.RequestException):
+        list(web.Repeat(step, 3))
+    assert len(calls) == 2
+
+
+def test_repeat_and_header_wait_end_on_stop():
+    web = standin.make_fifa()
+    web.app = {'headers': {}}
+    threading.Timer(0.1, web.stopped.set).start()
+    start = time.time()
+    web.update_headers()
+    assert time.time() - start < 2
+
+    step, calls = flaky(0)
+    assert list(web.Repeat(step, 3)) == []
+    assert not calls
+
+
+def test_no_sleeps_restores_fifa_sleeps():
+    import fifa
+    patched = fifa.sleep, fifa.random_sleep
+    with standin.no_sleeps():
+        assert fifa.sleep is standin.no_sleep
+    assert (fifa.sleep, fifa.random_sleep) == patched
@@ -0,0 +1,191 @@
+import os
+import random
+import itertools
+import time
+import pytest
+import sbc
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+
+
+def price(item_data):
+    return item_data['id'] * 7919 % 5000 + 200
+
+
+def brute_force(challenge, candidates):
+    best = None
+    for squad in itertools.combinations(candidates, challenge.size):
+        cost = sum(c.cost for c in squad)
+        if (best is None or cost < best) and challenge.check(squad):
+            best = cost
+    return best
+
+
+def synthetic_club(size, seed, nations=40, leagues=20):
+    rnd = random.Random(seed)
+    club = []
+    for n in range(size):
+        rating = rnd.randint(55, 90)
+        club.append({
+            'id': n + 1,
+            'assetId': n + 1,
+            'resourceId': n + 1,
+            'itemType': 'player',
+            'rating': rating,
+            'nation': rnd.randint(1, nations),
+            'leagueId': rnd.randint(1, leagues),
+            'teamid': rnd.randint(1, 200),
+            'rareflag': int(rnd.random() < 0.3),
+            'discardValue': int(10 * 1.35**(rating - 50) *
+                                rnd.uniform(0.7, 1.3)),
+        })
+    return club
+
+
+def requirements(challenge_id, *reqs):
+    return {
+        'challengeId': challenge_id,
+        'elgReq': [{'type': t, 'eligibilityValue': v, 'scope': s, 'count': c}
+                   for t, v, s, c in reqs],
+    }
+
+
+def test_team_rating():
+    assert sbc.team_rating([80] * 11) == 80
+    assert sbc.team_rating([84] * 10 + [66]) == 83
+    assert sbc.team_rating([75] * 10 + [64]) == 74
+
+    rnd = random.Random(1)
+    for _ in range(1000):
+        ratings = [rnd.randint(60, 90) for _ in range(11)]
+        avg = sum(ratings) / 11
+        excess = sum(r - avg for r in ratings if r > avg)
+        assert abs(sbc.team_rating(ratings) -
+                   int(round(sum(ratings) + excess)) // 11) <= 1
+        points = sbc.rating_points(ratings)
+        rating = sbc.team_rating(ratings)
+        assert points >= sbc.min_points(rating)
+        assert points < sbc.min_points(rating + 1)
+
+
+def test_captured_challenges():
+    club = sbc.load_json(os.path.join(DATA, 'sbc_club.json'), 'itemData')
+    challenges = sbc.load_json(os.path.join(DATA, 'sbc_challenges.json'),
+                               'challenges')
+    for data in challenges:
+        result = sbc.solve(data, club, price_func=price, time_budget=10)
+        challenge = sbc.Challenge.from_json(data)
+        candidates = sbc.prepare_candidates(
+            challenge, sbc.club_candidates(club, price))
+        expected = brute_force(challenge, candidates)
+
+        assert not result['timeout']
+        if expected is None:
+            assert not result['solved']
+            continue
+        assert result['solved']
+        assert result['cost'] == expected
+        by_id = {c.id: c for c in candidates}
+        assert challenge.check([by_id[c['id']] for c in result['squad']])
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_small_pools_are_optimal(seed):
+    rnd = random.Random(seed)
+    reqs = [('PLAYER_COUNT', 5, 'GREATER', -1),
+            ('TEAM_RATING', rnd.randint(60, 85), 'GREATER', -1)]
+    reqs += [
+        [],
+        [('NATION_COUNT', 2, 'LOWER', -1)],
+        [('SAME_LEAGUE_COUNT', 3, 'GREATER', -1)],
+        [('RARE_COUNT', 2, 'GREATER', -1)],
+        [('LEAGUE_COUNT', 3, 'GREATER', -1)],
+        [('NATION_COUNT', 2, 'LOWER', -1),
+         ('SAME_LEAGUE_COUNT', 2, 'GREATER', -1)],
+    ][seed % 6]
+    challenge = sbc.Challenge.from_json(requirements(seed, *reqs))
+    candidates = sbc.club_candidates(synthetic_club(16, seed, 4, 3))
+
+    solver = sbc.Solver(challenge, candidates, 10)
+    solver.solve()
+    assert not solver.timeout
+    expected = brute_force(challenge, solver.c)
+    if expected is None:
+        assert solver.best is None
+    else:
+        assert solver.best_cost == expected
+        assert challenge.check(solver.best)
+
+
+def test_big_club_rating_only():
+    club = synthetic_club(3000, 7)
+    result = sbc.solve(
+        requirements(1, ('TEAM_RATING', 80, 'GREATER', -1)), club)
+    # the search finished, so the squad is the cheapest one
+    assert result['solved']
+    assert not result['timeout']
+    assert result['nodes'] == 1
+
+
+def test_big_club_rating_and_rare():
+    club = synthetic_club(3000, 7)
+    start = time.time()
+    result = sbc.solve(
+        requirements(1, ('TEAM_RATING', 80, 'GREATER', -1),
+                     ('RARE_COUNT', 3, 'GREATER', -1),
+                     ('PLAYER_LEVEL', 3, 'GREATER', -1)), club)
+    # exact within the budget, no branching needed
+    assert result['solved']
+    assert not result['timeout']
+    assert time.time() - start < 2 * sbc.DEFAULT_TIME_BUDGET
+
+
+@pytest.mark.parametrize('reqs', [
+    (('TEAM_RATING', 75, 'GREATER', -1), ('NATION_COUNT', 3, 'LOWER', -1),
+     ('SAME_LEAGUE_COUNT', 5, 'GREATER', -1)),
+    (('TEAM_RATING', 78, 'GREATER', -1),
+     ('SAME_NATION_COUNT', 3, 'GREATER', -1),
+     ('CLUB_COUNT', 8, 'GREATER', -1)),
+])
+def test_big_club_constraints(reqs):
+    """ best effort: a valid squad within the budget, timeout tells that it
+        isn't proven to be the cheapest
+    """
+    club = synthetic_club(3000, 7)
+    data = requirements(1, *reqs)
+    start = time.time()
+    result = sbc.solve(data, club)
+    assert time.time() - start < 2 * sbc.DEFAULT_TIME_BUDGET
+    assert result['solved']
+
+    challenge = sbc.Challenge.from_json(data)
+    by_id = {c.id: c for c in sbc.club_candidates(club)}
+    assert challenge.check([by_id[c['id']] for c in result['squad']])
+
+
+def test_infeasible_quota():
+    club = synthetic_club(200, 3)
+    data = requirements(1, ('RARE_COUNT', 12, 'GREATER', -1))
+    result = sbc.solve(data, club)
+    assert not result['solved']
+    assert not result['timeout']
+
+
+def test_club_prices_make_no_requests(monkeypatch):
+    import fifa
+    import standin
+
+    def no_requests(*args, **kwargs):
+        raise AssertionError('price lookup made a request')
+
+    monkeypatch.setattr(fifa.requests, 'get', no_requests)
+    web = standin.make_fifa()
+    web.futcards = True
+    web.prices_cache[1] = {'price': '2500', 'actual': 0}
+    web.prices_cache[2] = 700
+    price = web.SbcPriceFunc()
+
+    assert price({'resourceId': 1, 'discardValue': 10}) == 2500
+    assert price({'resourceId': 2, 'discardValue': 10}) == 700
+    assert price({'resourceId': 3, 'discardValue': 10}) == 10
+    assert web.adapter.requests == 0
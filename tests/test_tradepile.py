@@ -0,0 +1,48 @@
+import threading
+from time import time
+from tradepile import TradePile
+
+
+def listing(item_id, state, expires):
+    return {
+        'itemData': {'id': item_id},
+        'tradeState': state,
+        'expires': expires,
+    }
+
+
+def test_changed_items():
+    pile = TradePile()
+    changed = pile.update([listing(1, 'active', 3000),
+                           listing(2, 'expired', -1),
+                           listing(3, None, 0)], now=100)
+    assert [i['itemData']['id'] for i in changed] == [2, 3]
+    # same states aren't reported again
+    changed = pile.update([listing(1, 'closed', -1),
+                           listing(2, 'expired', -1)], now=200)
+    assert [i['itemData']['id'] for i in changed] == [1]
+
+
+def test_refresh_with_active_listings():
+    pile = TradePile(max_interval=600, active_interval=60)
+    pile.update([listing(1, 'expired', -1)], now=100)
+    assert pile.next_refresh() == 700
+
+    # a sale isn't noticed at the expiry an hour later
+    pile.update([listing(1, 'active', 3600)], now=100)
+    assert pile.next_refresh() == 160
+    pile.update([listing(1, 'active', 30)], now=100)
+    assert pile.next_refresh() == 130
+    assert not pile.due(now=120)
+    assert pile.due(now=160)
+
+
+def test_wait_ends_on_stop():
+    import standin
+    web = standin.make_fifa()
+    web.tradepile_state.update([listing(1, 'active', 3600)])
+    threading.Timer(0.1, web.stopped.set).start()
+    started = time()
+    web.WaitTradePile()
+    # waited for the active listing interval, woke up on stop()
+    assert 0.05 < time() - started < 5
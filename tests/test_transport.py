@@ -0,0 +1,158 @@
+import os
+import socket
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import transport
+import standin
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"credits": 1000}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+CERT = os.path.join(DATA, 'localhost.pem')
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def https_server():
+    """ self-signed localhost, the server keeps its ticket keys """
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(CERT, os.path.join(DATA, 'localhost.key'))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'https://localhost:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_requests_session_from_config(http_server):
+    session = transport.session({'connect_timeout': 2, 'read_timeout': 3})
+    assert isinstance(session, transport.Session)
+    assert session.timeout == (2, 3)
+
+    first = session.get(http_server + '/user/credits')
+    second = session.get(http_server + '/user/credits')
+    assert first.json() == {'credits': 1000}
+    assert set(first.timing) == {'connect', 'tls', 'ttfb', 'transfer'}
+    assert first.timing['connect'] > 0
+    # kept alive, no new connection
+    assert second.timing['connect'] == 0
+    session.close()
+
+
+def test_requests_session_resumes_tls(https_server):
+    session = transport.session({})
+    # REQUESTS_CA_BUNDLE wins over session.verify
+    first = session.get(https_server + '/user/credits', verify=CERT)
+    # a dropped connection, the next request opens a new one
+    session.close()
+    second = session.get(https_server + '/user/credits', verify=CERT)
+    assert second.json() == {'credits': 1000}
+
+    context = session.get_adapter(https_server).tls_context
+    assert (context.handshakes, context.resumed) == (2, 1)
+    assert first.timing['tls'] > 0
+    # the abbreviated handshake is still timed
+    assert second.timing['connect'] > 0 and second.timing['tls'] > 0
+    session.close()
+
+
+def test_requests_session_errors():
+    session = transport.session({'connect_timeout': 1})
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get('http://127.0.0.1:{}/'.format(closed_port()))
+    session.close()
+
+
+def test_httpx_session_from_config():
+    pytest.importorskip('httpx')
+    session = transport.session({'client': 'httpx', 'http2': False,
+                                 'read_timeout': 7})
+    assert isinstance(session, transport.HttpxSession)
+    assert session.client.timeout.read == 7
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get('http://127.0.0.1:{}/'.format(closed_port()))
+    session.close()
+
+
+def test_httpx_session_resumes_tls(https_server):
+    pytest.importorskip('httpx')
+    # no kept-alive connections, every request makes a handshake
+    session = transport.HttpxSession(http2=False, max_keepalive=0,
+                                     verify=CERT)
+    timings = [
+        session.get(https_server + '/user/credits').timing for _ in range(3)
+    ]
+    assert (session.tls_context.handshakes, session.tls_context.resumed) == \
+        (3, 2)
+    assert all(t['connect'] > 0 and t['tls'] > 0 for t in timings)
+    session.close()
+
+
+def test_http2_client():
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    import h2standin
+
+    base_url, adapter, stop = h2standin.serve()
+    session = transport.session({'client': 'httpx', 'http1': False})
+    try:
+        r = session.get(base_url + '/ut/game/fifa23/user/credits')
+        assert r.status_code == 200
+        assert r.http_version == 'HTTP/2'
+        assert 'credits' in r.json()
+        assert set(r.timing) == {'connect', 'tls', 'ttfb', 'transfer'}
+        assert r.elapsed.total_seconds() >= 0
+        assert r.request.method == 'GET'
+
+        r = session.put(base_url + '/ut/game/fifa23/trade/1/bid',
+                        json={'bid': 200})
+        assert r.json() == {'credits': 100000}
+        assert r.timing['connect'] == 0  # one multiplexed connection
+        assert session.get(base_url + '/nowhere').status_code == 404
+        assert adapter.requests == 3
+    finally:
+        session.close()
+        stop()
+
+
+def test_fifa_over_http2():
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+
+    web = standin.make_fifa(h2=True)
+    web.UpdateCredits(force=True)
+    assert web.ledger.credits is not None
+    assert web.adapter.requests == 1
+    web.requests.close()
@@ -0,0 +1,95 @@
+"""
+    Local tradepile state
+
+    Keeps the last known tradeState and expiry of every tradepile item, so
+    only changed items are processed and the next tradepile fetch can be
+    scheduled to the earliest expiry. Active listings can sell at any time,
+    while there are some the tradepile is fetched at least every
+    active_interval seconds.
+"""
+from time import time
+
+# tradeState values which need an action from us
+ACTION_STATES = (None, 'expired', 'closed')
+
+
+class TradePile(object):
+
+    def __init__(self, max_interval=600, active_interval=60):
+        self.items = {}  # itemId -> {'tradeState', 'listed', 'expires_at'}
+        self.max_interval = max_interval  # refresh at least so often
+        self.active_interval = active_interval  # same with active listings
+        self.dirty = True  # tradepile has changed without a fetch
+        self.fetched = 0
+
+    def update(self, auction_items, now=None):
+        """ store a fresh tradepile, returns items which need an action """
+        now = now or time()
+        changed = []
+        items = {}
+        for item in auction_items:
+            item_id = item['itemData']['id']
+            state = item.get('tradeState')
+            known = self.items.get(item_id)
+
+            expires = item.get('expires', 0) or 0
+            items[item_id] = {
+                'tradeState': state,
+                'listed': known['listed'] if known else None,
+                'expires_at': now + expires if expires > 0 else None,
+            }
+
+            if state not in ACTION_STATES:
+                continue
+            if known and known['tradeState'] == state:
+                continue
+            changed.append(item)
+
+        self.items = items
+        self.fetched = now
+        self.dirty = False
+        return changed
+
+    def listed(self, item_id, duration, now=None):
+        now = now or time()
+        self.items[item_id] = {
+            'tradeState': 'active',
+            'listed': now,
+            'expires_at': now + duration,
+        }
+
+    def retry(self, item_id):
+        """ action failed, report the item as changed on the next fetch """
+        self.items.pop(item_id, None)
+        self.dirty = True
+
+    def clear_closed(self):
+        for item_id in [
+                i for i, s in self.items.items() if s['tradeState'] == 'closed'
+        ]:
+            del self.items[item_id]
+
+    def touch(self):
+        """ something was moved to the tradepile """
+        self.dirty = True
+
+    def next_refresh(self):
+        expiries = [
+            s['expires_at'] for s in self.items.values()
+            if s['expires_at'] is not None
+        ]
+        deadline = self.fetched + self.max_interval
+        if any(s['tradeState'] == 'active' for s in self.items.values()):
+            deadline = self.fetched + min(self.max_interval,
+                                          self.active_interval)
+        return min(expiries + [deadline])
+
+    def due(self, now=None):
+        return self.dirty or (now or time()) >= self.next_refresh()
+
+    def counts(self):
+        counts = {}
+        for s in self.items.values():
+            state = s['tradeState'] or 'unlisted'
+            counts[state] = counts.get(state, 0) + 1
+        return counts
@@ -0,0 +1,326 @@
+"""
+    HTTP transports for UT calls
+
+    Session is a requests.Session with explicit timeouts, pool settings and
+    per-request timing. HttpxSession has the same surface on top of an httpx
+    client, which can talk HTTP/2 and multiplexes all UT calls over one
+    kept-alive connection. Every response gets a timing dict: connect, tls,
+    ttfb and transfer in seconds, connect and tls are 0 on a reused
+    connection.
+
+    Python's ssl only resumes a TLS session when the session object is handed
+    to the new socket, both clients share a ResumingContext which keeps the
+    last session of every host and offers it in the next handshake, so a new
+    connection after an idle drop skips the full handshake.
+"""
+import ssl
+import threading
+from datetime import timedelta
+from time import perf_counter
+import requests
+import codec
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+from urllib3 import connection, connectionpool
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+_local = threading.local()
+
+
+def new_timing():
+    return {'connect': 0.0, 'tls': 0.0, 'ttfb': 0.0, 'transfer': 0.0}
+
+
+def current_timing():
+    try:
+        return _local.timing
+    except AttributeError:
+        _local.timing = new_timing()
+        return _local.timing
+
+
+class ResumingSocket(ssl.SSLSocket):
+    """ the TLS 1.3 ticket comes after the handshake, kept on close """
+
+    def close(self):
+        if self._sslobj is not None:
+            self.context.keep(self)
+        super().close()
+
+    def _real_close(self):
+        # a makefile() reference defers the close until here
+        if self._sslobj is not None:
+            self.context.keep(self)
+        super()._real_close()
+
+
+class ResumingContext(ssl.SSLContext):
+    """ client context which offers the last session of a host """
+
+    def __init__(self, *args, **kwargs):
+        self.sslsocket_class = ResumingSocket
+        self.sessions = {}  # (host, port) -> ssl.SSLSession
+        self.handshakes = 0
+        self.resumed = 0
+
+    def wrap_socket(self, sock, server_hostname=None, **kwargs):
+        host, port = sock.getpeername()[:2]
+        key = (server_hostname or host, port)
+        if kwargs.get('session') is None:
+            kwargs['session'] = self.sessions.get(key)
+        s = super().wrap_socket(sock, server_hostname=server_hostname,
+                                **kwargs)
+        s.session_key = key
+        s.session_kept = False
+        self.handshakes += 1
+        self.resumed += s.session_reused
+        self.keep(s)
+        return s
+
+    def keep(self, sock):
+        session = sock.session
+        if session is not None and session.has_ticket:
+            self.sessions[sock.session_key] = session
+            sock.session_kept = True
+
+
+def tls_context(verify=True):
+    """ verify - True, False or a CA bundle path like requests' verify """
+    context = ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+    if verify is False:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else:
+        context.load_verify_locations(
+            DEFAULT_CA_BUNDLE_PATH if verify is True else verify)
+    return context
+
+
+class TimedHTTPConnection(connection.HTTPConnection):
+
+    def _new_conn(self):
+        start = perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            current_timing()['connect'] += perf_counter() - start
+
+
+class TimedHTTPSConnection(connection.HTTPSConnection):
+
+    def _new_conn(self):
+        start = perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            current_timing()['connect'] += perf_counter() - start
+
+    def connect(self):
+        timing = current_timing()
+        connected = timing['connect']
+        start = perf_counter()
+        try:
+            super().connect()
+        finally:
+            # connect() is tcp connect plus the handshake
+            timing['tls'] += perf_counter() - start - \
+                (timing['connect'] - connected)
+
+    def getresponse(self, *args, **kwargs):
+        r = super().getresponse(*args, **kwargs)
+        # the TLS 1.3 ticket is read with the first response
+        if isinstance(self.sock, ResumingSocket) and \
+                not self.sock.session_kept:
+            self.sock.context.keep(self.sock)
+        return r
+
+
+class TimedHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+
+    def __init__(self, *args, **kwargs):
+        self.tls_context = tls_context()
+        super().__init__(*args, **kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify,
+                                             cert=None):
+        host_params, pool_kwargs = \
+            super().build_connection_pool_key_attributes(request, verify, cert)
+        # verify=False keeps the unverified context of urllib3
+        if host_params['scheme'] == 'https' and verify is not False:
+            pool_kwargs['ssl_context'] = self.tls_context
+        return host_params, pool_kwargs
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, stream=False, **kwargs):
+        timing = _local.timing = new_timing()
+        start = perf_counter()
+        r = super().send(request, stream=True, **kwargs)
+        headers = perf_counter()
+        if not stream:
+            r.content
+        timing['ttfb'] = headers - start - timing['connect'] - timing['tls']
+        timing['transfer'] = perf_counter() - headers
+        r.timing = timing
+        return r
+
+
+class Session(requests.Session):
+    """ requests session with timeouts, pool settings and timing """
+
+    def __init__(self, timeout=(5, 30), pool_connections=4, pool_maxsize=4,
+                 max_retries=0):
+        super().__init__()
+        self.timeout = timeout  # (connect, read)
+        adapter = TimingAdapter(pool_connections=pool_connections,
+                                pool_maxsize=pool_maxsize,
+                                max_retries=max_retries)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class Request(object):
+
+    def __init__(self, method, url, body):
+        self.method = method
+        self.url = url
+        self.body = body
+
+
+class Response(object):
+    """ the part of requests.Response the bot uses """
+
+    def __init__(self, r, timing):
+        self.status_code = r.status_code
+        self.headers = r.headers
+        self.content = r.content
+        self.encoding = r.encoding
+        self.url = str(r.url)
+        self.request = Request(r.request.method, str(r.request.url),
+                               r.request.content or None)
+        self.elapsed = timedelta(seconds=sum(timing.values()))
+        self.timing = timing
+        self.http_version = r.http_version
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', 'replace')
+
+    def json(self):
+        return codec.loads(self.content)
+
+
+class HttpxSession(object):
+    """ HTTP/2 capable session with the requests.Session methods we use """
+
+    HEADERS_COMPLETE = ('http11.receive_response_headers.complete',
+                        'http2.receive_response_headers.complete')
+    SEND_STARTED = ('http11.send_request_headers.started',
+                    'http2.send_request_headers.started')
+
+    def __init__(self, timeout=(5, 30), http2=True, http1=True,
+                 max_connections=4, max_keepalive=4, keepalive_expiry=300,
+                 verify=True):
+        if httpx is None:
+            raise ImportError('httpx transport needs httpx[http2]')
+        self.tls_context = tls_context(verify)
+        self.client = httpx.Client(
+            http1=http1,
+            http2=http2,
+            verify=self.tls_context,
+            timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_keepalive,
+                                keepalive_expiry=keepalive_expiry))
+
+    @property
+    def headers(self):
+        return self.client.headers
+
+    def request(self, method, url, params=None, json=None):
+        events = {}
+
+        def trace(name, info):
+            events[name] = perf_counter()
+
+        start = perf_counter()
+        try:
+            r = self.client.request(method, url, params=params, json=json,
+                                    extensions={'trace': trace})
+        # the recovery in FifaWeb.Run handles requests exceptions
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        end = perf_counter()
+
+        timing = new_timing()
+        timing['connect'] = events.get(
+            'connection.connect_tcp.complete', 0) - events.get(
+                'connection.connect_tcp.started', 0)
+        timing['tls'] = events.get('connection.start_tls.complete', 0) - \
+            events.get('connection.start_tls.started', 0)
+        sent = next((events[e] for e in self.SEND_STARTED if e in events),
+                    start)
+        headers = next(
+            (events[e] for e in self.HEADERS_COMPLETE if e in events), end)
+        timing['ttfb'] = headers - sent
+        timing['transfer'] = end - headers
+        return Response(r, timing)
+
+    def get(self, url, params=None):
+        return self.request('GET', url, params=params)
+
+    def delete(self, url):
+        return self.request('DELETE', url)
+
+    def options(self, url):
+        return self.request('OPTIONS', url)
+
+    def put(self, url, json=None):
+        return self.request('PUT', url, json=json)
+
+    def post(self, url, json=None):
+        return self.request('POST', url, json=json)
+
+    def close(self):
+        self.client.close()
+
+
+def session(cfg):
+    """ session from the transport section of the config """
+    timeout = (cfg.get('connect_timeout', 5), cfg.get('read_timeout', 30))
+    if cfg.get('client', 'requests') == 'httpx':
+        return HttpxSession(timeout,
+                            http2=cfg.get('http2', True),
+                            http1=cfg.get('http1', True),
+                            max_connections=cfg.get('pool_maxsize', 4),
+                            max_keepalive=cfg.get('pool_maxsize', 4),
+                            keepalive_expiry=cfg.get('keepalive', 300),
+                            verify=cfg.get('verify', True))
+
+    return Session(timeout,
+                   pool_connections=cfg.get('pool_connections', 4),
+                   pool_maxsize=cfg.get('pool_maxsize', 4),
+                   max_retries=cfg.get('max_retries', 0))